@@ -0,0 +1,107 @@
+"""Small SQLite copy of the Oracle HR sample schema for offline benchmarks."""
+import random
+import datetime
+from typing import Dict, Any
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import StaticPool
+
+
+TABLES = {
+    "REGIONS": [("REGION_ID", "NUMBER"), ("REGION_NAME", "VARCHAR2")],
+    "COUNTRIES": [("COUNTRY_ID", "CHAR"), ("COUNTRY_NAME", "VARCHAR2"), ("REGION_ID", "NUMBER")],
+    "LOCATIONS": [("LOCATION_ID", "NUMBER"), ("STREET_ADDRESS", "VARCHAR2"), ("POSTAL_CODE", "VARCHAR2"),
+                  ("CITY", "VARCHAR2"), ("STATE_PROVINCE", "VARCHAR2"), ("COUNTRY_ID", "CHAR")],
+    "DEPARTMENTS": [("DEPARTMENT_ID", "NUMBER"), ("DEPARTMENT_NAME", "VARCHAR2"), ("MANAGER_ID", "NUMBER"),
+                    ("LOCATION_ID", "NUMBER")],
+    "JOBS": [("JOB_ID", "VARCHAR2"), ("JOB_TITLE", "VARCHAR2"), ("MIN_SALARY", "NUMBER"), ("MAX_SALARY", "NUMBER")],
+    "EMPLOYEES": [("EMPLOYEE_ID", "NUMBER"), ("FIRST_NAME", "VARCHAR2"), ("LAST_NAME", "VARCHAR2"),
+                  ("EMAIL", "VARCHAR2"), ("PHONE_NUMBER", "VARCHAR2"), ("HIRE_DATE", "DATE"),
+                  ("JOB_ID", "VARCHAR2"), ("SALARY", "NUMBER"), ("COMMISSION_PCT", "NUMBER"),
+                  ("MANAGER_ID", "NUMBER"), ("DEPARTMENT_ID", "NUMBER")],
+    "JOB_HISTORY": [("EMPLOYEE_ID", "NUMBER"), ("START_DATE", "DATE"), ("END_DATE", "DATE"),
+                    ("JOB_ID", "VARCHAR2"), ("DEPARTMENT_ID", "NUMBER")],
+}
+
+_SQLITE_TYPES = {"NUMBER": "NUMERIC", "VARCHAR2": "TEXT", "CHAR": "TEXT", "DATE": "DATE"}
+
+
+def hr_catalog() -> Dict[str, Dict[str, Any]]:
+    """Same shape as src.database.extract_oracle_catalog."""
+    return {
+        table: {"columns": list(columns), "comment": None, "column_comments": {}}
+        for table, columns in sorted(TABLES.items())
+    }
+
+
+def build_hr_engine(employees: int = 2000, seed: int = 7):
+    """In-memory SQLite engine with the HR tables filled with deterministic data."""
+    rng = random.Random(seed)
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+
+    with engine.begin() as conn:
+        for table, columns in TABLES.items():
+            cols = ", ".join(f"{name} {_SQLITE_TYPES[dtype]}" for name, dtype in columns)
+            conn.execute(text(f"CREATE TABLE {table} ({cols})"))
+
+        regions = ["Europe", "Americas", "Asia", "Middle East and Africa"]
+        conn.execute(text("INSERT INTO REGIONS VALUES (:id, :name)"),
+                     [{"id": i + 1, "name": name} for i, name in enumerate(regions)])
+
+        countries = [("EG", "Egypt", 4), ("SA", "Saudi Arabia", 4), ("US", "United States", 2),
+                     ("UK", "United Kingdom", 1), ("DE", "Germany", 1), ("JP", "Japan", 3)]
+        conn.execute(text("INSERT INTO COUNTRIES VALUES (:id, :name, :region)"),
+                     [{"id": c, "name": n, "region": r} for c, n, r in countries])
+
+        cities = ["Cairo", "Riyadh", "Seattle", "London", "Munich", "Tokyo"]
+        conn.execute(text("INSERT INTO LOCATIONS VALUES (:id, :street, :postal, :city, NULL, :country)"),
+                     [{"id": 1000 + i * 100, "street": f"{i + 1} Main St", "postal": f"{10000 + i}",
+                       "city": city, "country": countries[i][0]} for i, city in enumerate(cities)])
+
+        departments = ["Administration", "Marketing", "Purchasing", "Human Resources", "Shipping",
+                       "IT", "Public Relations", "Sales", "Executive", "Finance", "Accounting"]
+        conn.execute(text("INSERT INTO DEPARTMENTS VALUES (:id, :name, :manager, :location)"),
+                     [{"id": (i + 1) * 10, "name": name, "manager": 100 + i,
+                       "location": 1000 + (i % len(cities)) * 100} for i, name in enumerate(departments)])
+
+        jobs = [("AD_PRES", "President", 20000, 40000), ("AD_VP", "Vice President", 15000, 30000),
+                ("IT_PROG", "Programmer", 4000, 10000), ("SA_REP", "Sales Representative", 6000, 12000),
+                ("ST_CLERK", "Stock Clerk", 2000, 5000), ("FI_ACCOUNT", "Accountant", 4200, 9000),
+                ("HR_REP", "Human Resources Representative", 4000, 9000), ("MK_MAN", "Marketing Manager", 9000, 15000)]
+        conn.execute(text("INSERT INTO JOBS VALUES (:id, :title, :min, :max)"),
+                     [{"id": j, "title": t, "min": lo, "max": hi} for j, t, lo, hi in jobs])
+
+        base = datetime.date(2005, 1, 1)
+        rows = []
+        for i in range(employees):
+            job_id, _title, lo, hi = jobs[rng.randrange(len(jobs))]
+            rows.append({
+                "id": 100 + i,
+                "first": f"First{i}",
+                "last": f"Last{i}",
+                "email": f"E{i}",
+                "phone": f"515.123.{i:04d}",
+                "hire": base + datetime.timedelta(days=rng.randrange(6000)),
+                "job": job_id,
+                "salary": rng.randrange(lo, hi, 100),
+                "commission": round(rng.random() * 0.3, 2) if job_id == "SA_REP" else None,
+                "manager": 100 + rng.randrange(i) if i else None,
+                "department": (rng.randrange(len(departments)) + 1) * 10,
+            })
+        conn.execute(text(
+            "INSERT INTO EMPLOYEES VALUES (:id, :first, :last, :email, :phone, :hire, :job, :salary, "
+            ":commission, :manager, :department)"
+        ), rows)
+
+        history = []
+        for row in rows[: employees // 4]:
+            start = row["hire"] - datetime.timedelta(days=rng.randrange(200, 2000))
+            history.append({"id": row["id"], "start": start, "end": row["hire"],
+                            "job": jobs[rng.randrange(len(jobs))][0], "department": row["department"]})
+        conn.execute(text("INSERT INTO JOB_HISTORY VALUES (:id, :start, :end, :job, :department)"), history)
+
+    return engine
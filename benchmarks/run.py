@@ -0,0 +1,239 @@
+"""Offline per-stage latency benchmark for the text-to-SQL pipeline.
+
+Runs the real pipeline code against StubChatOllama and a SQLite copy of the
+HR schema, so no Ollama or Oracle is needed:
+
+    uv run python -m benchmarks.run --iterations 50 --latency-ms 0
+    uv run python -m benchmarks.run --compare benchmarks/results/<older>.json
+    uv run python -m benchmarks.run --mode both --latency-ms 800
+"""
+import os
+import sys
+import json
+import math
+import time
+import asyncio
+import argparse
+import contextlib
+import platform
+import subprocess
+import tracemalloc
+from typing import Dict, List, Optional
+
+from src.database import question_for_sql, generate_sql, is_safe_sql, execute_sql, ask_db
+from src.schema_index import SchemaIndex
+from src.sql_validator import SQLValidator
+from src.sql_fixer import SQLFixer
+from src.question_templates import build_template_matcher
+from src.serialization import to_records, json_default
+from benchmarks.hr_sqlite import build_hr_engine, hr_catalog
+from benchmarks.stub_llm import StubChatOllama, SAMPLE_QUESTIONS
+
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+MODES = ["translate", "direct"]
+STAGES = ["match_template", "translate", "schema_prune", "generate_sql", "fix_sql", "is_safe_sql", "validate_sql", "execute", "serialize", "pipeline"]
+
+
+def percentile(values: List[float], p: float) -> float:
+    """Nearest-rank percentile."""
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, math.ceil(p / 100 * len(ordered)) - 1))]
+
+
+class Recorder:
+    def __init__(self, trace_memory: bool = False):
+        self.trace_memory = trace_memory
+        self.timings: Dict[str, List[float]] = {stage: [] for stage in STAGES}
+        self.alloc_peak: Dict[str, int] = {stage: 0 for stage in STAGES}
+        self.outcomes: Dict[str, int] = {}
+
+    async def measure(self, stage: str, coro_or_fn, *args):
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+        started = time.perf_counter()
+        value = coro_or_fn(*args)
+        if asyncio.iscoroutine(value):
+            value = await value
+        elapsed = time.perf_counter() - started
+        if self.trace_memory:
+            peak = tracemalloc.get_traced_memory()[1] - before
+            self.alloc_peak[stage] = max(self.alloc_peak[stage], peak)
+        else:
+            self.timings[stage].append(elapsed * 1000)
+        return value
+
+
+def _validation_errors(validator: SQLValidator, sql: str) -> Optional[str]:
+    try:
+        validator.validate(sql)
+    except ValueError as e:
+        return str(e)
+    return None
+
+
+async def run_question(rec: Recorder, question: str, engine, schema_index, validator, fixer, templates, client,
+                       translator, mode: str):
+    # The sample questions are free-form, so this is the cost every template miss adds
+    await rec.measure("match_template", templates.match, question)
+    if mode == "direct":
+        english = question
+    else:
+        english = await rec.measure("translate", question_for_sql, question, translator, None, mode)
+    prompt_schema = await rec.measure("schema_prune", schema_index.prompt_schema, f"{question} {english}")
+    sql = await rec.measure("generate_sql", generate_sql, english, prompt_schema, client)
+    sql, _rules = await rec.measure("fix_sql", fixer.normalize, sql)
+    safe = await rec.measure("is_safe_sql", is_safe_sql, sql)
+    errors = await rec.measure("validate_sql", _validation_errors, validator, sql)
+    if safe and errors is None:
+        result = await rec.measure("execute", execute_sql, engine, sql)
+        await rec.measure("serialize", lambda: json.dumps(to_records(result.columns, result.rows), default=json_default))
+
+    async def pipeline():
+        translated = await question_for_sql(question, translator, mode=mode)
+        return await ask_db(translated, engine, schema_index.full_text, client,
+                            schema_index=schema_index, original_question=question,
+                            validator=validator, fixer=fixer)
+
+    result = await rec.measure("pipeline", pipeline)
+    if not rec.trace_memory:
+        rec.outcomes[result.status] = rec.outcomes.get(result.status, 0) + 1
+
+
+def summarize(rec: Recorder) -> Dict[str, dict]:
+    summary = {}
+    for stage in STAGES:
+        values = rec.timings[stage]
+        if not values:
+            continue
+        summary[stage] = {
+            "n": len(values),
+            "mean_ms": round(sum(values) / len(values), 4),
+            "p50_ms": round(percentile(values, 50), 4),
+            "p95_ms": round(percentile(values, 95), 4),
+            "p99_ms": round(percentile(values, 99), 4),
+            "alloc_peak_kb": round(rec.alloc_peak[stage] / 1024, 1),
+        }
+    return summary
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return "unknown"
+
+
+async def run(args, mode: str) -> dict:
+    engine = build_hr_engine(employees=args.employees)
+    schema_index = SchemaIndex(hr_catalog())
+    validator = SQLValidator(hr_catalog())
+    fixer = SQLFixer(hr_catalog())
+    templates = build_template_matcher()
+    client = StubChatOllama(model="stub-coder", latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, seed=1)
+    translator = StubChatOllama(model="stub-instruct", latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, seed=2)
+
+    # Warm up imports, the engine and code paths before timing anything
+    await run_question(Recorder(), SAMPLE_QUESTIONS[0], engine, schema_index, validator, fixer, templates, client, translator, mode)
+    client.calls = translator.calls = 0
+
+    rec = Recorder()
+    for _ in range(args.iterations):
+        for question in SAMPLE_QUESTIONS:
+            await run_question(rec, question, engine, schema_index, validator, fixer, templates, client, translator, mode)
+    # Model calls of the timed iterations only, not the warm-up or the memory pass
+    llm_calls = client.calls + translator.calls
+
+    # Allocations are measured in a separate pass so tracing doesn't skew timings
+    rec.trace_memory = True
+    tracemalloc.start()
+    for question in SAMPLE_QUESTIONS:
+        await run_question(rec, question, engine, schema_index, validator, fixer, templates, client, translator, mode)
+    tracemalloc.stop()
+
+    return {
+        "meta": {
+            "mode": mode,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "git": git_revision(),
+            "python": platform.python_version(),
+            "iterations": args.iterations,
+            "questions": len(SAMPLE_QUESTIONS),
+            "latency_ms": args.latency_ms,
+            "jitter_ms": args.jitter_ms,
+            "employees": args.employees,
+            "llm_calls": llm_calls,
+        },
+        # The stub writes the same SQL in every mode, so these check the run, not SQL quality
+        "outcomes": rec.outcomes,
+        "stages": summarize(rec),
+    }
+
+
+def print_report(report: dict, baseline: Optional[dict] = None):
+    print(f"\n{'stage':<14}{'p50 ms':>12}{'p95 ms':>12}{'p99 ms':>12}{'alloc KB':>12}" + ("   p50 vs baseline" if baseline else ""))
+    for stage, row in report["stages"].items():
+        line = f"{stage:<14}{row['p50_ms']:>12.3f}{row['p95_ms']:>12.3f}{row['p99_ms']:>12.3f}{row['alloc_peak_kb']:>12.1f}"
+        old = (baseline or {}).get("stages", {}).get(stage)
+        if old and old["p50_ms"]:
+            line += f"   {(row['p50_ms'] - old['p50_ms']) / old['p50_ms'] * 100:+.1f}%"
+        print(line)
+    print(f"\noutcomes: {report['outcomes']}")
+
+
+def print_mode_comparison(reports: Dict[str, dict]):
+    """Latency and model calls only: the stub can't tell which mode writes better SQL."""
+    print(f"\n{'mode':<12}{'pipeline p50':>14}{'pipeline p95':>14}{'LLM calls':>11}")
+    for mode, report in reports.items():
+        pipeline = report["stages"]["pipeline"]
+        print(f"{mode:<12}{pipeline['p50_ms']:>14.3f}{pipeline['p95_ms']:>14.3f}{report['meta']['llm_calls']:>11}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20, help="passes over the sample questions")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="simulated model latency per call")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="extra uniform random latency per call")
+    parser.add_argument("--employees", type=int, default=2000, help="rows in the SQLite EMPLOYEES table")
+    parser.add_argument("--output", help="where to write the JSON report (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--compare", help="earlier JSON report to diff p50s against")
+    parser.add_argument("--verbose", action="store_true", help="show the pipeline's own log output")
+    parser.add_argument("--mode", choices=MODES + ["both"], default="translate",
+                        help="PIPELINE_MODE to run; 'both' runs each and compares them")
+    args = parser.parse_args(argv)
+    modes = MODES if args.mode == "both" else [args.mode]
+
+    # The pipeline logs every prompt/SQL with print(); keep that out of the report
+    reports = {}
+    with contextlib.ExitStack() as stack:
+        if not args.verbose:
+            stack.enter_context(contextlib.redirect_stdout(stack.enter_context(open(os.devnull, "w"))))
+        for mode in modes:
+            reports[mode] = asyncio.run(run(args, mode))
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    for mode, report in reports.items():
+        if len(reports) > 1:
+            print(f"\n== {mode} ==")
+        print_report(report, baseline)
+
+        output = args.output or os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{report['meta']['git']}.json")
+        if len(reports) > 1:
+            output = f"{os.path.splitext(output)[0]}-{mode}.json"
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"report written to {output}")
+
+    if len(reports) > 1:
+        print_mode_comparison(reports)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+"""Deterministic stand-in for ChatOllama with configurable latency and canned replies."""
+import time
+import random
+import asyncio
+from types import SimpleNamespace
+from typing import Dict, Optional
+
+
+# The Arabic questions our users ask most (kept in sync with the list at the bottom of main.py)
+SAMPLE_QUESTIONS = [
+    "اعرض اسم القسم ومتوسط الرواتب فيه، لكن بس للأقسام اللي متوسط الرواتب أعلى من متوسط رواتب الشركة كلها",
+    "مين الموظفين اللي اشتغلوا في نفس الوظيفة لمدة أطول من متوسط مدة الوظيفة لكل الموظفين؟",
+    "اعرض الموظفين اللي تم تعيينهم قبل مديرهم",
+    "اعرض الأقسام اللي ما فيهاش أي موظف راتبه أعلى من متوسط راتب الشركة",
+    "اعرض متوسط المرتبات لكل Department، ورتّبهم من الأعلى للأقل.",
+    "مين الموظفين اللي مرتباتهم أعلى من متوسط المرتبات في القسم بتاعهم؟",
+]
+
+TRANSLATIONS = dict(zip(SAMPLE_QUESTIONS, [
+    "Show each department name and its average salary, only for departments whose average salary is above the company average?",
+    "Which employees worked in the same job longer than the average job duration of all employees?",
+    "Which employees were hired before their manager?",
+    "Which departments have no employee with a salary above the company average salary?",
+    "What is the average salary per department, ordered from highest to lowest?",
+    "Which employees earn more than the average salary in their department?",
+]))
+
+# SQL the coder model would return, written so it also runs on the SQLite copy
+SQL = dict(zip(TRANSLATIONS.values(), [
+    """SELECT d.DEPARTMENT_NAME, AVG(e.SALARY) AS AVG_SALARY
+FROM EMPLOYEES e JOIN DEPARTMENTS d ON e.DEPARTMENT_ID = d.DEPARTMENT_ID
+GROUP BY d.DEPARTMENT_NAME
+HAVING AVG(e.SALARY) > (SELECT AVG(SALARY) FROM EMPLOYEES)""",
+    """SELECT e.FIRST_NAME, e.LAST_NAME, jh.JOB_ID
+FROM EMPLOYEES e JOIN JOB_HISTORY jh ON e.EMPLOYEE_ID = jh.EMPLOYEE_ID
+WHERE julianday(jh.END_DATE) - julianday(jh.START_DATE) >
+      (SELECT AVG(julianday(END_DATE) - julianday(START_DATE)) FROM JOB_HISTORY)""",
+    """SELECT e.FIRST_NAME, e.LAST_NAME, e.HIRE_DATE, m.HIRE_DATE AS MANAGER_HIRE_DATE
+FROM EMPLOYEES e JOIN EMPLOYEES m ON e.MANAGER_ID = m.EMPLOYEE_ID
+WHERE e.HIRE_DATE < m.HIRE_DATE""",
+    """SELECT d.DEPARTMENT_NAME
+FROM DEPARTMENTS d
+WHERE NOT EXISTS (
+    SELECT 1 FROM EMPLOYEES e
+    WHERE e.DEPARTMENT_ID = d.DEPARTMENT_ID
+      AND e.SALARY > (SELECT AVG(SALARY) FROM EMPLOYEES)
+)""",
+    """SELECT d.DEPARTMENT_NAME, AVG(e.SALARY) AS AVG_SALARY
+FROM EMPLOYEES e JOIN DEPARTMENTS d ON e.DEPARTMENT_ID = d.DEPARTMENT_ID
+GROUP BY d.DEPARTMENT_NAME
+ORDER BY AVG_SALARY DESC""",
+    """SELECT e.FIRST_NAME, e.LAST_NAME, e.SALARY, e.DEPARTMENT_ID
+FROM EMPLOYEES e
+WHERE e.SALARY > (SELECT AVG(e2.SALARY) FROM EMPLOYEES e2 WHERE e2.DEPARTMENT_ID = e.DEPARTMENT_ID)""",
+]))
+
+
+# PIPELINE_MODE=direct sends the Arabic question straight to the coder model. The stub
+# answers it with the same SQL as the translated question: offline, only latency and
+# model calls differ between modes, not the quality of the SQL.
+DIRECT_SQL = dict(zip(SAMPLE_QUESTIONS, SQL.values()))
+
+
+class StubChatOllama:
+    """Answers from lookup tables after a simulated generation delay.
+
+    Translation prompts are answered from ``translations`` and SQL prompts
+    from ``sql`` by finding the question text inside the prompt. Latency is
+    ``latency_ms`` plus seeded uniform jitter, so runs are repeatable.
+    """
+
+    def __init__(self, model: str = "stub", translations: Optional[Dict[str, str]] = None,
+                 sql: Optional[Dict[str, str]] = None, latency_ms: float = 0.0,
+                 jitter_ms: float = 0.0, seed: int = 0):
+        self.model = model
+        self.translations = TRANSLATIONS if translations is None else translations
+        self.sql = {**SQL, **DIRECT_SQL} if sql is None else sql
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.calls = 0
+        self._rng = random.Random(seed)
+
+    def _delay(self) -> float:
+        return (self.latency_ms + self._rng.uniform(0, self.jitter_ms)) / 1000
+
+    def _reply(self, prompt: str) -> str:
+        self.calls += 1
+        table = self.translations if "Translate" in prompt else self.sql
+        for question, answer in table.items():
+            if question in prompt:
+                return answer
+        return "SELECT COUNT(*) AS N FROM EMPLOYEES" if table is self.sql else ""
+
+    def invoke(self, prompt: str, **kwargs):
+        time.sleep(self._delay())
+        return SimpleNamespace(content=self._reply(prompt))
+
+    async def ainvoke(self, prompt: str, **kwargs):
+        await asyncio.sleep(self._delay())
+        return SimpleNamespace(content=self._reply(prompt))
+
+    async def astream(self, prompt: str, **kwargs):
+        delay = self._delay()
+        words = self._reply(prompt).split(" ")
+        for i, word in enumerate(words):
+            await asyncio.sleep(delay / len(words))
+            yield SimpleNamespace(content=word if i == 0 else " " + word)
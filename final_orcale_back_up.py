@@ -18,6 +18,9 @@ DATABASE_URL = f"oracle+oracledb://hr:hr@{DB_HOST}:1521/?service_name=XEPDB1"
 model = "qwen2.5-coder:3b"
 translator_model = "qwen2.5:3b-instruct"
 
+# Memory the result tables of one chat session may hold; the oldest are dropped past it
+CHAT_HISTORY_MAX_MB = float(os.getenv("CHAT_HISTORY_MAX_MB", "50"))
+
 
 
 def fix_arabic_for_terminal(text: str) -> str:
@@ -250,6 +253,80 @@ def ltr(text):
 
 
 
+def results_frame(rows_as_dict: List[Dict[str, Any]]):
+    """DataFrame for display, built once per answer. Oracle object values (dates, LOBs)
+    become strings so st.dataframe can show them."""
+    if not rows_as_dict:
+        return None
+    df = pd.DataFrame(rows_as_dict)
+    object_columns = df.select_dtypes(include=["object"]).columns
+    if len(object_columns):
+        df[object_columns] = df[object_columns].astype("string")
+    return df
+
+
+def result_message(sql: str, message: str, rows_as_dict: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Chat history record for one answer: the SQL, the status message and the results table."""
+    df = results_frame(rows_as_dict)
+    return {
+        "role": "assistant",
+        "sql": sql,
+        "message": message,
+        "df": df,
+        "row_count": len(rows_as_dict),
+        "bytes": int(df.memory_usage(deep=True).sum()) if df is not None else 0,
+    }
+
+
+def trim_history(messages: List[Dict[str, Any]]):
+    """Drop the tables of the oldest answers once the session holds more than CHAT_HISTORY_MAX_MB.
+    The SQL and message stay; the newest table is always kept."""
+    budget = CHAT_HISTORY_MAX_MB * 1024 * 1024
+    held = [msg for msg in messages if msg.get("df") is not None]
+    total = sum(msg["bytes"] for msg in held)
+    for msg in held[:-1]:
+        if total <= budget:
+            break
+        total -= msg["bytes"]
+        msg["df"] = None
+        msg["bytes"] = 0
+        msg["evicted"] = True
+
+
+def render_content(msg: Dict[str, Any]):
+    """Body of one chat message, drawn from its stored record."""
+    if msg["role"] == "user":
+        st.markdown(rtl(msg["content"]), unsafe_allow_html=True)
+        return
+    if "sql" not in msg:
+        st.markdown(ltr(msg["content"]), unsafe_allow_html=True)
+        return
+
+    # Display SQL - VERTICAL LTR FORMAT
+    st.markdown("### SQL")
+    st.code(
+        msg["sql"],
+        language="sql",
+        line_numbers=True,
+        wrap_lines=True,
+        height=250
+    )
+    st.markdown("---")
+
+    st.markdown("### النتائج")
+    if msg["df"] is not None:
+        st.dataframe(msg["df"], width="stretch", hide_index=True)
+    elif msg.get("evicted"):
+        st.caption(f"تم حذف نتائج هذه الإجابة ({msg['row_count']} صف) من الذاكرة. أعد طرح السؤال لعرضها.")
+    else:
+        st.markdown(rtl(msg["message"]), unsafe_allow_html=True)
+
+
+def render_message(msg: Dict[str, Any]):
+    with st.chat_message(msg["role"]):
+        render_content(msg)
+
+
 @st.cache_resource
 def get_engine():
     return create_engine(
@@ -258,23 +335,28 @@ def get_engine():
 )
 
 
+# Shared by every session and rerun: the schema is read and the clients built once per process
+@st.cache_resource
+def get_schema(_engine) -> str:
+    return extract_oracle_schema(engine=_engine, schema="HR")
+
+
+@st.cache_resource
+def get_clients():
+    return build_client(), build_translate_client()
+
+
 def main():
     render_hr_database_query()
     engine = get_engine()
     print(f"Engine ID : {id(engine)}" )
 
-    # Initialize session state
-    if "engine" not in st.session_state:
-        schema = extract_oracle_schema(engine=engine, schema="HR")
-        st.session_state.schema = schema
-        st.session_state.client = build_client()
-        st.session_state.translator_client = build_translate_client()
+    # Initialize session state - only the chat history is per session
+    if "messages" not in st.session_state:
         st.session_state.messages = []
 
-
-    schema = st.session_state.schema
-    client = st.session_state.client
-    translator_client = st.session_state.translator_client
+    schema = get_schema(engine)
+    client, translator_client = get_clients()
 
     
     with st.sidebar:
@@ -282,50 +364,9 @@ def main():
 
 
     # MAIN CHAT AREA - Full width, perfect display!
-    # Render chat history
+    # Render chat history from the stored records - nothing is re-parsed or rebuilt
     for msg in st.session_state.messages:
-        role = msg["role"]
-        content = msg["content"]
-        with st.chat_message(role):
-            if role == "user":
-                st.markdown(rtl(content), unsafe_allow_html=True)
-            else:
-                # Parse structured assistant responses
-                if content.startswith("**Answer:**") or "**الإجابة:**" in content:
-                    parts = content.split("\n\n")
-                    answer_part = parts[0].replace("**Answer:** ", "").replace("**الإجابة:** ", "")
-                    sql_part = parts[1].replace("**SQL:**\n", "").replace("**الاستعلام:**\n", "")
-                    raw_part = parts[2].replace("**Results:**\n", "").replace("**النتائج الخام:**\n", "")
-
-                    st.markdown("### الإجابة")
-                    st.markdown(ltr(answer_part), unsafe_allow_html=True)
-                    st.markdown("---")
-
-                    st.markdown("###  SQL")
-                    st.code(
-                        sql_part.strip(), 
-                        language="sql",
-                        line_numbers=True,
-                        wrap_lines=True,
-                        height=250
-                    )
-                    st.markdown("---")
-
-                    st.markdown("### النتائج")
-                    try:
-                        import ast
-                        raw_data = ast.literal_eval(raw_part)
-                        if isinstance(raw_data, list) and len(raw_data) > 0:
-                            df = pd.DataFrame(raw_data)
-                            for col in df.select_dtypes(include=['object']):
-                                df[col] = df[col].apply(lambda x: str(x) if x is not None else None)
-                            st.dataframe(df, width="stretch", hide_index=True)
-                        else:
-                            st.code(str(raw_data), language="python")
-                    except:
-                        st.code(raw_part, language="python")
-                else:
-                    st.markdown(ltr(content), unsafe_allow_html=True)
+        render_message(msg)
 
     # Handle new user input
     user_input = st.chat_input("اكتب سؤالك هنا...")
@@ -337,46 +378,21 @@ def main():
         # Process assistant response
         with st.chat_message("assistant"):
             try:
-                question_translated = translate_question(user_input, translator_client)
-                sql_query, message, rows_as_dict = ask_db(question_translated, engine, schema, client)
-
-                # Normalize Oracle types before display
-                if isinstance(rows_as_dict, list) and len(rows_as_dict) > 0:
-                    df = pd.DataFrame(rows_as_dict)
-                    for col in df.select_dtypes(include=['object']):
-                        df[col] = df[col].apply(lambda x: str(x) if x is not None else None)
-                else:
-                    df = None
-
-
-                # Display SQL - VERTICAL LTR FORMAT
-                st.markdown("### SQL")
-                st.code(
-                    sql_query, 
-                    language="sql",
-                    line_numbers=True,
-                    wrap_lines=True,
-                    height=250
-                )
-                st.markdown("---")
-                #######################################################################################
-                # Display results
-                st.markdown("### النتائج")
-                if df is not None:
-                    st.dataframe(df, width="stretch", hide_index=True)
-
-                else:
-                    st.code(str(rows_as_dict), language="python")
-                ############################################################################################
-
-                # Store structured response
-                full_response = f"**\n\n**SQL:**\n{sql_query}\n\n**النتائج الخام:**\n{str(rows_as_dict)}"
-                st.session_state.messages.append({"role": "assistant", "content": full_response})
-
+                with st.status("جاري ترجمة السؤال...", expanded=False) as status:
+                    question_translated = translate_question(user_input, translator_client)
+                    status.update(label="جاري إنشاء وتنفيذ الاستعلام...")
+                    sql_query, message, rows_as_dict = ask_db(question_translated, engine, schema, client)
+                    status.update(label="تم", state="complete")
+
+                # Stored structured: later reruns draw this DataFrame as-is
+                record = result_message(sql_query, message, rows_as_dict)
             except Exception as e:
                 err = f"[error] حدث خطأ غير متوقّع أثناء تشغيل البرنامج: {e}"
-                st.markdown(ltr(err), unsafe_allow_html=True)
-                st.session_state.messages.append({"role": "assistant", "content": err})
+                record = {"role": "assistant", "content": err}
+            render_content(record)
+
+        st.session_state.messages.append(record)
+        trim_history(st.session_state.messages)
 
 
 
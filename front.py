@@ -1,8 +1,81 @@
+import json
+
 import streamlit as st
+import pandas as pd
 import requests
 from src.chat_bot_ui import render_hr_database_query
 
 API_URL = "http://localhost:8000/query"
+STREAM_URL = "http://localhost:8000/query/stream"
+
+STAGE_LABELS = {
+    "translating": "Translating question...",
+    "generating": "Generating SQL...",
+}
+
+
+def iter_sse(response):
+    """Yield (event, data) pairs from a text/event-stream response."""
+    event, data = "message", []
+    for line in response.iter_lines(decode_unicode=True):
+        if line is None:
+            continue
+        if line == "":
+            if data:
+                yield event, json.loads("\n".join(data))
+            event, data = "message", []
+        elif line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data.append(line[len("data:"):].strip())
+
+
+def run_streaming_query(question: str):
+    """Call /query/stream, showing each pipeline stage as it happens. Returns the final result."""
+    sql_tokens = []
+    with st.status("Sending question...", expanded=True) as status:
+        sql_box = st.empty()
+        with requests.post(
+            STREAM_URL,
+            params={"format": "compact"},
+            json={"question": question},
+            stream=True,
+            timeout=(5, 120)
+        ) as response:
+            if response.status_code != 200:
+                status.update(label="Failed", state="error")
+                st.error(f"API Error: {response.text}")
+                return None
+
+            for event, data in iter_sse(response):
+                if event == "stage":
+                    status.update(label=STAGE_LABELS.get(data["stage"], data["stage"]))
+                elif event == "translated":
+                    st.write(f"Translated: {data['question']}")
+                elif event == "sql_token":
+                    sql_tokens.append(data["token"])
+                    sql_box.code("".join(sql_tokens), language="sql")
+                elif event == "sql":
+                    sql_tokens = []
+                    sql_box.code(data["sql"], language="sql")
+                    if data["source"] == "cache":
+                        st.write("Reusing cached SQL")
+                elif event == "executing":
+                    status.update(label="Running query...")
+                elif event == "repair":
+                    status.update(label="Repairing SQL...")
+                    st.write(f"Database error, asking the model to fix it: {data['error']}")
+                elif event == "rows_ready":
+                    status.update(label=f"{data['row_count']} rows ready")
+                elif event == "result":
+                    status.update(label="Done", state="complete", expanded=False)
+                    return data
+                elif event == "error":
+                    status.update(label="Failed", state="error")
+                    st.error(data["detail"])
+                    return None
+    return None
+
 
 def main():
     render_hr_database_query()
@@ -18,41 +91,32 @@ def main():
         if not question.strip():
             st.warning("Please enter a question")
         else:
-            with st.spinner("Querying database..."):
-                try:
-                    response = requests.post(
-                        API_URL,
-                        json={"question": question},
-                        timeout=60
-                    )
-
-                    if response.status_code != 200:
-                        st.error(f"API Error: {response.text}")
-                    else:
-                        data = response.json()
+            try:
+                data = run_streaming_query(question)
 
-                        # =============================
-                        # Display Answer
-                        # =============================
-                        st.success(data["answer"])
+                if data is not None:
+                    # =============================
+                    # Display Answer
+                    # =============================
+                    st.success(data["answer"])
 
-                        # =============================
-                        # Display SQL
-                        # =============================
-                        st.subheader("Generated SQL")
-                        st.code(data["sql_query"], language="sql")
+                    # =============================
+                    # Display SQL
+                    # =============================
+                    st.subheader("Generated SQL")
+                    st.code(data["sql_query"], language="sql")
 
-                        # =============================
-                        # Display Results
-                        # =============================
-                        st.subheader("Results")
-                        if data["results"]:
-                            st.dataframe(data["results"])
-                        else:
-                            st.info("No results returned")
+                    # =============================
+                    # Display Results
+                    # =============================
+                    st.subheader("Results")
+                    if data["rows"]:
+                        st.dataframe(pd.DataFrame(data["rows"], columns=data["columns"]))
+                    else:
+                        st.info("No results returned")
 
-                except requests.exceptions.RequestException as e:
-                    st.error(f"Connection error: {e}")
+            except requests.exceptions.RequestException as e:
+                st.error(f"Connection error: {e}")
 
 
 if __name__ == "__main__":
@@ -67,4 +131,3 @@ if __name__ == "__main__":
 # اعرض الأقسام اللي ما فيهاش أي موظف راتبه أعلى من متوسط راتب الشركة
 # اعرض متوسط المرتبات لكل Department، ورتّبهم من الأعلى للأقل.
 #مين الموظفين اللي مرتباتهم أعلى من متوسط المرتبات في القسم بتاعهم؟
-
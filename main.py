@@ -1,75 +1,413 @@
 # uv run uvicorn main:app --host 127.0.0.1 --port 8000 --reload
 import os
+import json
+import time
+import asyncio
 
 from pydantic import BaseModel
-from typing import List, Dict, Any
-from sqlalchemy import create_engine
-from src.database import ask_db,extract_oracle_schema,translate_question
-from src.clients import build_client,build_translate_client
-from fastapi import FastAPI, HTTPException
+from typing import List, Dict, Any, Optional
+from sqlalchemy import text
+from contextlib import asynccontextmanager
+from src.database import ask_db,execute_sql,is_safe_sql,open_row_stream,run_in_db_thread,question_for_sql,DB_ARRAYSIZE,PIPELINE_MODE
+from src.database import run_template, open_template_stream, run_semantic_hit
+from src.database import FAILURE_MESSAGES, UNSAFE_MESSAGE, TIMEOUT_MESSAGE, QueryResult, failure_status
+from src.plan_guard import QueryTimeout
+from src.pool import build_engine, warm_pool, pool_status, dispose_engine, connect
+from src.schema_catalog import build_schema_catalog
+from src.pagination import clamp_page_size, encode_page_token, decode_page_token, InvalidPageToken
+from src.clients import build_client,build_translate_client,build_model_manager
+from src.cache import build_translation_cache, build_sql_cache, build_result_cache, normalize_arabic
+from src.metrics import STAGE_SECONDS, CallbackGauge, render_metrics
+from src.singleflight import SingleFlight
+from src.question_templates import build_template_matcher
+from src.semantic_cache import build_semantic_cache
+from src.serialization import (
+    json_default, negotiate_format, to_arrow_ipc,
+    COMPACT_FORMAT, ARROW_FORMAT, COMPACT_MEDIA_TYPE, ARROW_MEDIA_TYPE
+)
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse, JSONResponse
 
    
 
-# ====== FASTAPI APP ======
-app = FastAPI(title="Database Query API")
-
-
 DATABASE_URL = os.getenv("DATABASE_URL")
 
 if not DATABASE_URL:
     DB_HOST = os.getenv("DB_HOST", "localhost")
     DATABASE_URL = f"oracle+oracledb://hr:hr@{DB_HOST}:1521/?service_name=XEPDB1"
 
-engine = create_engine(
-    DATABASE_URL,
-    pool_pre_ping=True
+# Seconds between attempts while Oracle or Ollama are still coming up
+STARTUP_RETRY_SECONDS = float(os.getenv("STARTUP_RETRY_SECONDS", "5"))
+# Send one tiny prompt to each model before reporting ready, so the first user doesn't pay the load
+STARTUP_WARM_MODELS = os.getenv("STARTUP_WARM_MODELS", "1") == "1"
+# How long /readyz waits for the database ping
+READY_DB_TIMEOUT = float(os.getenv("READY_DB_TIMEOUT", "2"))
+# Seconds between LAST_DDL_TIME checks for changed tables; 0 disables the periodic refresh
+SCHEMA_REFRESH_SECONDS = float(os.getenv("SCHEMA_REFRESH_SECONDS", "300"))
+
+# Set in lifespan(); schema_catalog.current stays None until the background load finishes
+engine = None
+client = None
+translator_client = None
+model_manager = None
+translation_cache = None
+sql_cache = None
+result_cache = None
+semantic_cache = None
+schema_catalog = None
+template_matcher = None
+readiness = {"schema": False, "models": False, "error": None}
+
+
+async def load_schema():
+    """Start from the on-disk snapshot if there is one, then bring it up to date
+    from Oracle (off the event loop), retrying until Oracle answers"""
+    if schema_catalog.load_snapshot():
+        readiness["schema"] = True
+    while True:
+        try:
+            await run_in_db_thread(schema_catalog.refresh)
+            break
+        except Exception as e:
+            readiness["error"] = f"schema: {e}"
+            print(f"Schema load failed, retrying in {STARTUP_RETRY_SECONDS}s: {e}")
+            await asyncio.sleep(STARTUP_RETRY_SECONDS)
+    readiness["schema"] = True
+
+
+async def refresh_schema_periodically():
+    """Pick up DDL changes without a restart; requests in flight keep the version they started with"""
+    while SCHEMA_REFRESH_SECONDS > 0:
+        await asyncio.sleep(SCHEMA_REFRESH_SECONDS)
+        try:
+            await run_in_db_thread(schema_catalog.refresh)
+        except Exception as e:
+            print(f"Schema refresh failed: {e}")
+
+
+def required_models() -> List[str]:
+    # Direct mode never calls the translator, so there is nothing to load for it
+    return ["coder"] if PIPELINE_MODE == "direct" else ["coder", "translator"]
+
+
+async def warm_models():
+    """Load each model (one tiny prompt) until all the pipeline needs have answered"""
+    if STARTUP_WARM_MODELS:
+        await model_manager.warm(required_models(), STARTUP_RETRY_SECONDS)
+    readiness["models"] = True
+
+
+async def warm_connections():
+    """Open the pool's connections up front; a failure here only costs the first requests a logon"""
+    try:
+        await run_in_db_thread(warm_pool, engine)
+    except Exception as e:
+        print(f"Connection pool warm-up failed: {e}")
+
+
+async def initialize():
+    await asyncio.gather(load_schema(), warm_models(), warm_connections())
+    readiness["error"] = None
+    print("Service ready")
+    await asyncio.gather(
+        refresh_schema_periodically(),
+        model_manager.keep_resident(required_models(), STARTUP_RETRY_SECONDS),
+    )
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Build the cheap objects (engine, clients, caches) and start listening right away;
+    the catalog read and model warm-up run in the background and gate /readyz"""
+    global engine, client, translator_client, model_manager, translation_cache, sql_cache, result_cache, schema_catalog
+    global template_matcher, semantic_cache
+    engine = build_engine(DATABASE_URL)
+    client = build_client()
+    translator_client = build_translate_client()
+    model_manager = build_model_manager(client, translator_client)
+    translation_cache = build_translation_cache()
+    sql_cache = build_sql_cache()
+    result_cache = build_result_cache()
+    semantic_cache = build_semantic_cache()
+    schema_catalog = build_schema_catalog(engine, owner="HR")
+    template_matcher = build_template_matcher()
+
+    task = asyncio.create_task(initialize())
+    try:
+        yield
+    finally:
+        task.cancel()
+        dispose_engine(engine)
+
+
+def is_ready() -> bool:
+    return readiness["schema"] and readiness["models"]
+
+
+def require_ready():
+    if not is_ready():
+        raise HTTPException(
+            status_code=503,
+            detail="Service not ready: Database schema or LLM clients not initialized",
+            headers={"Retry-After": str(max(1, int(STARTUP_RETRY_SECONDS)))}
+        )
+
+
+# ====== FASTAPI APP ======
+app = FastAPI(title="Database Query API", lifespan=lifespan)
+
+# Questions from one /query/batch call processed at the same time
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+BATCH_MAX_QUESTIONS = int(os.getenv("BATCH_MAX_QUESTIONS", "500"))
+# Identical questions arriving while one is already running wait for it instead of running again
+QUERY_COALESCING = os.getenv("QUERY_COALESCING", "1") == "1"
+
+query_flight = SingleFlight("query")
+
+
+def _cache_lookups():
+    caches = {"translation": translation_cache, "sql": sql_cache, "results": result_cache, "semantic": semantic_cache}
+    for name, cache in caches.items():
+        if cache is not None:
+            stats = cache.stats()
+            yield (name, "hit"), stats["hits"]
+            yield (name, "miss"), stats["misses"]
+
+
+CallbackGauge(
+    "text_to_sql_cache_lookups_total",
+    "Cache lookups by cache and result",
+    ["cache", "result"],
+    _cache_lookups,
+    kind="counter",
 )
 
 
-schema = extract_oracle_schema(engine=engine, schema="HR")
-client = build_client()
-translator_client = build_translate_client()
+def _pool_connections():
+    if engine is None:
+        return
+    status = pool_status(engine)
+    for state in ("checked_out", "checked_in", "waiting"):
+        if status.get(state) is not None:
+            yield (state,), status[state]
+
+
+CallbackGauge(
+    "text_to_sql_pool_connections",
+    "Database connections by state (waiting: threads blocked on checkout)",
+    ["state"],
+    _pool_connections,
+)
+CallbackGauge(
+    "text_to_sql_inflight_questions",
+    "Distinct questions currently running through the coalesced pipeline",
+    [],
+    lambda: [((), query_flight.stats()["in_flight"])],
+)
 
 
 # Request/Response models
 class QueryRequest(BaseModel):
     question: str
+    page_size: Optional[int] = None
 
 
 class QueryResponse(BaseModel):
     answer: str
+    status: str = "success"
     sql_query: str
     results: List[Dict[str, Any]]
+    cached: bool = False
+    cache_age_seconds: Optional[float] = None
+    offset: int = 0
+    next_page_token: Optional[str] = None
+    template: Optional[str] = None
 
 
+class CompactQueryResponse(BaseModel):
+    answer: str
+    status: str = "success"
+    sql_query: str
+    columns: List[str]
+    types: List[str]
+    rows: List[List[Any]]
+    cached: bool = False
+    cache_age_seconds: Optional[float] = None
+    offset: int = 0
+    next_page_token: Optional[str] = None
+    template: Optional[str] = None
 
 
-@app.post("/query", response_model=QueryResponse)
-async def process_query(request: QueryRequest):
-    """Main endpoint - processes natural language to SQL"""
-    
-    # check all dependencies
-    if engine is None or schema is None or client is None or translator_client is None:
-        raise HTTPException(
-            status_code=503, 
-            detail="Service not ready: Database schema or LLM clients not initialized"
-        )
-    
+class BatchRequest(BaseModel):
+    questions: List[str]
+    page_size: Optional[int] = None
+
+
+class BatchItem(BaseModel):
+    question: str
+    ok: bool
+    result: Optional[QueryResponse] = None
+    error: Optional[str] = None
+    duplicate_of: Optional[int] = None
+
+
+class BatchResponse(BaseModel):
+    items: List[BatchItem]
+    unique_questions: int
+    elapsed_seconds: float
+
+
+class PageRequest(BaseModel):
+    token: str
+
+
+class InvalidateRequest(BaseModel):
+    tables: List[str] = []
+
+
+
+
+def match_template(question: str):
+    """The question template this question fits, if any (checked before any model call)"""
+    with STAGE_SECONDS.time(stage="template_match", model=""):
+        return template_matcher.match(question)
+
+
+async def answer_question(question: str, page_size: int, emit=None):
+    """Answer from a question template or SQL cached for a paraphrase when there is one; otherwise
+    translate (unless PIPELINE_MODE=direct), generate SQL and execute - the pipeline shared by every query endpoint"""
+    match = match_template(question)
+    if match is not None:
+        result = await run_template(engine, match, result_cache, page_size, emit)
+        if result is not None:
+            return result
+
+    version = schema_catalog.current
+    model = getattr(client, "model", "")
+    if semantic_cache is not None:
+        with STAGE_SECONDS.time(stage="semantic_lookup", model=""):
+            hit = semantic_cache.get(question, version.fingerprint, model)
+        if hit is not None:
+            result = await run_semantic_hit(engine, hit, semantic_cache, result_cache, page_size, emit)
+            if result is not None:
+                return result
+
+    translating = emit is not None and PIPELINE_MODE != "direct"
+    if translating:
+        emit("stage", {"stage": "translating"})
+    question_translated = await question_for_sql(question, translator_client, cache=translation_cache)
+    if translating:
+        emit("translated", {"question": question_translated})
+
+    result = await ask_db(
+        question=question_translated,
+        engine=engine,
+        schema=version.text,
+        client=client,
+        sql_cache=sql_cache,
+        result_cache=result_cache,
+        schema_index=version.index,
+        validator=version.validator,
+        fixer=version.fixer,
+        original_question=question,
+        emit=emit,
+        page_size=page_size
+    )
+    # Empty results aren't remembered: the SQL may be what's wrong
+    if semantic_cache is not None and result.status == "success":
+        semantic_cache.set(question, version.fingerprint, model, result.sql)
+    return result
+
+
+async def answer_shared(question: str, page_size: int):
+    """answer_question, joined with an identical (normalized) question already in flight.
+    Only for callers without emit - streamed progress belongs to one client."""
+    if not QUERY_COALESCING:
+        return await answer_question(question, page_size)
+    key = f"{page_size}|{normalize_arabic(question)}"
+    return await query_flight.run(key, lambda: answer_question(question, page_size))
+
+
+def _next_page_token(result, page_size: int) -> Optional[str]:
+    if not result.has_more:
+        return None
+    return encode_page_token(result.sql, result.offset + page_size, page_size, result.binds)
+
+
+def _to_response(result, page_size: int) -> QueryResponse:
+    return QueryResponse(
+        answer=result.message,
+        status=result.status,
+        sql_query=result.sql,
+        results=result.records(),
+        cached=result.from_cache,
+        cache_age_seconds=result.cache_age,
+        offset=result.offset,
+        next_page_token=_next_page_token(result, page_size),
+        template=result.template
+    )
+
+
+def _to_compact(result, page_size: int) -> CompactQueryResponse:
+    return CompactQueryResponse(
+        answer=result.message,
+        status=result.status,
+        sql_query=result.sql,
+        columns=result.columns,
+        types=result.types,
+        rows=[list(row) for row in result.rows],
+        cached=result.from_cache,
+        cache_age_seconds=result.cache_age,
+        offset=result.offset,
+        next_page_token=_next_page_token(result, page_size),
+        template=result.template
+    )
+
+
+def _render(result, page_size: int, fmt: str):
+    """Serialize a QueryResult in the negotiated format"""
+    with STAGE_SECONDS.time(stage="serialization", model=""):
+        if fmt == COMPACT_FORMAT:
+            body = json.dumps(_to_compact(result, page_size).model_dump(), ensure_ascii=False, default=json_default)
+            return Response(content=body, media_type=COMPACT_MEDIA_TYPE)
+        if fmt == ARROW_FORMAT:
+            metadata = {
+                "answer": result.message,
+                "status": result.status,
+                "sql_query": result.sql,
+                "offset": str(result.offset),
+                "next_page_token": _next_page_token(result, page_size),
+                "template": result.template,
+            }
+            return Response(content=to_arrow_ipc(result.columns, result.rows, metadata), media_type=ARROW_MEDIA_TYPE)
+        return _to_response(result, page_size)
+
+
+_FORMAT_RESPONSES = {
+    200: {"content": {COMPACT_MEDIA_TYPE: {}, ARROW_MEDIA_TYPE: {}}}
+}
+
+
+@app.post("/query", response_model=QueryResponse, responses=_FORMAT_RESPONSES)
+async def process_query(
+    request: QueryRequest,
+    http_request: Request,
+    response_format: Optional[str] = Query(None, alias="format")
+):
+    """Main endpoint - processes natural language to SQL.
+
+    Results come as a list of dicts by default; `format=compact` (or Accept:
+    application/vnd.text-to-sql.compact+json) returns {columns, types, rows},
+    and `format=arrow` (or Accept: application/vnd.apache.arrow.stream) an Arrow IPC stream.
+    """
+
+    # Fast 503 while the schema is still loading
+    require_ready()
+
+    page_size = clamp_page_size(request.page_size)
     try:
-        question_translated = translate_question(request.question, translator_client)
-        
-        sql, message, rows_as_dict = ask_db(
-            question=question_translated, 
-            engine=engine, 
-            schema=schema, 
-            client=client
-        )
-        
-        return QueryResponse(
-            answer=message,
-            sql_query=sql,
-            results=rows_as_dict
-        )
+        result = await answer_shared(request.question, page_size)
+        return _render(result, page_size, negotiate_format(http_request.headers.get("accept"), response_format))
         
     except Exception as e:
         # Log the error for debugging in Docker logs
@@ -80,12 +418,337 @@ async def process_query(request: QueryRequest):
 
 
 
+@app.post("/query/batch", response_model=BatchResponse)
+async def process_batch(request: BatchRequest):
+    """Answer many questions at once: identical (normalized) questions run once,
+    the rest fan out with at most BATCH_CONCURRENCY in flight"""
+
+    require_ready()
+    if len(request.questions) > BATCH_MAX_QUESTIONS:
+        raise HTTPException(status_code=413, detail=f"At most {BATCH_MAX_QUESTIONS} questions per batch")
+
+    started = time.perf_counter()
+    page_size = clamp_page_size(request.page_size)
+    first_index: Dict[str, int] = {}
+    for i, question in enumerate(request.questions):
+        first_index.setdefault(normalize_arabic(question), i)
+
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def run_one(index: int) -> BatchItem:
+        question = request.questions[index]
+        async with semaphore:
+            try:
+                result = await answer_shared(question, page_size)
+                return BatchItem(question=question, ok=True, result=_to_response(result, page_size))
+            except Exception as e:
+                print(f"Error processing batch question {index}: {e}")
+                return BatchItem(question=question, ok=False, error=str(e))
+
+    unique = sorted(set(first_index.values()))
+    answers = dict(zip(unique, await asyncio.gather(*(run_one(i) for i in unique))))
+
+    items = []
+    for i, question in enumerate(request.questions):
+        first = first_index[normalize_arabic(question)]
+        if first == i:
+            items.append(answers[i])
+        else:
+            items.append(answers[first].model_copy(update={"question": question, "duplicate_of": first}))
+
+    return BatchResponse(
+        items=items,
+        unique_questions=len(unique),
+        elapsed_seconds=round(time.perf_counter() - started, 3)
+    )
+
+
+@app.post("/query/page", response_model=QueryResponse, responses=_FORMAT_RESPONSES)
+async def next_page(
+    request: PageRequest,
+    http_request: Request,
+    response_format: Optional[str] = Query(None, alias="format")
+):
+    """Fetch the next page of an earlier /query result without calling the LLM again.
+
+    Like /query, a timeout or a plan rejection comes back as a 200 with its status in the body.
+    """
+
+    require_ready()
+
+    try:
+        sql, offset, page_size, binds = decode_page_token(request.token)
+    except InvalidPageToken as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if not is_safe_sql(sql):
+        raise HTTPException(status_code=400, detail=UNSAFE_MESSAGE)
+
+    try:
+        result = await execute_sql(engine, sql, result_cache, offset=offset, page_size=page_size, binds=binds)
+    except Exception as e:
+        failure = failure_status(e)
+        if failure is None:
+            print(f"Error fetching page: {e}")
+            raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
+        result = QueryResult(sql, FAILURE_MESSAGES[failure], status=failure, offset=offset, binds=binds)
+    return _render(result, page_size, negotiate_format(http_request.headers.get("accept"), response_format))
+
+
+def _ndjson(record: dict) -> bytes:
+    return (json.dumps(record, ensure_ascii=False, default=json_default) + "\n").encode("utf-8")
+
+
+@app.post("/query/rows")
+async def stream_query_rows(
+    request: QueryRequest,
+    arraysize: int = Query(DB_ARRAYSIZE, ge=1, le=10000)
+):
+    """Streams NDJSON: a meta line with the SQL and columns, then row chunks of `arraysize`, then an end line.
+
+    At most QUERY_STREAM_MAX_ROWS rows are sent; the end line says `"truncated": true` when more were left.
+    """
+
+    require_ready()
+
+    async def open_stream():
+        """A template statement when the question fits one, else the model pipeline"""
+        match = match_template(request.question)
+        opened = await open_template_stream(engine, match, arraysize) if match is not None else None
+        if opened is not None:
+            return opened
+        question_translated = await question_for_sql(request.question, translator_client, cache=translation_cache)
+        version = schema_catalog.current
+        return await open_row_stream(
+            question=question_translated,
+            engine=engine,
+            schema=version.text,
+            client=client,
+            sql_cache=sql_cache,
+            schema_index=version.index,
+            validator=version.validator,
+            fixer=version.fixer,
+            original_question=request.question,
+            arraysize=arraysize
+        )
+
+    async def body():
+        try:
+            sql, stream, failure = await open_stream()
+        except Exception as e:
+            print(f"Error processing query: {e}")
+            yield _ndjson({"type": "error", "message": f"Internal Server Error: {str(e)}"})
+            return
+
+        if failure is not None:
+            yield _ndjson({"type": "error", "status": failure, "message": FAILURE_MESSAGES[failure], "sql_query": sql})
+            return
+
+        try:
+            yield _ndjson({"type": "meta", "answer": "success", "sql_query": sql, "columns": stream.columns})
+            while True:
+                rows = await run_in_db_thread(stream.fetch_chunk)
+                if not rows:
+                    break
+                yield _ndjson({"type": "rows", "rows": [list(row) for row in rows]})
+            end = {"type": "end", "row_count": stream.row_count, "truncated": stream.truncated}
+            if stream.truncated:
+                end["max_rows"] = stream.max_rows
+            yield _ndjson(end)
+        except QueryTimeout:
+            yield _ndjson({"type": "error", "status": "timeout", "message": TIMEOUT_MESSAGE, "row_count": stream.row_count})
+        except Exception as e:
+            print(f"Error streaming rows: {e}")
+            yield _ndjson({"type": "error", "message": f"Internal Server Error: {str(e)}"})
+        finally:
+            stream.close()
+
+    return StreamingResponse(body(), media_type="application/x-ndjson")
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=json_default)}\n\n"
+
+
+@app.post("/query/stream")
+async def stream_query_progress(
+    request: QueryRequest,
+    response_format: Optional[str] = Query(None, alias="format")
+):
+    """Server-Sent Events: one event per pipeline stage, SQL tokens as generated, then the final result"""
+
+    require_ready()
+
+    page_size = clamp_page_size(request.page_size)
+    events: asyncio.Queue = asyncio.Queue()
+    done = object()
+
+    def emit(event: str, data: dict):
+        events.put_nowait((event, data))
+
+    async def pipeline():
+        try:
+            result = await answer_question(request.question, page_size, emit=emit)
+            emit("rows_ready", {"row_count": len(result.rows), "cached": result.from_cache})
+            if response_format == COMPACT_FORMAT:
+                emit("result", _to_compact(result, page_size).model_dump())
+            else:
+                emit("result", _to_response(result, page_size).model_dump())
+        except Exception as e:
+            print(f"Error processing query: {e}")
+            emit("error", {"detail": f"Internal Server Error: {str(e)}"})
+        finally:
+            events.put_nowait(done)
+
+    async def body():
+        task = asyncio.create_task(pipeline())
+        try:
+            while True:
+                item = await events.get()
+                if item is done:
+                    break
+                yield _sse(*item)
+        finally:
+            # Client went away - stop spending model/DB time on it
+            task.cancel()
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """Hit/miss counters for the pipeline caches"""
+    return {
+        "translation": translation_cache.stats(),
+        "sql": sql_cache.stats(),
+        "results": result_cache.stats() if result_cache is not None else None,
+        "coalescing": query_flight.stats(),
+        "templates": template_matcher.stats(),
+        "semantic": semantic_cache.stats() if semantic_cache is not None else None,
+    }
+
+
+def _ping_database():
+    probe = "SELECT 1 FROM DUAL" if engine.dialect.name == "oracle" else "SELECT 1"
+    with connect(engine) as conn:
+        conn.execute(text(probe))
+
+
+@app.get("/healthz")
+async def healthz():
+    """Liveness: the process is up and serving, whatever the state of Oracle or Ollama"""
+    return {"status": "ok"}
+
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness: schema loaded, models warm (and answering their keep-alive pings)
+    and the database answering a ping"""
+    models = required_models()
+    models_ok = readiness["models"] and all(model_manager.state[name] != "failed" for name in models)
+    checks = {"schema": readiness["schema"], "models": models_ok, "database": False}
+    error = readiness["error"] or model_manager.error(models)
+    if engine is not None:
+        try:
+            await asyncio.wait_for(run_in_db_thread(_ping_database), READY_DB_TIMEOUT)
+            checks["database"] = True
+        except Exception as e:
+            error = f"database: {str(e) or 'timeout'}"
+
+    ready = all(checks.values())
+    body = {"ready": ready, "checks": checks, "models": model_manager.stats(), "error": None if ready else error}
+    return JSONResponse(body, status_code=200 if ready else 503)
+
+
+@app.get("/admin/pool")
+async def pool_stats():
+    """Live connection pool state: checked out, waiting threads and checkout wait times"""
+    return pool_status(engine)
+
+
+@app.get("/admin/models")
+async def models_status():
+    """Load state, keep_alive and last keep-alive ping of each Ollama model"""
+    return model_manager.stats()
+
+
+@app.get("/admin/schema")
+async def schema_status():
+    """Loaded schema version and refresh counters"""
+    return schema_catalog.stats()
+
+
+@app.post("/admin/schema/refresh")
+async def refresh_schema():
+    """Re-read tables whose LAST_DDL_TIME changed, without waiting for the periodic refresh"""
+    try:
+        changed = await run_in_db_thread(schema_catalog.refresh)
+    except Exception as e:
+        print(f"Schema refresh failed: {e}")
+        raise HTTPException(status_code=502, detail=f"Schema refresh failed: {str(e)}")
+    readiness["schema"] = schema_catalog.current is not None
+    return {"changed": changed, **schema_catalog.stats()}
+
+
+@app.get("/admin/semantic-cache")
+async def semantic_cache_report(limit: int = Query(20, ge=1, le=200)):
+    """Semantic cache counters and the closest recent misses, for tuning SEMANTIC_CACHE_THRESHOLD"""
+    if semantic_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **semantic_cache.report(limit)}
+
+
+@app.post("/admin/templates/reload")
+async def reload_templates():
+    """Re-read the question template file (QUESTION_TEMPLATES_PATH) without a restart"""
+    global template_matcher
+    template_matcher = build_template_matcher()
+    return template_matcher.stats()
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus scrape endpoint: per-stage latency histograms and pipeline counters"""
+    return Response(content=render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.post("/admin/cache/invalidate")
+async def invalidate_results(request: InvalidateRequest):
+    """Flush cached results that read from the given tables (all results if none given)"""
+    if result_cache is None:
+        return {"invalidated": 0, "enabled": False}
+    if request.tables:
+        count = result_cache.invalidate_tables(request.tables)
+    else:
+        count = result_cache.clear()
+    return {"invalidated": count, "enabled": True}
+
+
 @app.get("/")
 async def root():
     return {
         "message": "Database Query API",
         "endpoints": {
-            "POST /query": "Submit a natural language query"        
+            "POST /query": "Submit a natural language query",
+            "POST /query/batch": "Answer a list of questions with bounded concurrency",
+            "POST /query/page": "Next page of a /query result, by next_page_token",
+            "POST /query/rows": "Same as /query, streamed as NDJSON row chunks",
+            "POST /query/stream": "Same as /query, with Server-Sent Events progress",
+            "GET /cache/stats": "Cache hit/miss counters",
+            "GET /admin/semantic-cache": "Semantic cache stats and near misses",
+            "GET /metrics": "Prometheus metrics",
+            "GET /admin/pool": "Connection pool stats",
+            "GET /admin/models": "Ollama model load state",
+            "GET /admin/schema": "Loaded schema version",
+            "POST /admin/schema/refresh": "Reload tables changed since the last refresh",
+            "POST /admin/templates/reload": "Reload the question template file",
+            "GET /healthz": "Liveness probe",
+            "GET /readyz": "Readiness probe (schema loaded, models warm, database reachable)",
+            "POST /admin/cache/invalidate": "Flush cached results by table name"
         }
     }
 
@@ -0,0 +1,351 @@
+import os
+import re
+import time
+import json
+import sys
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Optional
+
+
+# Harakat (fathatan .. sukun) and the superscript alef
+_ARABIC_DIACRITICS = re.compile("[\u064B-\u0652\u0670]")
+_TATWEEL = "\u0640"
+_CHAR_MAP = str.maketrans({
+    "أ": "ا", "إ": "ا", "آ": "ا", "ٱ": "ا",
+    "ى": "ي", "ئ": "ي",
+    "ؤ": "و",
+    "ة": "ه",
+    "؟": "?", "،": ",", "؛": ";",
+})
+_WHITESPACE = re.compile(r"\s+")
+# Writes between sweeps of expired and surplus rows out of a cache's SQLite store
+CACHE_PRUNE_EVERY = int(os.getenv("CACHE_PRUNE_EVERY", "256"))
+
+
+def normalize_arabic(text: str) -> str:
+    """Normalize a question so spelling variants share one cache key."""
+    text = _ARABIC_DIACRITICS.sub("", text).replace(_TATWEEL, "")
+    text = text.translate(_CHAR_MAP).lower()
+    text = _WHITESPACE.sub(" ", text).strip()
+    return text.rstrip("?.!, ")
+
+
+class TTLCache:
+    """In-memory LRU cache with per-entry TTL and an optional SQLite backing store.
+
+    Values must be JSON-serializable when ``path`` is set, since the disk
+    store keeps them as JSON so hits survive restarts. Rows leave the store
+    when their entry is evicted or found expired, and every CACHE_PRUNE_EVERY
+    writes a sweep drops expired rows and keeps the newest ``maxsize``.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 3600, path: Optional[str] = None, name: str = "cache"):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.name = name
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data: "OrderedDict[str, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self._writes = 0
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                f'CREATE TABLE IF NOT EXISTS "{name}" (key TEXT PRIMARY KEY, value TEXT, created REAL)'
+            )
+            self._prune()
+
+    def _expired(self, created: float) -> bool:
+        return self.ttl is not None and self.ttl > 0 and time.time() - created > self.ttl
+
+    def _load(self, key: str):
+        row = self._db.execute(f'SELECT value, created FROM "{self.name}" WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        value, created = row
+        if self._expired(created):
+            self._db.execute(f'DELETE FROM "{self.name}" WHERE key = ?', (key,))
+            self._db.commit()
+            return None
+        return created, json.loads(value)
+
+    def _prune(self):
+        """Drop expired rows from the disk store, then all but the newest ``maxsize``."""
+        if self.ttl is not None and self.ttl > 0:
+            self._db.execute(f'DELETE FROM "{self.name}" WHERE created < ?', (time.time() - self.ttl,))
+        self._db.execute(
+            f'DELETE FROM "{self.name}" WHERE key NOT IN '
+            f'(SELECT key FROM "{self.name}" ORDER BY created DESC LIMIT ?)',
+            (self.maxsize,),
+        )
+        self._db.commit()
+
+    def _store(self, key: str, created: float, value: Any):
+        self._data[key] = (created, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            evicted, _entry = self._data.popitem(last=False)
+            self.evictions += 1
+            if self._db is not None:
+                self._db.execute(f'DELETE FROM "{self.name}" WHERE key = ?', (evicted,))
+                self._db.commit()
+
+    def get(self, key: str, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and self._expired(entry[0]):
+                del self._data[key]
+                entry = None
+                if self._db is not None:
+                    self._db.execute(f'DELETE FROM "{self.name}" WHERE key = ?', (key,))
+                    self._db.commit()
+            if entry is None and self._db is not None:
+                entry = self._load(key)
+                if entry is not None:
+                    self._store(key, *entry)
+            if entry is None:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: str, value: Any):
+        created = time.time()
+        with self._lock:
+            self._store(key, created, value)
+            if self._db is not None:
+                self._db.execute(
+                    f'INSERT OR REPLACE INTO "{self.name}" (key, value, created) VALUES (?, ?, ?)',
+                    (key, json.dumps(value, ensure_ascii=False), created),
+                )
+                self._db.commit()
+                self._writes += 1
+                if self._writes % CACHE_PRUNE_EVERY == 0:
+                    self._prune()
+
+    def delete(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
+            if self._db is not None:
+                self._db.execute(f'DELETE FROM "{self.name}" WHERE key = ?', (key,))
+                self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            if self._db is not None:
+                self._db.execute(f'DELETE FROM "{self.name}"')
+                self._db.commit()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "persistent": self._db is not None,
+        }
+
+
+def build_translation_cache() -> TTLCache:
+    return TTLCache(
+        maxsize=int(os.getenv("TRANSLATION_CACHE_SIZE", "2048")),
+        ttl=float(os.getenv("TRANSLATION_CACHE_TTL", str(7 * 24 * 3600))),
+        path=os.getenv("TRANSLATION_CACHE_PATH") or None,
+        name="translations",
+    )
+
+
+class SQLCache:
+    """Maps (normalized question, schema fingerprint, model) to SQL that ran successfully.
+
+    The whole cache is dropped as soon as a different schema fingerprint is
+    seen, so SQL written against an old schema is never served.
+    """
+
+    def __init__(self, cache: TTLCache):
+        self.cache = cache
+        self.fingerprint: Optional[str] = None
+
+    def _key(self, question: str, fingerprint: str, model: str) -> str:
+        if fingerprint != self.fingerprint:
+            if self.fingerprint is not None:
+                print("Schema fingerprint changed, clearing SQL cache")
+                self.cache.clear()
+            self.fingerprint = fingerprint
+        return f"{model}|{fingerprint}|{normalize_arabic(question)}"
+
+    def get(self, question: str, fingerprint: str, model: str) -> Optional[str]:
+        return self.cache.get(self._key(question, fingerprint, model))
+
+    def set(self, question: str, fingerprint: str, model: str, sql: str):
+        self.cache.set(self._key(question, fingerprint, model), sql)
+
+    def delete(self, question: str, fingerprint: str, model: str):
+        self.cache.delete(self._key(question, fingerprint, model))
+
+    def stats(self) -> dict:
+        return {**self.cache.stats(), "fingerprint": self.fingerprint}
+
+
+def build_sql_cache() -> SQLCache:
+    return SQLCache(TTLCache(
+        maxsize=int(os.getenv("SQL_CACHE_SIZE", "2048")),
+        ttl=float(os.getenv("SQL_CACHE_TTL", str(24 * 3600))),
+        path=os.getenv("SQL_CACHE_PATH") or None,
+        name="generated_sql",
+    ))
+
+
+_FROM_CLAUSE = re.compile(
+    r"\bFROM\b(.*?)(?=\bWHERE\b|\bGROUP\b|\bORDER\b|\bHAVING\b|\bUNION\b|\bINTERSECT\b"
+    r"|\bMINUS\b|\bCONNECT\b|\bSTART\b|\bFETCH\b|\bOFFSET\b|\(|\)|$)",
+    re.IGNORECASE | re.DOTALL,
+)
+_TABLE_REF = re.compile(r'^\s*(?:JOIN\s+)?("?[A-Za-z_][\w$#]*"?(?:\."?[A-Za-z_][\w$#]*"?)?)', re.IGNORECASE)
+_JOIN_SPLIT = re.compile(r",|\b(?:LEFT|RIGHT|FULL|INNER|CROSS|NATURAL|OUTER)?\s*\bJOIN\b", re.IGNORECASE)
+_JOIN_REF = re.compile(r'\bJOIN\s+("?[A-Za-z_][\w$#]*"?(?:\."?[A-Za-z_][\w$#]*"?)?)', re.IGNORECASE)
+_NOT_TABLES = {"SELECT", "LATERAL", "TABLE", "DUAL", "ON", "USING"}
+
+
+def referenced_tables(sql: str) -> set[str]:
+    """Best-effort set of (unqualified, uppercase) table names a SELECT reads from."""
+    names = _JOIN_REF.findall(sql)
+    for clause in _FROM_CLAUSE.findall(sql):
+        for part in _JOIN_SPLIT.split(clause):
+            match = _TABLE_REF.match(part)
+            if match:
+                names.append(match.group(1))
+    tables = {name.replace('"', "").split(".")[-1].upper() for name in names}
+    return tables - _NOT_TABLES
+
+
+def _estimate_size(value: Any) -> int:
+    """Rough recursive byte size of a rows payload, good enough for a memory budget."""
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(_estimate_size(k) + _estimate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(_estimate_size(v) for v in value)
+    return sys.getsizeof(value)
+
+
+class ResultCache:
+    """Query results keyed on the final SQL text, with TTL, a memory budget and table invalidation."""
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, ttl: float = 300):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        # key -> (created, ttl, size, tables, rows)
+        self._data: "OrderedDict[str, tuple[float, float, int, set[str], Any]]" = OrderedDict()
+        self._by_table: dict[str, set[str]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(sql: str) -> str:
+        return _WHITESPACE.sub(" ", sql).strip()
+
+    def _remove(self, key: str):
+        created, ttl, size, tables, rows = self._data.pop(key)
+        self.bytes -= size
+        for table in tables:
+            keys = self._by_table.get(table)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_table[table]
+
+    def get(self, sql: str):
+        """Return ``(rows, age_seconds)`` or ``None`` on a miss."""
+        key = self._key(sql)
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and time.time() - entry[0] > entry[1]:
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[4], time.time() - entry[0]
+
+    def set(self, sql: str, rows: Any, ttl: Optional[float] = None, source_sql: Optional[str] = None):
+        """``source_sql`` is the bare statement when ``sql`` is a decorated key (page,
+        binds): only the statement's own tables may invalidate the entry."""
+        key = self._key(sql)
+        size = _estimate_size(rows)
+        if size > self.max_bytes:
+            return
+        tables = referenced_tables(sql if source_sql is None else source_sql)
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (time.time(), self.ttl if ttl is None else ttl, size, tables, rows)
+            self.bytes += size
+            for table in tables:
+                self._by_table.setdefault(table, set()).add(key)
+            while self.bytes > self.max_bytes:
+                self._remove(next(iter(self._data)))
+                self.evictions += 1
+
+    def invalidate_tables(self, tables) -> int:
+        """Drop every entry that reads from any of ``tables``; returns how many were dropped."""
+        with self._lock:
+            keys = set()
+            for table in tables:
+                keys |= self._by_table.get(table.upper(), set())
+            for key in keys:
+                self._remove(key)
+            self.invalidations += len(keys)
+            return len(keys)
+
+    def clear(self) -> int:
+        with self._lock:
+            count = len(self._data)
+            self._data.clear()
+            self._by_table.clear()
+            self.bytes = 0
+            self.invalidations += count
+            return count
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "tables": sorted(self._by_table),
+        }
+
+
+def build_result_cache() -> Optional[ResultCache]:
+    """Result caching is opt-in (RESULT_CACHE_ENABLED=1) since it can serve stale rows."""
+    if os.getenv("RESULT_CACHE_ENABLED", "0").lower() not in ("1", "true", "yes"):
+        return None
+    return ResultCache(
+        max_bytes=int(os.getenv("RESULT_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+        ttl=float(os.getenv("RESULT_CACHE_TTL", "300")),
+    )
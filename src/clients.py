@@ -1,4 +1,7 @@
 import os
+import time
+import asyncio
+from typing import Dict, Any, List, Optional, Union
 from langchain_ollama import ChatOllama
 
 # Inside Docker, this will be http://host.docker.internal:11434
@@ -6,17 +9,113 @@ from langchain_ollama import ChatOllama
 
 
 OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+# How long Ollama keeps each model in memory after its last call ("30m", "2h"; -1 keeps it loaded for good)
+CODER_KEEP_ALIVE = os.getenv("OLLAMA_CODER_KEEP_ALIVE", "30m")
+TRANSLATOR_KEEP_ALIVE = os.getenv("OLLAMA_TRANSLATOR_KEEP_ALIVE", "30m")
+# Seconds between keep-resident pings (keep it below keep_alive); 0 disables them
+MODEL_PING_SECONDS = float(os.getenv("MODEL_PING_SECONDS", "240"))
+
+PING_PROMPT = "Reply with OK."
+
+
+def _keep_alive(value: str) -> Union[int, str]:
+    # Ollama takes a duration string or a plain number of seconds
+    return int(value) if value.lstrip("-").isdigit() else value
+
 
 def build_client() -> ChatOllama:
     return ChatOllama(
-        model="qwen2.5-coder:3b", 
+        model="qwen2.5-coder:3b",
         temperature=0,
-        base_url=OLLAMA_BASE_URL
+        base_url=OLLAMA_BASE_URL,
+        keep_alive=_keep_alive(CODER_KEEP_ALIVE)
     )
 
 def build_translate_client() -> ChatOllama:
     return ChatOllama(
-        model="qwen2.5:3b-instruct", 
+        model="qwen2.5:3b-instruct",
         temperature=0,
-        base_url=OLLAMA_BASE_URL
-    )
\ No newline at end of file
+        base_url=OLLAMA_BASE_URL,
+        keep_alive=_keep_alive(TRANSLATOR_KEEP_ALIVE)
+    )
+
+
+class ModelManager:
+    """Keeps the Ollama models resident: warm-up at startup, a ping every
+    MODEL_PING_SECONDS so keep_alive never runs out, and per-model load state
+    for /readyz.
+
+    ``clients`` maps a short role name ("coder", "translator") to its client.
+    """
+
+    def __init__(self, clients: Dict[str, ChatOllama]):
+        self.clients = clients
+        # cold -> loaded, or failed when the last ping got no reply
+        self.state = {name: "cold" for name in clients}
+        self.last_ping: Dict[str, float] = {}
+        self.last_ping_seconds: Dict[str, float] = {}
+        self.errors: Dict[str, Optional[str]] = {name: None for name in clients}
+
+    async def ping(self, name: str) -> bool:
+        """One tiny prompt; loads the model if Ollama had unloaded it."""
+        model_client = self.clients[name]
+        started = time.perf_counter()
+        try:
+            resp = await model_client.ainvoke(PING_PROMPT)
+            ok = bool(str(getattr(resp, "content", "")).strip())
+            error = None if ok else "empty reply"
+        except Exception as e:
+            ok, error = False, str(e) or type(e).__name__
+        self.last_ping[name] = time.time()
+        self.last_ping_seconds[name] = round(time.perf_counter() - started, 3)
+        self.state[name] = "loaded" if ok else "failed"
+        self.errors[name] = error
+        if not ok:
+            print(f"Model ping failed for {self.model(name)}: {error}")
+        return ok
+
+    async def warm(self, names: List[str], retry_seconds: float):
+        """Ping until every model in ``names`` has answered once."""
+        pending = list(names)
+        while pending:
+            results = await asyncio.gather(*(self.ping(name) for name in pending))
+            for name, ok in zip(list(pending), results):
+                if ok:
+                    print(f"Model warm: {self.model(name)} ({self.last_ping_seconds[name]}s)")
+                    pending.remove(name)
+            if pending:
+                await asyncio.sleep(retry_seconds)
+
+    async def keep_resident(self, names: List[str], retry_seconds: float):
+        """Ping forever; a model that didn't answer is retried sooner than the regular interval."""
+        while MODEL_PING_SECONDS > 0:
+            failed = [name for name in names if self.state[name] != "loaded"]
+            await asyncio.sleep(retry_seconds if failed else MODEL_PING_SECONDS)
+            await asyncio.gather(*(self.ping(name) for name in names))
+
+    def model(self, name: str) -> str:
+        return getattr(self.clients[name], "model", name)
+
+    def ready(self, names: List[str]) -> bool:
+        return all(self.state[name] == "loaded" for name in names)
+
+    def error(self, names: List[str]) -> Optional[str]:
+        errors = [f"{self.model(name)}: {self.errors[name]}" for name in names if self.errors[name]]
+        return "models: " + "; ".join(errors) if errors else None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            name: {
+                "model": self.model(name),
+                "state": self.state[name],
+                "keep_alive": getattr(model_client, "keep_alive", None),
+                "last_ping": self.last_ping.get(name),
+                "last_ping_seconds": self.last_ping_seconds.get(name),
+                "error": self.errors[name],
+            }
+            for name, model_client in self.clients.items()
+        }
+
+
+def build_model_manager(client: ChatOllama, translator_client: ChatOllama) -> ModelManager:
+    return ModelManager({"coder": client, "translator": translator_client})
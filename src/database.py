@@ -1,33 +1,135 @@
-from typing import List, Dict, Any
-from decimal import Decimal
+import os
+import json
+import asyncio
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from functools import partial
+from typing import List, Dict, Any, Optional, Callable
 from sqlalchemy import text
 from langchain_ollama import ChatOllama
+from src.cache import TTLCache, SQLCache, ResultCache, normalize_arabic
+from src.pagination import PAGE_SIZE, paginate_sql
+from src.serialization import convert_columns, to_records
+from src.sql_validator import SQLValidator, SQLValidationError, check_read_only
+from src.sql_fixer import SQLFixer, oracle_error_code
+from src.question_templates import TemplateMatch
+from src.semantic_cache import SemanticCache, SemanticHit
+from src.pool import connect, raw_connect
+from src.plan_guard import (
+    PlanRejected, QueryTimeout, QueryCancelled, QueryCanceller, PLAN_GUARD_MODE,
+    plan_guard_enabled, check_plan, set_call_timeout, is_call_timeout
+)
+from src.metrics import (
+    STAGE_SECONDS, UNSAFE_SQL, EMPTY_RESULTS, RETRIES, LOCAL_REJECTIONS,
+    PLAN_REJECTIONS, QUERY_TIMEOUTS, SPECULATIVE_RUNS, SPECULATIVE_CANDIDATES,
+    SQL_FIXES, REPAIRS_AVOIDED, ORACLE_ERRORS
+)
+
+
+# Oracle calls are blocking, so they run on a bounded pool of worker threads
+# instead of the event loop. DB_POOL_SIZE (src/pool.py) defaults to the same number.
+DB_MAX_WORKERS = int(os.getenv("DB_MAX_WORKERS", "8"))
+db_executor = ThreadPoolExecutor(max_workers=DB_MAX_WORKERS, thread_name_prefix="oracle")
+# Rows per fetchmany round trip for streamed results
+DB_ARRAYSIZE = int(os.getenv("DB_ARRAYSIZE", "500"))
+# Most rows a streamed result returns; the cursor is closed once it is reached
+QUERY_STREAM_MAX_ROWS = int(os.getenv("QUERY_STREAM_MAX_ROWS", "100000"))
+# translate: Arabic -> English with the translator model, then SQL from the coder model (two calls)
+# direct: the coder model reads the Arabic question itself (one call, one model in memory)
+PIPELINE_MODE = os.getenv("PIPELINE_MODE", "translate").lower()
+# SQL candidates generated and executed in parallel per question; 1 keeps the
+# sequential generate -> execute -> repair loop
+SQL_CANDIDATES = int(os.getenv("SQL_CANDIDATES", "1"))
+# Sampling temperature of each candidate (cycled when there are more candidates than values)
+SQL_CANDIDATE_TEMPERATURES = [
+    float(t) for t in os.getenv("SQL_CANDIDATE_TEMPERATURES", "0,0.3,0.6,0.9").split(",") if t.strip()
+]
+# Optimizer cost above which a candidate is dropped before it runs (Oracle only; 0 = PLAN_GUARD limits only)
+SQL_CANDIDATE_MAX_COST = float(os.getenv("SQL_CANDIDATE_MAX_COST", "0"))
+# Rule-based clean-up of generated SQL, and local fixes for errors it recognises, before any repair prompt
+SQL_FIXER = os.getenv("SQL_FIXER", "1") == "1"
+# Local fix rounds per question (each one can uncover the next problem, e.g. a table name then its columns)
+SQL_FIX_ROUNDS = int(os.getenv("SQL_FIX_ROUNDS", "3"))
+
+
+@dataclass
+class QueryResult:
+    sql: str
+    message: str
+    rows: List[tuple] = field(default_factory=list)
+    columns: List[str] = field(default_factory=list)
+    types: List[str] = field(default_factory=list)
+    from_cache: bool = False
+    cache_age: Optional[float] = None
+    offset: int = 0
+    has_more: bool = False
+    status: str = "success"
+    # Set when the SQL came from a question template rather than the model
+    template: Optional[str] = None
+    binds: Dict[str, Any] = field(default_factory=dict)
+
+    def records(self) -> List[Dict[str, Any]]:
+        return to_records(self.columns, self.rows)
+
+
+async def run_in_db_thread(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(db_executor, partial(func, *args, **kwargs))
+
+
+def _content_text(content) -> str:
+    if isinstance(content, list):
+        content = "".join(
+            part.get("text", "") if isinstance(part, dict) else str(part)
+            for part in content
+        )
+    return content or ""
 
+async def chat_once(prompt: str, client: ChatOllama, on_token: Optional[Callable[[str], None]] = None,
+                    **kwargs) -> str:
+    """Single model call. With ``on_token`` the reply is streamed and each chunk passed to it.
 
-def chat_once(prompt: str, client: ChatOllama) -> str:
+    ``kwargs`` go to the model call as is, e.g. ``options={"temperature": 0.6}``.
+    """
     try:
-        resp = client.invoke(prompt) 
-        content = getattr(resp, "content", "")
-        if isinstance(content, list):
-            content = "".join(
-                part.get("text", "") if isinstance(part, dict) else str(part)
-                for part in content
-            )
-        return content or ""
+        if on_token is None:
+            resp = await client.ainvoke(prompt, **kwargs)
+            return _content_text(getattr(resp, "content", ""))
+
+        parts = []
+        async for chunk in client.astream(prompt, **kwargs):
+            token = _content_text(getattr(chunk, "content", ""))
+            if token:
+                parts.append(token)
+                on_token(token)
+        return "".join(parts)
     except Exception as e:
         print("Ollama call failed:", e)
         return ""
 
-def translate_question(question: str, client: ChatOllama) -> str:
-    """Translate Arabic to English only if needed, keep English as-is."""
-
+def has_arabic(text: str) -> bool:
     # Quick heuristic: Arabic has these common characters
-    arabic_chars = any(0x0600 <= ord(c) <= 0x06FF for c in question)
+    return any(0x0600 <= ord(c) <= 0x06FF for c in text)
 
-    if not arabic_chars:
+async def translate_question(question: str, client: ChatOllama, cache: Optional[TTLCache] = None) -> str:
+    """Translate Arabic to English only if needed, keep English as-is.
+
+    When a cache is given, translations are looked up by the normalized
+    Arabic text so spelling variants of the same question skip the model.
+    """
+
+    if not has_arabic(question):
         print(f"English question (kept original): '{question}'")
         return question
 
+    cache_key = normalize_arabic(question)
+    if cache is not None:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            print(f" Translation cache hit: '{cached}'")
+            return cached
+
     print(f" Arabic detected, translating...")
     prompt = f"""Translate ONLY this Arabic question to clear English for SQL querying.
 
@@ -37,62 +139,122 @@ Arabic: {question}
 
 English:"""
 
-    english = chat_once(prompt, client).strip()
+    model = getattr(client, "model", "")
+    with STAGE_SECONDS.time(stage="translation", model=model) as labels:
+        english = (await chat_once(prompt, client)).strip()
 
-    # Retry if bad translation
-    if not english or len(english) < 5 or "?" not in english:
-        prompt = f"""Translate ONLY: {question}
+        # Retry if bad translation
+        if not english or len(english) < 5 or "?" not in english:
+            RETRIES.inc(kind="translation", model=model)
+            prompt = f"""Translate ONLY: {question}
 
 
 One English question:"""
-        english = chat_once(prompt, client).strip()
+            english = (await chat_once(prompt, client)).strip()
+        if not english:
+            labels["outcome"] = "empty"
 
     print(f" Translated: '{english}'")
+    if cache is not None and english:
+        cache.set(cache_key, english)
     return english
 
 
 
-def extract_oracle_schema(engine, schema="HR") -> str:
+def _table_filter(tables: Optional[List[str]]) -> str:
+    if tables is None:
+        return ""
+    # Oracle allows at most 1000 items per IN list
+    names = [t.replace("'", "''") for t in tables]
+    chunks = [", ".join(f"'{n}'" for n in names[i:i + 1000]) for i in range(0, len(names), 1000)]
+    return " AND (" + " OR ".join(f"table_name IN ({chunk})" for chunk in chunks) + ")"
+
+async def question_for_sql(question: str, translator_client: ChatOllama, cache: Optional[TTLCache] = None,
+                           mode: str = PIPELINE_MODE) -> str:
+    """The question text generate_sql should see under the given pipeline mode."""
+    if mode == "direct":
+        return question
+    return await translate_question(question, translator_client, cache)
+
+
+
+def extract_oracle_catalog(engine, schema="HR", tables: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+    """Tables of the owner with their columns, types and comments.
+
+    ``tables`` limits the scan to those names, for incremental refreshes.
+    """
+    if tables is not None and not tables:
+        return {}
+    table_filter = _table_filter(tables)
     query = f"""
     SELECT
         table_name,
         column_name,
         data_type
     FROM all_tab_columns
-    WHERE owner = '{schema}'
+    WHERE owner = '{schema}'{table_filter}
     ORDER BY table_name, column_id
     """
+    table_comments_query = f"""
+    SELECT table_name, comments
+    FROM all_tab_comments
+    WHERE owner = '{schema}' AND comments IS NOT NULL{table_filter}
+    """
+    column_comments_query = f"""
+    SELECT table_name, column_name, comments
+    FROM all_col_comments
+    WHERE owner = '{schema}' AND comments IS NOT NULL{table_filter}
+    """
 
-    schema_dict = {}
+    catalog: Dict[str, Dict[str, Any]] = {}
 
     with engine.connect() as conn:
         rows = conn.exec_driver_sql(query).fetchall()
+        table_comments = conn.exec_driver_sql(table_comments_query).fetchall()
+        column_comments = conn.exec_driver_sql(column_comments_query).fetchall()
 
     for table, column, dtype in rows:
-        schema_dict.setdefault(table, []).append(f"{column} {dtype}")
+        entry = catalog.setdefault(table, {"columns": [], "comment": None, "column_comments": {}})
+        entry["columns"].append((column, dtype))
 
-    schema_text = []
-    for table, cols in schema_dict.items():
-        schema_text.append(
-            f"{table} ({', '.join(cols)})"
-        )
+    for table, comment in table_comments:
+        if table in catalog:
+            catalog[table]["comment"] = comment
 
-    return "\n".join(schema_text)
+    for table, column, comment in column_comments:
+        if table in catalog:
+            catalog[table]["column_comments"][column] = comment
 
-def generate_sql(question: str, schema: str, client: ChatOllama) -> str:
-    prompt = f"""
-You are an expert Oracle SQL assistant for the HR database.
+    return catalog
 
-SCHEMA:
-{schema}
+def extract_ddl_times(engine, schema="HR") -> Dict[str, str]:
+    """LAST_DDL_TIME of every table and view of the owner - cheap to poll for schema changes."""
+    query = f"""
+    SELECT object_name, last_ddl_time
+    FROM all_objects
+    WHERE owner = '{schema}' AND object_type IN ('TABLE', 'VIEW')
+    """
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql(query).fetchall()
+    return {name: str(ddl_time) for name, ddl_time in rows}
 
-IMPORTANT TABLES:
-- EMPLOYEES (EMPLOYEE_ID, FIRST_NAME, LAST_NAME, SALARY, DEPARTMENT_ID, JOB_ID, HIRE_DATE)
-- DEPARTMENTS (DEPARTMENT_ID, DEPARTMENT_NAME, LOCATION_ID)
-- JOBS (JOB_ID, JOB_TITLE, MIN_SALARY, MAX_SALARY)
-- LOCATIONS (LOCATION_ID, CITY, COUNTRY_ID)
-- COUNTRIES (COUNTRY_ID, COUNTRY_NAME, REGION_ID)
-- REGIONS (REGION_ID, REGION_NAME)
+def format_table(table: str, entry: Dict[str, Any]) -> str:
+    return f"{table} ({', '.join(f'{column} {dtype}' for column, dtype in entry['columns'])})"
+
+def format_schema(catalog: Dict[str, Dict[str, Any]]) -> str:
+    return "\n".join(format_table(table, entry) for table, entry in catalog.items())
+
+def extract_oracle_schema(engine, schema="HR") -> str:
+    return format_schema(extract_oracle_catalog(engine, schema))
+
+def schema_fingerprint(schema: str) -> str:
+    """Short stable hash of the schema text, used to key generated SQL."""
+    return hashlib.sha256(schema.encode("utf-8")).hexdigest()[:16]
+
+# Static instructions, sent first and byte-for-byte identical on every call so
+# Ollama's prompt cache can reuse them. The schema follows: the full schema
+# extends the reusable prefix, a pruned one (schema_index) at least keeps the rules.
+SQL_PROMPT_PREFIX = """You are an expert Oracle SQL assistant for the HR database.
 
 RULES:
 - Use Oracle SQL syntax only.
@@ -107,91 +269,719 @@ RULES:
 - Table and column names are UPPERCASE.
 - DO NOT end the SQL statement with a semicolon (;).
 
+IMPORTANT TABLES:
+- EMPLOYEES (EMPLOYEE_ID, FIRST_NAME, LAST_NAME, SALARY, DEPARTMENT_ID, JOB_ID, HIRE_DATE)
+- DEPARTMENTS (DEPARTMENT_ID, DEPARTMENT_NAME, LOCATION_ID)
+- JOBS (JOB_ID, JOB_TITLE, MIN_SALARY, MAX_SALARY)
+- LOCATIONS (LOCATION_ID, CITY, COUNTRY_ID)
+- COUNTRIES (COUNTRY_ID, COUNTRY_NAME, REGION_ID)
+- REGIONS (REGION_ID, REGION_NAME)
+"""
+
+ARABIC_RULE = (
+    "The question is in Arabic (possibly Egyptian dialect). Understand it, "
+    "but write table and column names exactly as in the schema.\n"
+)
+
 
-Question:
+def sql_prompt(question: str, schema: str) -> str:
+    """Static rules, then the schema (stable between refreshes), then the per-question part."""
+    # Direct mode hands the model the Arabic question as asked
+    language_rule = ARABIC_RULE if has_arabic(question) else ""
+    return f"""{SQL_PROMPT_PREFIX}
+SCHEMA:
+{schema}
+
+{language_rule}Question:
 {question}
 
 SQL:
 """
-    sql = chat_once(prompt, client).strip().strip("`")
+
+
+async def generate_sql(question: str, schema: str, client: ChatOllama,
+                       on_token: Optional[Callable[[str], None]] = None,
+                       temperature: Optional[float] = None) -> str:
+    prompt = sql_prompt(question, schema)
+    # Ollama takes sampling settings as one options dict, which replaces the client's
+    kwargs = {"options": {"temperature": temperature}} if temperature is not None else {}
+    with STAGE_SECONDS.time(stage="generation", model=getattr(client, "model", "")) as labels:
+        sql = (await chat_once(prompt, client, on_token, **kwargs)).strip().strip("`")
+        if not sql:
+            labels["outcome"] = "empty"
     return sql
 
 def is_safe_sql(sql: str) -> bool:
-    """Block all DML/DDL - allow SELECT only for Oracle."""
-    sql_upper = sql.strip().upper()
-    
-    dangerous = [
-        'INSERT', 'UPDATE', 'DELETE', 'DROP', 'ALTER', 'CREATE', 
-        'TRUNCATE', 'ATTACH', 'DETACH', 'REINDEX', 'ANALYZE',
-        'PRAGMA', 'BEGIN', 'COMMIT', 'ROLLBACK', 'SAVEPOINT'
-    ]
-    
-    for keyword in dangerous:
-        if sql_upper.startswith(keyword):
-            return False
-    
-    # Must start with SELECT
-    return sql_upper.startswith('SELECT')
-
-def ask_db(
-    question: str,
-    engine,                
-    schema: str,
-    client                 
-) -> tuple[str, str, List[Dict[str, Any]]]:
-    
-    
-    sql = ""
-    rows_as_dict: List[Dict[str, Any]] = []
-    message = "success"
-    error_msg = None
+    """Block all DML/DDL - allow a single SELECT (or WITH ... SELECT) statement only.
 
+    The text is tokenized, so keywords inside string literals don't count and
+    a second statement after a semicolon is caught anywhere in the text.
+    """
+    try:
+        check_read_only(sql)
+    except SQLValidationError:
+        return False
+    return True
+
+def guard_plan(dbapi_conn, sql: str, params: Optional[Dict[str, Any]] = None,
+               max_cost: Optional[float] = None):
+    """EXPLAIN the statement and raise PlanRejected if the optimizer expects it to be too heavy."""
+    with STAGE_SECONDS.time(stage="explain", model="") as labels:
+        try:
+            check_plan(dbapi_conn, sql, params, max_cost)
+        except PlanRejected as e:
+            labels["outcome"] = "rejected"
+            PLAN_REJECTIONS.inc(reason=e.reason)
+            raise
+
+def _timeout(error: Exception) -> QueryTimeout:
+    QUERY_TIMEOUTS.inc()
+    print("Query cancelled by call timeout:\n", error)
+    return QueryTimeout(str(error))
+
+def run_query(engine, sql: str, params: Optional[Dict[str, Any]] = None,
+              canceller: Optional[QueryCanceller] = None,
+              max_cost: Optional[float] = None, plan_sql: Optional[str] = None,
+              plan_params: Optional[Dict[str, Any]] = None) -> tuple[List[str], List[str], List[tuple]]:
+    """Execute a SELECT and return ``(columns, types, rows)``. Blocking - call via run_in_db_thread.
+
+    Raises PlanRejected when the plan guard is on (or ``max_cost`` is given) and
+    the estimate is over the limits, QueryTimeout when the statement outlives
+    DB_CALL_TIMEOUT_MS and QueryCancelled when ``canceller`` interrupted it.
+    ``plan_sql``/``plan_params`` are what gets EXPLAINed instead, when ``sql``
+    is a page of it: a row cap would hide the cardinality of the whole query.
+    """
+    with connect(engine) as conn:
+        set_call_timeout(conn.connection)
+        if canceller is not None:
+            canceller.attach(conn.connection)
+        try:
+            if plan_guard_enabled(engine.dialect.name, max_cost):
+                if plan_sql is None:
+                    plan_sql, plan_params = sql, params
+                guard_plan(conn.connection, plan_sql, plan_params, max_cost)
+            with STAGE_SECONDS.time(stage="execution", model="") as labels:
+                try:
+                    result = conn.execute(text(sql), params or {})
+                    columns = list(result.keys())
+                    rows = [tuple(row) for row in result.fetchall()]
+                except Exception as e:
+                    cancelled = canceller is not None and canceller.cancelled
+                    if not cancelled and not is_call_timeout(e):
+                        raise
+                    labels["outcome"] = "cancelled" if cancelled else "timeout"
+                    # A cancelled call can leave the session unusable - don't hand it back to the pool
+                    conn.invalidate()
+                    if cancelled:
+                        raise QueryCancelled(str(e)) from e
+                    raise _timeout(e) from e
+        finally:
+            if canceller is not None:
+                canceller.detach()
+    types, rows = convert_columns(columns, rows)
+    return columns, types, rows
+
+async def execute_sql(engine, sql: str, result_cache: Optional[ResultCache] = None,
+                      offset: int = 0, page_size: int = PAGE_SIZE,
+                      canceller: Optional[QueryCanceller] = None,
+                      max_cost: Optional[float] = None,
+                      binds: Optional[Dict[str, Any]] = None) -> QueryResult:
+    """Run one page of SQL off the event loop, serving from the result cache when possible.
+
+    The query is wrapped in a server-side row cap, so a runaway join never
+    brings more than ``page_size + 1`` rows into Python. ``canceller`` and
+    ``max_cost`` are passed through to run_query; ``binds`` are the values of
+    the statement's own bind variables (template SQL). The plan guard checks
+    ``sql`` itself, not the page.
+    """
+    paged_sql = paginate_sql(sql, engine.dialect.name)
+    params = {**(binds or {}), "offset": offset, "limit": page_size + 1}
+    cache_key = f"{sql}\n-- offset={offset} limit={page_size}"
+    if binds:
+        cache_key += " binds=" + json.dumps(binds, sort_keys=True, ensure_ascii=False, default=str)
+
+    cached = result_cache.get(cache_key) if result_cache is not None else None
+    if cached is not None:
+        (columns, types, rows), age = cached
+        from_cache, cache_age = True, round(age, 3)
+    else:
+        columns, types, rows = await run_in_db_thread(
+            run_query, engine, paged_sql, params, canceller, max_cost, sql, binds
+        )
+        if result_cache is not None:
+            result_cache.set(cache_key, (columns, types, rows), source_sql=sql)
+        from_cache, cache_age = False, None
+
+    return QueryResult(
+        sql, "success", rows[:page_size], columns, types,
+        from_cache=from_cache, cache_age=cache_age,
+        offset=offset, has_more=len(rows) > page_size, binds=dict(binds or {}),
+    )
+
+UNSAFE_MESSAGE = "الاستعلام غير آمن ولا يمكن تنفيذه"
+ERROR_MESSAGE = "حدث خطأ أثناء تنفيذ الاستعلام"
+EMPTY_MESSAGE = "لا توجد بيانات متاحة لهذا الطلب"
+TIMEOUT_MESSAGE = "استغرق الاستعلام وقتًا أطول من المسموح به وتم إيقافه"
+EXPENSIVE_MESSAGE = "الاستعلام مكلف جدًا ولا يمكن تنفيذه"
+
+# Failure statuses returned by run_with_repair, with the message shown to the user
+FAILURE_MESSAGES = {
+    "unsafe": UNSAFE_MESSAGE,
+    "error": ERROR_MESSAGE,
+    "timeout": TIMEOUT_MESSAGE,
+    "too_expensive": EXPENSIVE_MESSAGE,
+}
+
+
+@dataclass
+class SQLContext:
+    """Everything needed to turn one question into SQL."""
+    question: str
+    prompt_schema: str
+    fingerprint: str
+    model: str
+    validator: Optional[SQLValidator] = None
+    fixer: Optional[SQLFixer] = None
+
+
+def prepare_question(question: str, schema: str, client, schema_index=None,
+                     original_question: Optional[str] = None,
+                     validator: Optional[SQLValidator] = None,
+                     fixer: Optional[SQLFixer] = None) -> SQLContext:
     question = question.strip("“”\"").strip(".")
+    if schema_index is not None:
+        # Prompt carries only the tables this question needs; the cache key
+        # still tracks the full schema
+        fingerprint = schema_index.fingerprint
+        prompt_schema = schema_index.prompt_schema(f"{original_question or ''} {question}")
+    else:
+        fingerprint = schema_fingerprint(schema)
+        prompt_schema = schema
+    return SQLContext(question, prompt_schema, fingerprint, getattr(client, "model", ""), validator, fixer)
+
+async def repair_sql(sql: str, error_msg: str, client: ChatOllama,
+                     error_source: str = "The Oracle database returned this error") -> str:
+    repair_prompt = f"""
+You wrote this SQL:
 
-    for attempt in range(2):
-        sql = generate_sql(question, schema, client).rstrip(";")
-        print("Raw SQL from model:\n", sql)
+{sql}
 
+{error_source}:
+{error_msg}
+
+Rewrite the query to fix the error.
+Return ONLY valid Oracle SELECT SQL.
+Do NOT use semicolons at the end.
+"""
+    model = getattr(client, "model", "")
+    RETRIES.inc(kind="repair", model=model)
+    with STAGE_SECONDS.time(stage="repair", model=model) as labels:
+        sql = (await chat_once(repair_prompt, client)).strip().strip("`").rstrip(";")
+        if not sql:
+            labels["outcome"] = "empty"
+    print("Repaired SQL from model:\n", sql)
+    return sql
+
+def _no_emit(event: str, data: dict):
+    pass
+
+# What the repair prompt says the error came from, by failure source
+REPAIR_SOURCES = {
+    "validator": "A check against the schema found these problems",
+    "plan": "EXPLAIN PLAN estimated this query as too expensive",
+    "database": "The Oracle database returned this error",
+}
+
+async def _run_cached(ctx: SQLContext, execute, sql_cache: Optional[SQLCache], emit):
+    """Run SQL cached for this question. ``(sql, value, failure)``, or None when there is none or it failed."""
+    if sql_cache is None:
+        return None
+    cached_sql = sql_cache.get(ctx.question, ctx.fingerprint, ctx.model)
+    if cached_sql is None:
+        return None
+    print("SQL cache hit:\n", cached_sql)
+    emit("sql", {"sql": cached_sql, "source": "cache"})
+    emit("executing", {"sql": cached_sql})
+    try:
+        return cached_sql, await execute(cached_sql), None
+    except QueryTimeout:
+        return cached_sql, None, "timeout"
+    except Exception as e:
+        print("Cached SQL failed, regenerating:\n", e)
+        sql_cache.delete(ctx.question, ctx.fingerprint, ctx.model)
+        return None
+
+_BASIC_FIXER = SQLFixer()
+
+def _normalize(ctx: SQLContext, sql: str, emit) -> str:
+    """Run the SQL_FIXER clean-up rules (fences, LIMIT, quoting...) over generated SQL."""
+    if not SQL_FIXER:
+        return sql
+    fixed, rules = (ctx.fixer or _BASIC_FIXER).normalize(sql)
+    if rules:
+        for rule in rules:
+            SQL_FIXES.inc(rule=rule, stage="normalize")
+        print(f"SQL normalized ({', '.join(rules)}):\n", fixed)
+        emit("sql", {"sql": fixed, "source": "fixer", "rules": rules})
+    return fixed
+
+def _fix_locally(ctx: SQLContext, sql: str, error: str, emit) -> Optional[tuple]:
+    """``(sql, rules)`` when a rule recognises the validator/Oracle error, else None (time for the model)."""
+    if not SQL_FIXER:
+        return None
+    fixed = (ctx.fixer or _BASIC_FIXER).fix_error(sql, error)
+    if fixed is None:
+        return None
+    sql, rules = fixed
+    for rule in rules:
+        SQL_FIXES.inc(rule=rule, stage="error")
+    print(f"SQL fixed locally ({', '.join(rules)}):\n", sql)
+    emit("sql", {"sql": sql, "source": "fixer", "rules": rules})
+    return sql, rules
+
+async def _execute_with_repair(ctx: SQLContext, client, execute, sql: str, emit, first_attempt: int = 0,
+                               local_fixes: Optional[List[str]] = None):
+    """Check and run ``sql``, with one repair round; ``first_attempt=1`` skips straight to the last try.
+
+    Errors the SQL fixer recognises are rewritten locally first (up to
+    SQL_FIX_ROUNDS times) without using up the repair. ``local_fixes`` are
+    rules already applied to ``sql``, counted in REPAIRS_AVOIDED if it runs.
+    """
+    local_fixes = list(local_fixes or [])
+    fix_rounds = 0
+    attempt = first_attempt
+    while attempt < 2:
+        sql = _normalize(ctx, sql, emit)
         if not is_safe_sql(sql):
-            message = "الاستعلام غير آمن ولا يمكن تنفيذه"
-            return sql, message, []
+            UNSAFE_SQL.inc(model=ctx.model)
+            return sql, None, "unsafe"
+
+        if ctx.validator is not None and attempt == 0:
+            try:
+                ctx.validator.validate(sql)
+            except SQLValidationError as e:
+                LOCAL_REJECTIONS.inc(kind=e.kind, model=ctx.model)
+                print("Local validation failed:\n", e)
+                fixed = _fix_locally(ctx, sql, str(e), emit) if fix_rounds < SQL_FIX_ROUNDS else None
+                if fixed is not None:
+                    fix_rounds += 1
+                    sql, rules = fixed
+                    local_fixes += rules
+                    continue  # check the rewrite before spending a model call
+                emit("repair", {"attempt": attempt + 1, "error": str(e), "source": "validator"})
+                sql = await repair_sql(sql, str(e), client, REPAIR_SOURCES["validator"])
+                emit("sql", {"sql": sql, "source": "repair"})
+                local_fixes = []
+                attempt += 1
+                continue
 
         try:
-            with engine.connect() as conn:
-                result = conn.execute(text(sql))
-                columns = result.keys()
-                rows_as_dict = [
-                    {col: float(val) if isinstance(val, Decimal) else val
-                     for col, val in zip(columns, row)}
-                    for row in result.fetchall()
-                ]
-
+            emit("executing", {"sql": sql})
+            value = await execute(sql)
             break  # success
 
+        except QueryTimeout:
+            # Another model round would most likely just time out again
+            return sql, None, "timeout"
+
+        except PlanRejected as e:
+            print("Plan rejected:\n", e)
+            if attempt == 0 and PLAN_GUARD_MODE == "repair":
+                emit("repair", {"attempt": attempt + 1, "error": str(e), "source": "plan"})
+                sql = await repair_sql(sql, str(e), client, REPAIR_SOURCES["plan"])
+                emit("sql", {"sql": sql, "source": "repair"})
+                local_fixes = []
+            else:
+                return sql, None, "too_expensive"
+
         except Exception as e:
             error_msg = str(e)
             print("Execution failed:\n", error_msg)
+            code = oracle_error_code(error_msg)
+            if code:
+                ORACLE_ERRORS.inc(code=code)
+
+            fixed = _fix_locally(ctx, sql, error_msg, emit) if fix_rounds < SQL_FIX_ROUNDS else None
+            if fixed is not None:
+                fix_rounds += 1
+                sql, rules = fixed
+                local_fixes += rules
+                continue  # same attempt: a rule fix doesn't use up the repair
 
             if attempt == 0:
-                repair_prompt = f"""
-You wrote this SQL:
+                emit("repair", {"attempt": attempt + 1, "error": error_msg})
+                sql = await repair_sql(sql, error_msg, client)
+                emit("sql", {"sql": sql, "source": "repair"})
+                local_fixes = []
+            else:
+                return sql, None, "error"
+        attempt += 1
+
+    for rule in dict.fromkeys(local_fixes):
+        REPAIRS_AVOIDED.inc(rule=rule)
+    return sql, value, None
+
+async def run_with_repair(ctx: SQLContext, client, execute, sql_cache: Optional[SQLCache] = None,
+                          emit: Optional[Callable[[str, dict], None]] = None):
+    """Get SQL for the question (cache first, then the model) and run ``execute(sql)``.
+
+    SQL is checked against the catalog locally first (when the context has a
+    validator), so unknown tables/columns go to repair without an Oracle round
+    trip; on the last attempt those findings are advisory and Oracle decides.
+    A database error gets one LLM repair attempt, and so does a query the plan
+    guard finds too expensive when PLAN_GUARD=repair. Returns ``(sql, value, failure)``
+    where ``failure`` is None on success, else a FAILURE_MESSAGES status. Progress
+    is reported through ``emit(event, data)`` when given.
+    """
+    emit = emit or _no_emit
+    cached = await _run_cached(ctx, execute, sql_cache, emit)
+    if cached is not None:
+        return cached
+
+    emit("stage", {"stage": "generating"})
+    on_token = (lambda token: emit("sql_token", {"token": token})) if emit is not _no_emit else None
+    sql = (await generate_sql(ctx.question, ctx.prompt_schema, client, on_token)).rstrip(";")
+    print("Raw SQL from model:\n", sql)
+    emit("sql", {"sql": sql, "source": "model"})
+
+    sql, value, failure = await _execute_with_repair(ctx, client, execute, sql, emit)
+    if failure is None and sql_cache is not None:
+        sql_cache.set(ctx.question, ctx.fingerprint, ctx.model, sql)
+    return sql, value, failure
+
+def _check_candidate(ctx: SQLContext, sql: str, emit) -> tuple:
+    """``(sql, rejection)``: the candidate after the fixer rules, and ``(status, error, source)``
+    when it still fails the local checks (None when it is fit to run)."""
+    sql = _normalize(ctx, sql, emit)
+    if not is_safe_sql(sql):
+        UNSAFE_SQL.inc(model=ctx.model)
+        return sql, ("unsafe", None, None)
+    rounds = 0
+    while ctx.validator is not None:
+        try:
+            ctx.validator.validate(sql)
+            break
+        except SQLValidationError as e:
+            LOCAL_REJECTIONS.inc(kind=e.kind, model=ctx.model)
+            fixed = _fix_locally(ctx, sql, str(e), emit) if rounds < SQL_FIX_ROUNDS else None
+            if fixed is None:
+                return sql, ("error", str(e), "validator")
+            rounds += 1
+            sql = fixed[0]
+    return sql, None
+
+async def run_speculative(ctx: SQLContext, client, execute, sql_cache: Optional[SQLCache] = None,
+                          emit: Optional[Callable[[str, dict], None]] = None,
+                          candidates: int = SQL_CANDIDATES):
+    """run_with_repair, with the repair round trip replaced by parallel candidates.
+
+    ``candidates`` SQL candidates are generated at once (one per
+    SQL_CANDIDATE_TEMPERATURES value); each is checked locally as it arrives
+    and the valid ones run in parallel through ``execute(sql, canceller)``.
+    The first non-empty result wins and everything still generating or running
+    is cancelled, down to the Oracle call. If no candidate returns rows, an
+    empty success is returned; if all failed, the earliest repairable failure
+    gets the usual single repair. Same return value as run_with_repair.
+    """
+    emit = emit or _no_emit
+    cached = await _run_cached(ctx, execute, sql_cache, emit)
+    if cached is not None:
+        return cached
+
+    emit("stage", {"stage": "generating", "candidates": candidates})
+    temperatures = SQL_CANDIDATE_TEMPERATURES or [0.0]
+    generating = {
+        asyncio.ensure_future(generate_sql(ctx.question, ctx.prompt_schema, client,
+                                           temperature=temperatures[i % len(temperatures)])): i
+        for i in range(candidates)
+    }
+    executing: Dict[asyncio.Future, tuple] = {}  # task -> (candidate, sql, canceller)
+    seen = set()
+    failures = []  # (candidate, sql, status, error, source)
+    winner = empty = None  # (candidate, sql, value)
+    pending = set(generating)
+    done = set()
 
-{sql}
+    try:
+        while pending and winner is None:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            # Lowest candidate first, so ties go to the temperature-0 one
+            for task in sorted(done, key=lambda t: generating[t] if t in generating else executing[t][0]):
+                if task in generating:
+                    index = generating[task]
+                    sql = task.result().rstrip(";")
+                    if sql in seen:
+                        SPECULATIVE_CANDIDATES.inc(fate="duplicate")
+                        continue
+                    seen.add(sql)
+                    print(f"SQL candidate {index}:\n", sql)
+                    emit("sql", {"sql": sql, "source": "candidate", "candidate": index})
+                    sql, rejection = _check_candidate(ctx, sql, emit)
+                    if rejection is not None:
+                        SPECULATIVE_CANDIDATES.inc(fate="rejected")
+                        failures.append((index, sql) + rejection)
+                        continue
+                    SPECULATIVE_CANDIDATES.inc(fate="executed")
+                    emit("executing", {"sql": sql, "candidate": index})
+                    canceller = QueryCanceller()
+                    run = asyncio.ensure_future(execute(sql, canceller))
+                    executing[run] = (index, sql, canceller)
+                    pending.add(run)
+                else:
+                    index, sql, _ = executing[task]
+                    try:
+                        value = task.result()
+                    except QueryTimeout:
+                        failures.append((index, sql, "timeout", None, None))
+                    except PlanRejected as e:
+                        failures.append((index, sql, "too_expensive", str(e), "plan"))
+                    except Exception as e:
+                        print(f"SQL candidate {index} failed:\n", e)
+                        failures.append((index, sql, "error", str(e), "database"))
+                    else:
+                        if value.rows:
+                            winner = (index, sql, value)
+                            break
+                        if empty is None:
+                            empty = (index, sql, value)
+    finally:
+        # Also runs when the client went away: nothing keeps working for a lost request
+        for task in pending:
+            task.cancel()
+            if task in executing:
+                executing[task][2].cancel()
+        if pending:
+            SPECULATIVE_CANDIDATES.inc(len(pending), fate="cancelled")
+            await asyncio.gather(*pending, return_exceptions=True)
+        # Finished tasks sorted after the winner were never read; retrieving their
+        # exceptions keeps asyncio from logging "Task exception was never retrieved"
+        for task in done:
+            if not task.cancelled():
+                task.exception()
+
+    if winner or empty:
+        index, sql, value = winner or empty
+        baseline_failed = any(f[0] == 0 for f in failures)
+        SPECULATIVE_RUNS.inc(outcome="baseline" if index == 0 else "saved_repair" if baseline_failed else "alternate")
+        if sql_cache is not None:
+            sql_cache.set(ctx.question, ctx.fingerprint, ctx.model, sql)
+        return sql, value, None
+
+    failures.sort(key=lambda f: f[0])
+    repairable = [
+        f for f in failures
+        if f[4] in ("validator", "database") or (f[4] == "plan" and PLAN_GUARD_MODE == "repair")
+    ]
+    if not repairable:
+        SPECULATIVE_RUNS.inc(outcome="failed")
+        index, sql, status = failures[0][:3]
+        return sql, None, status
+
+    index, sql, _, error, source = repairable[0]
+    fixed = _fix_locally(ctx, sql, error, emit) if source == "database" else None
+    if fixed is not None:
+        # The rule fix keeps the model repair in reserve
+        sql, value, failure = await _execute_with_repair(ctx, client, execute, fixed[0], emit, local_fixes=fixed[1])
+        SPECULATIVE_RUNS.inc(outcome="fixed" if failure is None else "failed")
+    else:
+        emit("repair", {"attempt": 1, "error": error, "source": source, "candidate": index})
+        sql = await repair_sql(sql, error, client, REPAIR_SOURCES[source])
+        emit("sql", {"sql": sql, "source": "repair"})
+        sql, value, failure = await _execute_with_repair(ctx, client, execute, sql, emit, first_attempt=1)
+        SPECULATIVE_RUNS.inc(outcome="repaired" if failure is None else "failed")
+    if failure is None and sql_cache is not None:
+        sql_cache.set(ctx.question, ctx.fingerprint, ctx.model, sql)
+    return sql, value, failure
+
+async def ask_db(
+    question: str,
+    engine,                
+    schema: str,
+    client,
+    sql_cache: Optional[SQLCache] = None,
+    result_cache: Optional[ResultCache] = None,
+    schema_index=None,
+    original_question: Optional[str] = None,
+    emit: Optional[Callable[[str, dict], None]] = None,
+    page_size: int = PAGE_SIZE,
+    validator: Optional[SQLValidator] = None,
+    fixer: Optional[SQLFixer] = None
+) -> QueryResult:
+    
+    ctx = prepare_question(question, schema, client, schema_index, original_question, validator, fixer)
 
-The Oracle database returned this error:
-{error_msg}
+    speculative = SQL_CANDIDATES > 1
+    max_cost = SQL_CANDIDATE_MAX_COST if speculative else 0
 
-Rewrite the query to fix the error.
-Return ONLY valid Oracle SELECT SQL.
-Do NOT use semicolons at the end.
-"""
-                sql = chat_once(repair_prompt, client).strip().rstrip(";")
-            else:
-                message = "حدث خطأ أثناء تنفيذ الاستعلام"
-                return sql, message, []
+    async def execute(sql: str, canceller: Optional[QueryCanceller] = None) -> QueryResult:
+        return await execute_sql(engine, sql, result_cache, page_size=page_size,
+                                 canceller=canceller, max_cost=max_cost or None)
+
+    run = run_speculative if speculative else run_with_repair
+    sql, result, failure = await run(ctx, client, execute, sql_cache, emit)
+    if failure is not None:
+        return QueryResult(sql, FAILURE_MESSAGES[failure], status=failure)
+    return _mark_empty(result)
+
+
+def _mark_empty(result: QueryResult) -> QueryResult:
+    if not result.rows:
+        EMPTY_RESULTS.inc()
+        result.message = EMPTY_MESSAGE
+        result.status = "empty"
+        result.rows = []
+    return result
+
+
+def failure_status(error: Exception) -> Optional[str]:
+    """The FAILURE_MESSAGES status for a timeout or a plan rejection, None for other errors.
+    Every endpoint reports these in the response body, not as an HTTP error."""
+    if isinstance(error, QueryTimeout):
+        return "timeout"
+    if isinstance(error, PlanRejected):
+        return "too_expensive"
+    return None
 
-    if not rows_as_dict:
-        message = "لا توجد بيانات متاحة لهذا الطلب"
-        return sql, message, []
 
-    return sql, message, rows_as_dict
+def _template_failure(match: TemplateMatch, error: Exception) -> Optional[str]:
+    """Failure status for a template statement, or None to hand the question to the model instead."""
+    failure = failure_status(error)
+    if failure is not None:
+        return failure
+    print(f"Question template {match.template} failed, falling back to the model: {error}")
+    return None
+
+
+async def run_template(engine, match: TemplateMatch, result_cache: Optional[ResultCache] = None,
+                       page_size: int = PAGE_SIZE, emit: Optional[Callable[[str, dict], None]] = None
+                       ) -> Optional[QueryResult]:
+    """Answer a question from its matched template: vetted SQL, literals as bind variables.
+
+    Returns None when the statement failed in a way the model pipeline might
+    still get right (e.g. a table it names was dropped).
+    """
+    emit = emit or _no_emit
+    emit("sql", {"sql": match.sql, "source": "template", "template": match.template, "binds": match.binds})
+    emit("executing", {"sql": match.sql})
+    try:
+        result = await execute_sql(engine, match.sql, result_cache, page_size=page_size, binds=match.binds)
+    except Exception as e:
+        failure = _template_failure(match, e)
+        if failure is None:
+            return None
+        return QueryResult(match.sql, FAILURE_MESSAGES[failure], status=failure,
+                           template=match.template, binds=match.binds)
+
+    result.template = match.template
+    return _mark_empty(result)
+
+
+async def run_semantic_hit(engine, hit: SemanticHit, semantic_cache: SemanticCache,
+                           result_cache: Optional[ResultCache] = None, page_size: int = PAGE_SIZE,
+                           emit: Optional[Callable[[str, dict], None]] = None) -> Optional[QueryResult]:
+    """Run the SQL cached for a paraphrase of the question. None (and the entry dropped)
+    when it no longer runs, so the question goes through the model pipeline."""
+    emit = emit or _no_emit
+    print(f"Semantic cache hit ({hit.similarity}): {hit.question}")
+    emit("sql", {"sql": hit.sql, "source": "semantic_cache", "similar_to": hit.question, "similarity": hit.similarity})
+    emit("executing", {"sql": hit.sql})
+    try:
+        result = await execute_sql(engine, hit.sql, result_cache, page_size=page_size)
+    except QueryTimeout:
+        return QueryResult(hit.sql, TIMEOUT_MESSAGE, status="timeout")
+    except Exception as e:
+        print("Semantic cache SQL failed, regenerating:\n", e)
+        semantic_cache.delete(hit.question)
+        return None
+    return _mark_empty(result)
+
+
+class RowStream:
+    """Open cursor over a SELECT, fetched in ``arraysize`` chunks. Blocking - drive via run_in_db_thread.
+
+    Stops after ``max_rows`` rows, so a runaway join can't hold a pooled
+    connection forever; ``truncated`` tells whether rows were left unread.
+    """
+
+    def __init__(self, engine, sql: str, arraysize: int = DB_ARRAYSIZE,
+                 params: Optional[Dict[str, Any]] = None, max_rows: int = QUERY_STREAM_MAX_ROWS):
+        self.sql = sql
+        self.arraysize = arraysize
+        self.max_rows = max_rows
+        self.row_count = 0
+        self.truncated = False
+        self._conn = raw_connect(engine)
+        try:
+            set_call_timeout(self._conn)
+            if plan_guard_enabled(engine.dialect.name):
+                guard_plan(self._conn, sql, params)
+            self._cursor = self._conn.cursor()
+            self._cursor.arraysize = arraysize
+            self._cursor.execute(sql, params or {})
+            self.columns = [d[0] for d in self._cursor.description]
+        except Exception as e:
+            if is_call_timeout(e):
+                self._conn.invalidate()
+                self._conn.close()
+                raise _timeout(e) from e
+            self._conn.close()
+            raise
+
+    def fetch_chunk(self) -> List[tuple]:
+        """Next chunk of rows, empty once the cursor or the row cap is exhausted.
+        The call timeout applies to each fetch round trip."""
+        remaining = self.max_rows - self.row_count
+        if self.truncated or remaining <= 0:
+            return []
+        try:
+            # One row past the cap tells a full result from a truncated one
+            rows = self._cursor.fetchmany(min(self.arraysize, remaining + 1))
+        except Exception as e:
+            if not is_call_timeout(e):
+                raise
+            self._conn.invalidate()
+            raise _timeout(e) from e
+        if len(rows) > remaining:
+            rows = rows[:remaining]
+            self.truncated = True
+            print(f"Streamed result truncated at {self.max_rows} rows")
+        self.row_count += len(rows)
+        return convert_columns(self.columns, rows)[1]
+
+    def close(self):
+        try:
+            self._cursor.close()
+        finally:
+            self._conn.close()
+
+
+async def open_row_stream(
+    question: str,
+    engine,
+    schema: str,
+    client,
+    sql_cache: Optional[SQLCache] = None,
+    schema_index=None,
+    original_question: Optional[str] = None,
+    arraysize: int = DB_ARRAYSIZE,
+    validator: Optional[SQLValidator] = None,
+    fixer: Optional[SQLFixer] = None
+) -> tuple[str, Optional[RowStream], Optional[str]]:
+    """Like ask_db, but returns an open RowStream instead of materialized rows."""
+    ctx = prepare_question(question, schema, client, schema_index, original_question, validator, fixer)
+
+    async def execute(sql: str) -> RowStream:
+        return await run_in_db_thread(RowStream, engine, sql, arraysize)
+
+    return await run_with_repair(ctx, client, execute, sql_cache)
+
+
+async def open_template_stream(engine, match: TemplateMatch, arraysize: int = DB_ARRAYSIZE
+                               ) -> Optional[tuple[str, Optional[RowStream], Optional[str]]]:
+    """open_row_stream for a matched template; None falls back to the model pipeline."""
+    try:
+        stream = await run_in_db_thread(RowStream, engine, match.sql, arraysize, match.binds)
+    except Exception as e:
+        failure = _template_failure(match, e)
+        return None if failure is None else (match.sql, None, failure)
+    return match.sql, stream, None
@@ -0,0 +1,218 @@
+"""Minimal Prometheus metrics (counters and histograms) rendered in the text exposition format."""
+import time
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Tuple
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_registry: List["_Metric"] = []
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"] + self._samples()
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        if not self.labelnames:
+            self._values[()] = 0.0
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {value}" for key, value in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [bucket counts..., sum, count]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [0.0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Time the block; the label dict it yields may be updated (e.g. outcome) before exit."""
+        labels.setdefault("outcome", "ok")
+        started = time.perf_counter()
+        try:
+            yield labels
+        except BaseException:
+            if labels["outcome"] == "ok":
+                labels["outcome"] = "error"
+            raise
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = [(key, list(series)) for key, series in self._values.items()]
+        lines = []
+        for key, series in items:
+            for bound, count in zip(self.buckets, series):
+                le = 'le="%s"' % bound
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {count}")
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {series[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {series[-2]}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {series[-1]}")
+        return lines
+
+
+class CallbackGauge(_Metric):
+    """Metric whose samples are read from ``callback`` at scrape time, e.g. cache or pool stats.
+
+    Pass ``kind="counter"`` when the callback reports a running total.
+    """
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str],
+                 callback: Callable[[], Iterable[Tuple[Tuple[str, ...], float]]], kind: str = "gauge"):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+        self.kind = kind
+
+    def _samples(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {value}" for key, value in self.callback()]
+
+
+def render_metrics() -> str:
+    return "\n".join(line for metric in _registry for line in metric.render()) + "\n"
+
+
+# ====== Pipeline metrics ======
+STAGE_SECONDS = Histogram(
+    "text_to_sql_stage_seconds",
+    "Time spent in each pipeline stage",
+    ["stage", "model", "outcome"],
+)
+POOL_CHECKOUT_SECONDS = Histogram(
+    "text_to_sql_pool_checkout_seconds",
+    "Time waiting for a pooled database connection",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0),
+)
+UNSAFE_SQL = Counter(
+    "text_to_sql_unsafe_sql_total",
+    "Generated SQL rejected by the safety check",
+    ["model"],
+)
+EMPTY_RESULTS = Counter(
+    "text_to_sql_empty_results_total",
+    "Queries that executed but returned no rows",
+)
+LOCAL_REJECTIONS = Counter(
+    "text_to_sql_local_rejections_total",
+    "Generated SQL sent back to repair by the local validator, without an Oracle round trip",
+    ["kind", "model"],
+)
+PLAN_REJECTIONS = Counter(
+    "text_to_sql_plan_rejections_total",
+    "Queries whose EXPLAIN PLAN estimate was over the cost or row limit",
+    ["reason"],
+)
+QUERY_TIMEOUTS = Counter(
+    "text_to_sql_query_timeouts_total",
+    "Statements cancelled by the per-call timeout",
+)
+RETRIES = Counter(
+    "text_to_sql_retries_total",
+    "Second model calls: translation retries and SQL repairs",
+    ["kind", "model"],
+)
+COALESCED_REQUESTS = Counter(
+    "text_to_sql_coalesced_requests_total",
+    "Requests that joined an identical question already in flight instead of running the pipeline",
+    ["flight"],
+)
+SPECULATIVE_RUNS = Counter(
+    "text_to_sql_speculative_runs_total",
+    "Questions answered with parallel SQL candidates, by outcome. saved_repair: the "
+    "temperature-0 candidate failed and another one answered without a repair round trip",
+    ["outcome"],
+)
+SPECULATIVE_CANDIDATES = Counter(
+    "text_to_sql_speculative_candidates_total",
+    "Parallel SQL candidates by fate: executed, duplicate, rejected (unsafe or failed local validation), cancelled",
+    ["fate"],
+)
+SQL_FIXES = Counter(
+    "text_to_sql_sql_fixes_total",
+    "Rule-based rewrites of generated SQL, by rule and stage (normalize: every statement; error: after a failure)",
+    ["rule", "stage"],
+)
+REPAIRS_AVOIDED = Counter(
+    "text_to_sql_repairs_avoided_total",
+    "Statements that ran after a local rule fix instead of going back to the model, by rule used",
+    ["rule"],
+)
+ORACLE_ERRORS = Counter(
+    "text_to_sql_oracle_errors_total",
+    "Oracle errors raised by generated SQL, by ORA code",
+    ["code"],
+)
+TEMPLATE_MATCHES = Counter(
+    "text_to_sql_template_matches_total",
+    "Questions answered from a vetted question template, without a model call",
+    ["template"],
+)
+SEMANTIC_SIMILARITY = Histogram(
+    "text_to_sql_semantic_cache_similarity",
+    "Cosine similarity of each semantic cache lookup to its closest cached question",
+    ["result"],
+    buckets=(0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.92, 0.95, 0.98, 1.0),
+)
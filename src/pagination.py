@@ -0,0 +1,152 @@
+import os
+import hmac
+import json
+import base64
+import hashlib
+from typing import Any, Dict, Optional
+from src.sql_validator import SQLValidationError, token_spans
+
+
+# Largest page any request may ask for, and the page size used when none is given
+MAX_ROWS = int(os.getenv("QUERY_MAX_ROWS", "1000"))
+PAGE_SIZE = min(int(os.getenv("QUERY_PAGE_SIZE", "100")), MAX_ROWS)
+
+# Tokens carry the SQL to re-run, so they are signed to stop clients from
+# sending their own. Set PAGE_TOKEN_SECRET when running several workers;
+# otherwise tokens are only valid on the worker that issued them, until restart.
+_SECRET = (os.getenv("PAGE_TOKEN_SECRET") or os.urandom(32).hex()).encode("utf-8")
+
+
+class InvalidPageToken(ValueError):
+    pass
+
+
+def clamp_page_size(page_size: Optional[int]) -> int:
+    if not page_size or page_size < 1:
+        return PAGE_SIZE
+    return min(page_size, MAX_ROWS)
+
+
+# Outer-level words meaning the statement already limits its own rows
+_ROW_LIMITS = {"FETCH", "OFFSET", "LIMIT"}
+_SELECT_MODIFIERS = {"DISTINCT", "UNIQUE", "ALL"}
+
+
+def _outer_words(sql: str) -> set:
+    """Words outside any parentheses: the clauses of the statement itself, not of subqueries or OVER (...)."""
+    words, depth = set(), 0
+    for token, _start, _end in token_spans(sql):
+        if token.kind == "op" and token.value in "()":
+            depth += 1 if token.value == "(" else -1
+        elif depth == 0 and token.kind == "word":
+            words.add(token.value)
+    return words
+
+
+def _output_name(item: list) -> Optional[str]:
+    """Column name a select-list item comes out under, when it has a predictable one."""
+    tokens = [token for token, _start, _end in item]
+    if tokens and tokens[0].kind == "word" and tokens[0].value in _SELECT_MODIFIERS:
+        tokens = tokens[1:]
+    if not tokens or tokens[-1].kind not in ("word", "quoted"):
+        return None
+    if len(tokens) == 1 or (len(tokens) >= 2 and tokens[-2].kind == "op" and tokens[-2].value == "."):
+        return tokens[-1].value
+    if tokens[-2].kind == "word" and tokens[-2].value == "AS":
+        return tokens[-1].value
+    if tokens[-2].kind != "op":
+        return tokens[-1].value
+    return None
+
+
+def alias_duplicate_columns(sql: str) -> str:
+    """Alias repeated output names in the outer select list (DEPARTMENT_ID, DEPARTMENT_ID_2),
+    so a ``SELECT * FROM (...)`` around the statement doesn't hit ORA-00918.
+    Columns from ``*`` can't be renamed this way."""
+    spans = token_spans(sql)
+    items, current, depth, in_list = [], [], 0, False
+    for span in spans:
+        token = span[0]
+        if token.kind == "op" and token.value in "()":
+            depth += 1 if token.value == "(" else -1
+        if depth == 0 and token.kind == "word" and token.value == "SELECT" and not in_list and not items:
+            in_list = True
+            continue
+        if not in_list:
+            continue
+        if depth == 0 and token.kind == "word" and token.value == "FROM":
+            break
+        if depth == 0 and token.kind == "op" and token.value == ",":
+            items.append(current)
+            current = []
+        else:
+            current.append(span)
+    if current:
+        items.append(current)
+
+    seen: Dict[str, int] = {}
+    inserts = []
+    for item in items:
+        name = _output_name(item)
+        if name is None:
+            continue
+        seen[name] = seen.get(name, 0) + 1
+        if seen[name] > 1:
+            inserts.append((item[-1][2], f" AS {name}_{seen[name]}"))
+    for position, alias in reversed(inserts):
+        sql = sql[:position] + alias + sql[position:]
+    return sql
+
+
+def paginate_sql(sql: str, dialect: str) -> str:
+    """Add a server-side page to a SELECT so the server controls how many rows come back.
+
+    Uses :offset / :limit bind variables so every page of a query shares one
+    parsed statement. Callers fetch ``limit = page_size + 1`` to learn
+    whether another page exists.
+
+    The page clause is appended to the statement itself, so duplicate output
+    names (``e.*, d.*``) still work. Only a statement with its own row limit
+    (``FETCH FIRST :count ROWS ONLY``) is wrapped, with repeated column names
+    aliased. Without an ORDER BY, ``ORDER BY 1`` is added so re-running the
+    query for the next page returns the rows in the same order.
+    """
+    if dialect == "oracle":
+        page = "OFFSET :offset ROWS FETCH NEXT :limit ROWS ONLY"
+    else:
+        page = "LIMIT :limit OFFSET :offset"
+    try:
+        words = _outer_words(sql)
+    except SQLValidationError:
+        return f"SELECT * FROM (\n{sql}\n) {page}"
+
+    order = "" if "ORDER" in words else "\nORDER BY 1"
+    if not words & _ROW_LIMITS:
+        # New lines keep a trailing -- comment from swallowing the clause
+        return f"{sql}{order}\n{page}"
+    return f"SELECT * FROM (\n{alias_duplicate_columns(sql)}\n){order}\n{page}"
+
+
+def _sign(payload: bytes) -> str:
+    return hmac.new(_SECRET, payload, hashlib.sha256).hexdigest()[:32]
+
+
+def encode_page_token(sql: str, offset: int, page_size: int, binds: Optional[Dict[str, Any]] = None) -> str:
+    data = {"sql": sql, "offset": offset, "page_size": page_size}
+    if binds:
+        data["binds"] = binds
+    payload = json.dumps(data, ensure_ascii=False, default=str).encode("utf-8")
+    return base64.urlsafe_b64encode(payload).decode("ascii") + "." + _sign(payload)
+
+
+def decode_page_token(token: str) -> tuple[str, int, int, Dict[str, Any]]:
+    """Return ``(sql, offset, page_size, binds)`` or raise InvalidPageToken."""
+    try:
+        encoded, signature = token.rsplit(".", 1)
+        payload = base64.urlsafe_b64decode(encoded.encode("ascii"))
+    except (ValueError, UnicodeError):
+        raise InvalidPageToken("Malformed page token")
+    if not hmac.compare_digest(signature, _sign(payload)):
+        raise InvalidPageToken("Page token signature mismatch")
+    data = json.loads(payload)
+    return data["sql"], int(data["offset"]), clamp_page_size(int(data["page_size"])), data.get("binds", {})
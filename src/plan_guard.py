@@ -0,0 +1,148 @@
+import os
+import re
+import uuid
+import threading
+from typing import Dict, Any, Optional
+
+
+# off: no EXPLAIN PLAN; reject: refuse queries over the limits; repair: ask the model for a cheaper rewrite first
+PLAN_GUARD_MODE = os.getenv("PLAN_GUARD", "off").lower()
+# Optimizer estimates above which a query is refused (0 disables that limit)
+PLAN_MAX_COST = float(os.getenv("PLAN_MAX_COST", "1000000"))
+PLAN_MAX_CARDINALITY = float(os.getenv("PLAN_MAX_CARDINALITY", "10000000"))
+# Per round trip limit for generated queries (oracledb call_timeout); 0 disables
+DB_CALL_TIMEOUT_MS = int(os.getenv("DB_CALL_TIMEOUT_MS", "30000"))
+
+# DPI-1067: call timeout exceeded; ORA-03156 / ORA-01013: the call was interrupted by it
+_TIMEOUT_CODES = ("DPI-1067", "ORA-03156", "ORA-01013")
+_BIND_RE = re.compile(r":(\w+)")
+
+
+class PlanRejected(Exception):
+    """The optimizer estimate for a query is over PLAN_MAX_COST / PLAN_MAX_CARDINALITY."""
+
+    def __init__(self, cost: Optional[float], cardinality: Optional[float], reason: str,
+                 max_cost: float = PLAN_MAX_COST):
+        self.cost = cost
+        self.cardinality = cardinality
+        self.reason = reason
+        super().__init__(
+            f"Estimated {reason} is too high (cost {cost}, rows {cardinality}; "
+            f"limits: cost {max_cost:g}, rows {PLAN_MAX_CARDINALITY:g}). "
+            "Join every table on its key (no Cartesian products) and filter as early as possible."
+        )
+
+
+class QueryTimeout(Exception):
+    """A statement ran past DB_CALL_TIMEOUT_MS and was cancelled."""
+
+
+class QueryCancelled(Exception):
+    """The statement was interrupted through its QueryCanceller."""
+
+
+class QueryCanceller:
+    """Lets the event loop interrupt a statement running on a DB worker thread.
+
+    Cancelling the asyncio task only stops waiting for the thread; ``cancel``
+    also breaks the call on the connection (oracledb ``Connection.cancel``).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._conn = None
+        self.cancelled = False
+
+    def attach(self, dbapi_conn):
+        with self._lock:
+            if self.cancelled:
+                raise QueryCancelled("cancelled before it started")
+            self._conn = getattr(dbapi_conn, "driver_connection", dbapi_conn)
+
+    def detach(self):
+        with self._lock:
+            self._conn = None
+
+    def cancel(self):
+        with self._lock:
+            self.cancelled = True
+            conn = self._conn
+        if conn is not None and hasattr(conn, "cancel"):
+            try:
+                conn.cancel()
+            except Exception as e:
+                print(f"Could not cancel statement: {e}")
+
+
+def plan_guard_enabled(dialect: str, max_cost: Optional[float] = None) -> bool:
+    """True when queries on ``dialect`` get an EXPLAIN PLAN check: the guard is on,
+    or the caller brings its own cost ceiling."""
+    return dialect == "oracle" and (PLAN_GUARD_MODE in ("reject", "repair") or bool(max_cost))
+
+
+def set_call_timeout(dbapi_conn):
+    """Apply DB_CALL_TIMEOUT_MS to a pooled connection (oracledb only - other drivers are left alone)."""
+    driver_conn = getattr(dbapi_conn, "driver_connection", dbapi_conn)
+    if DB_CALL_TIMEOUT_MS > 0 and hasattr(driver_conn, "call_timeout"):
+        driver_conn.call_timeout = DB_CALL_TIMEOUT_MS
+
+
+def is_call_timeout(error: Exception) -> bool:
+    text = str(error)
+    return any(code in text for code in _TIMEOUT_CODES)
+
+
+def _literal(value) -> str:
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def _inline_binds(sql: str, params: Optional[Dict[str, Any]]) -> str:
+    """EXPLAIN PLAN takes no bind values, so known binds are written in as literals."""
+    if not params:
+        return sql
+    return _BIND_RE.sub(lambda m: _literal(params[m.group(1)]) if m.group(1) in params else m.group(0), sql)
+
+
+def explain_plan(dbapi_conn, sql: str, params: Optional[Dict[str, Any]] = None) -> tuple[Optional[float], Optional[float]]:
+    """``(cost, cardinality)`` of the plan's root step, read back from PLAN_TABLE.
+
+    The PLAN_TABLE rows are rolled back afterwards, so nothing is left behind.
+    """
+    statement_id = f"tts{uuid.uuid4().hex[:24]}"
+    cursor = dbapi_conn.cursor()
+    try:
+        cursor.execute(f"EXPLAIN PLAN SET STATEMENT_ID = '{statement_id}' FOR {_inline_binds(sql, params)}")
+        cursor.execute(
+            "SELECT cost, cardinality FROM plan_table WHERE statement_id = :sid AND id = 0",
+            {"sid": statement_id},
+        )
+        row = cursor.fetchone()
+    finally:
+        cursor.close()
+        dbapi_conn.rollback()
+    if row is None:
+        return None, None
+    return row[0], row[1]
+
+
+def _cost_limit(max_cost: Optional[float]) -> float:
+    # The tighter of PLAN_MAX_COST (when the guard is on) and the caller's ceiling; 0 means no limit
+    limits = [limit for limit in (PLAN_MAX_COST if PLAN_GUARD_MODE in ("reject", "repair") else 0, max_cost) if limit]
+    return min(limits) if limits else 0
+
+
+def check_plan(dbapi_conn, sql: str, params: Optional[Dict[str, Any]] = None,
+               max_cost: Optional[float] = None) -> tuple[Optional[float], Optional[float]]:
+    """Raise PlanRejected when the estimate is over the limits; return it otherwise.
+
+    ``max_cost`` tightens the cost limit for this one check.
+    """
+    cost, cardinality = explain_plan(dbapi_conn, sql, params)
+    cost_limit = _cost_limit(max_cost)
+    if cost_limit and cost is not None and cost > cost_limit:
+        raise PlanRejected(cost, cardinality, "cost", cost_limit)
+    if PLAN_MAX_CARDINALITY and cardinality is not None and cardinality > PLAN_MAX_CARDINALITY:
+        raise PlanRejected(cost, cardinality, "row count", cost_limit)
+    return cost, cardinality
@@ -0,0 +1,201 @@
+import os
+import time
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any, Optional
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import NullPool
+from src.metrics import POOL_CHECKOUT_SECONDS
+
+
+# Connections kept open, and how many more may be opened under bursts. The
+# default follows DB_MAX_WORKERS so every DB worker thread can hold one.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", os.getenv("DB_MAX_WORKERS", "8")))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "4"))
+# Seconds to wait for a free connection before giving up
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+# Replace connections older than this many seconds (before firewalls/Oracle drop them)
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+# Ping on every checkout. Costs a round trip each time; recycle usually makes it unnecessary
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "0") == "1"
+# Connections opened at startup so the first requests don't pay the logon
+DB_POOL_WARMUP = int(os.getenv("DB_POOL_WARMUP", str(DB_POOL_SIZE)))
+# oracledb statement cache per connection, and rows per fetch round trip
+DB_STMT_CACHE_SIZE = int(os.getenv("DB_STMT_CACHE_SIZE", "50"))
+DB_FETCH_ARRAYSIZE = int(os.getenv("DB_FETCH_ARRAYSIZE", "200"))
+# Use oracledb's own session pool (with SQLAlchemy's pooling switched off)
+DB_NATIVE_POOL = os.getenv("DB_NATIVE_POOL", "0") == "1"
+# Seconds idle before the native pool pings a connection on acquire
+DB_NATIVE_PING_INTERVAL = int(os.getenv("DB_NATIVE_PING_INTERVAL", "60"))
+
+_native_pools: Dict[int, Any] = {}
+
+
+class PoolStats:
+    """Checkout waits seen by the query paths (the pool itself reports what is checked out)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.waiting = 0
+        self.max_waiting = 0
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def started(self):
+        with self._lock:
+            self.waiting += 1
+            self.max_waiting = max(self.max_waiting, self.waiting)
+
+    def finished(self, waited: float, ok: bool):
+        POOL_CHECKOUT_SECONDS.observe(waited)
+        with self._lock:
+            self.waiting -= 1
+            if ok:
+                self.checkouts += 1
+                self.total_wait += waited
+                self.max_wait = max(self.max_wait, waited)
+            else:
+                self.timeouts += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "waiting": self.waiting,
+                "max_waiting": self.max_waiting,
+                "checkouts": self.checkouts,
+                "checkout_failures": self.timeouts,
+                "avg_wait_ms": round(self.total_wait / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                "max_wait_ms": round(self.max_wait * 1000, 3),
+            }
+
+
+pool_stats = PoolStats()
+
+
+def _timed(acquire):
+    started = time.perf_counter()
+    pool_stats.started()
+    try:
+        conn = acquire()
+    except Exception:
+        pool_stats.finished(time.perf_counter() - started, ok=False)
+        raise
+    pool_stats.finished(time.perf_counter() - started, ok=True)
+    return conn
+
+
+@contextmanager
+def connect(engine):
+    """``engine.connect()`` with the checkout wait recorded."""
+    conn = _timed(engine.connect)
+    with conn:
+        yield conn
+
+
+def raw_connect(engine):
+    """``engine.raw_connection()`` with the checkout wait recorded. Caller closes it."""
+    return _timed(engine.raw_connection)
+
+
+def _native_dsn(url) -> str:
+    service = url.query.get("service_name") or url.database or ""
+    return f"{url.host or 'localhost'}:{url.port or 1521}/{service}"
+
+
+def _create_native_pool(url):
+    import oracledb
+
+    return oracledb.create_pool(
+        user=url.username,
+        password=url.password,
+        dsn=_native_dsn(url),
+        min=min(DB_POOL_WARMUP, DB_POOL_SIZE),
+        max=DB_POOL_SIZE + DB_MAX_OVERFLOW,
+        increment=1,
+        getmode=oracledb.POOL_GETMODE_TIMEDWAIT,
+        wait_timeout=int(DB_POOL_TIMEOUT * 1000),
+        max_lifetime_session=DB_POOL_RECYCLE,
+        ping_interval=DB_NATIVE_PING_INTERVAL,
+        stmtcachesize=DB_STMT_CACHE_SIZE,
+    )
+
+
+def build_engine(database_url: str):
+    """SQLAlchemy engine with the pool configured from the DB_POOL_* / DB_* env vars."""
+    url = make_url(database_url)
+    is_oracle = url.get_backend_name() == "oracle"
+    if is_oracle:
+        import oracledb
+        oracledb.defaults.arraysize = DB_FETCH_ARRAYSIZE
+
+    if is_oracle and DB_NATIVE_POOL:
+        native_pool = _create_native_pool(url)
+        engine = create_engine(url, creator=native_pool.acquire, poolclass=NullPool)
+        _native_pools[id(engine)] = native_pool
+        return engine
+
+    engine = create_engine(
+        url,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+        # Most recently used first: busy periods reuse hot connections, idle ones age out via recycle
+        pool_use_lifo=True,
+    )
+    if is_oracle:
+        @event.listens_for(engine, "connect")
+        def _set_statement_cache(dbapi_connection, connection_record):
+            dbapi_connection.stmtcachesize = DB_STMT_CACHE_SIZE
+    return engine
+
+
+def warm_pool(engine, count: Optional[int] = None) -> int:
+    """Open ``count`` connections at once and hand them back to the pool. Blocking."""
+    count = DB_POOL_WARMUP if count is None else count
+    opened = []
+    try:
+        for _ in range(count):
+            opened.append(engine.raw_connection())
+    finally:
+        for conn in opened:
+            conn.close()
+    print(f"Connection pool warmed: {len(opened)} connections")
+    return len(opened)
+
+
+def pool_status(engine) -> Dict[str, Any]:
+    native_pool = _native_pools.get(id(engine))
+    if native_pool is not None:
+        status = {
+            "kind": "oracledb",
+            "opened": native_pool.opened,
+            "checked_out": native_pool.busy,
+            "max": native_pool.max,
+            "stmtcachesize": native_pool.stmtcachesize,
+        }
+    else:
+        pool = engine.pool
+        status = {
+            "kind": type(pool).__name__,
+            "size": pool.size() if hasattr(pool, "size") else None,
+            "checked_out": pool.checkedout() if hasattr(pool, "checkedout") else None,
+            "checked_in": pool.checkedin() if hasattr(pool, "checkedin") else None,
+            "overflow": pool.overflow() if hasattr(pool, "overflow") else None,
+            "max_overflow": DB_MAX_OVERFLOW,
+            "recycle_seconds": DB_POOL_RECYCLE,
+            "pre_ping": DB_POOL_PRE_PING,
+        }
+    status.update(pool_stats.snapshot())
+    return status
+
+
+def dispose_engine(engine):
+    engine.dispose()
+    native_pool = _native_pools.pop(id(engine), None)
+    if native_pool is not None:
+        native_pool.close(force=True)
@@ -0,0 +1,204 @@
+import os
+import re
+import json
+from dataclasses import dataclass, field
+from itertools import chain
+from typing import List, Dict, Any, Optional
+from src.cache import normalize_arabic
+from src.sql_validator import SQLValidationError, check_read_only, tokenize
+from src.metrics import TEMPLATE_MATCHES
+
+
+# JSON file of vetted question templates; empty disables template matching
+QUESTION_TEMPLATES_PATH = os.getenv("QUESTION_TEMPLATES_PATH", "config/question_templates.json")
+
+# Arabic-Indic and Persian digits, read as ASCII so number and year slots see one form
+_DIGITS = str.maketrans("٠١٢٣٤٥٦٧٨٩۰۱۲۳۴۵۶۷۸۹", "0123456789" * 2)
+_SLOT_RE = re.compile(r"\{(\w+)\}")
+# What each slot type matches in a normalized question. Names are Latin-script
+# (HR data is in English); Arabic values come in through a slot's "values" list.
+SLOT_PATTERNS = {
+    "name": r"[a-z][a-z'.-]*(?: [a-z][a-z'.-]*){0,3}",
+    "number": r"\d{1,3}(?:,\d{3})+(?:\.\d+)?|\d+(?:\.\d+)?",
+    "year": r"(?:19|20)\d{2}",
+}
+# Binds paginate_sql adds to every statement
+_RESERVED_BINDS = {"offset", "limit"}
+
+
+@dataclass
+class QuestionTemplate:
+    """One question shape: the phrasings that ask it and the SQL that answers it."""
+    name: str
+    sql: str
+    slots: Dict[str, Dict[str, Any]]
+    patterns: List[re.Pattern] = field(default_factory=list)
+
+
+@dataclass
+class TemplateMatch:
+    template: str
+    sql: str
+    binds: Dict[str, Any]
+
+
+def _number(text: str):
+    value = float(text.replace(",", ""))
+    return int(value) if value.is_integer() else value
+
+
+def _slot_regex(spec: Dict[str, Any]) -> str:
+    values = spec.get("values")
+    if values:
+        # Only the listed values match, longest first so "human resources" beats "human"
+        return "|".join(re.escape(key) for key in sorted(values, key=len, reverse=True))
+    return SLOT_PATTERNS[spec["type"]]
+
+
+def _slot_value(spec: Dict[str, Any], text: str):
+    values = spec.get("values")
+    if values:
+        return values[text]
+    if spec["type"] == "number":
+        return _number(text)
+    if spec["type"] == "year":
+        return int(text)
+    return text
+
+
+def compile_pattern(pattern: str, slots: Dict[str, Dict[str, Any]]) -> re.Pattern:
+    """``"average salary in {department}"`` -> a regex with one named group per slot.
+
+    The pattern goes through the same normalization as incoming questions, so
+    spelling variants (hamza, taa marbuta, diacritics) need no extra patterns.
+    """
+    text = normalize_arabic(pattern)
+    parts, pos = [], 0
+    for match in _SLOT_RE.finditer(text):
+        slot = match.group(1)
+        if slot not in slots:
+            raise ValueError(f"pattern {pattern!r} uses undeclared slot {{{slot}}}")
+        parts.append(re.escape(text[pos:match.start()]))
+        parts.append(f"(?P<{slot}>{_slot_regex(slots[slot])})")
+        pos = match.end()
+    parts.append(re.escape(text[pos:]))
+    compiled = re.compile("".join(parts))
+    if set(compiled.groupindex) != set(slots):
+        raise ValueError(f"pattern {pattern!r} must use every slot: {sorted(slots)}")
+    return compiled
+
+
+def _vet(sql: str, slots: Dict[str, Dict[str, Any]]):
+    """Templates run without the model or the repair loop, so check them once, at load."""
+    check_read_only(sql)
+    binds = {token.value[1:] for token in tokenize(sql) if token.kind == "bind"}
+    if binds != set(slots):
+        raise ValueError(f"binds {sorted(binds)} don't match slots {sorted(slots)}")
+    if binds & _RESERVED_BINDS:
+        raise ValueError(f"{sorted(binds & _RESERVED_BINDS)} are reserved for pagination")
+    for slot, spec in slots.items():
+        if not spec.get("values") and spec.get("type") not in SLOT_PATTERNS:
+            raise ValueError(f"slot {slot!r} needs a type ({', '.join(SLOT_PATTERNS)}) or a values list")
+
+
+class TemplateMatcher:
+    """Maps recognized question shapes to parameterized SQL, before any model call.
+
+    Patterns are compiled once and indexed by their first word, so a question
+    is only tried against the few patterns that can start the way it does.
+    """
+
+    def __init__(self, templates: List[QuestionTemplate]):
+        self.templates = templates
+        self._by_first_word: Dict[str, List[tuple]] = {}
+        self._unanchored: List[tuple] = []
+        self.hits = 0
+        self.misses = 0
+        for template in templates:
+            for pattern in template.patterns:
+                first = pattern.pattern.split("\\ ", 1)[0]
+                if "(" in first or "\\" in first:
+                    self._unanchored.append((template, pattern))
+                else:
+                    self._by_first_word.setdefault(first, []).append((template, pattern))
+
+    def __len__(self) -> int:
+        return len(self.templates)
+
+    def match(self, question: str) -> Optional[TemplateMatch]:
+        text = normalize_arabic(question).translate(_DIGITS)
+        first = text.split(" ", 1)[0]
+        for template, pattern in chain(self._by_first_word.get(first, ()), self._unanchored):
+            found = pattern.fullmatch(text)
+            if found is None:
+                continue
+            try:
+                binds = {slot: _slot_value(spec, found.group(slot)) for slot, spec in template.slots.items()}
+            except (KeyError, ValueError):
+                continue
+            self.hits += 1
+            TEMPLATE_MATCHES.inc(template=template.name)
+            return TemplateMatch(template.name, template.sql, binds)
+        self.misses += 1
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "templates": len(self.templates),
+            "patterns": sum(len(t.patterns) for t in self.templates),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+def _slot_specs(entry: Dict[str, Any], shared_values: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    slots = {}
+    for slot, spec in entry.get("slots", {}).items():
+        spec = {"type": spec} if isinstance(spec, str) else dict(spec)
+        values = spec.get("values")
+        if isinstance(values, str):
+            values = shared_values[values]
+        if values:
+            # Keys are matched against the normalized question
+            spec["values"] = {normalize_arabic(key).translate(_DIGITS): value for key, value in values.items()}
+        slots[slot.lower()] = spec
+    return slots
+
+
+def load_templates(path: str) -> List[QuestionTemplate]:
+    """Read templates from ``path``. A template that fails vetting is skipped, not fatal.
+
+    File layout::
+
+        {"values": {"departments": {"المبيعات": "Sales", ...}},
+         "templates": [{"name": ..., "sql": ..., "slots": {...}, "patterns": [...]}]}
+    """
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    shared_values = data.get("values", {})
+
+    templates = []
+    for entry in data.get("templates", []):
+        name = entry.get("name", "?")
+        try:
+            slots = _slot_specs(entry, shared_values)
+            _vet(entry["sql"], slots)
+            patterns = [compile_pattern(p, slots) for p in entry["patterns"]]
+        except (KeyError, ValueError, re.error, SQLValidationError) as e:
+            print(f"Skipping question template {name}: {e}")
+            continue
+        templates.append(QuestionTemplate(name, entry["sql"], slots, patterns))
+    return templates
+
+
+def build_template_matcher(path: Optional[str] = None) -> TemplateMatcher:
+    path = QUESTION_TEMPLATES_PATH if path is None else path
+    if not path:
+        return TemplateMatcher([])
+    try:
+        templates = load_templates(path)
+    except (OSError, ValueError) as e:
+        print(f"Question templates not loaded from {path}: {e}")
+        return TemplateMatcher([])
+    print(f"Question templates loaded: {len(templates)} from {path}")
+    return TemplateMatcher(templates)
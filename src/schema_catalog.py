@@ -0,0 +1,150 @@
+import os
+import json
+import time
+import threading
+from dataclasses import dataclass
+from typing import Dict, Any, Optional
+from src.database import extract_oracle_catalog, extract_ddl_times, format_schema, schema_fingerprint
+from src.schema_index import SchemaIndex, build_schema_index
+from src.sql_validator import SQLValidator
+from src.sql_fixer import SQLFixer
+
+
+@dataclass(frozen=True)
+class SchemaVersion:
+    """One immutable view of the schema. Requests grab the current version once
+    and keep using it, so a refresh never changes the schema under them."""
+    catalog: Dict[str, Dict[str, Any]]
+    text: str
+    fingerprint: str
+    index: Optional[SchemaIndex]
+    validator: SQLValidator
+    fixer: SQLFixer
+    ddl_times: Dict[str, str]
+    loaded_at: float
+
+
+def build_version(catalog: Dict[str, Dict[str, Any]], ddl_times: Dict[str, str],
+                  loaded_at: Optional[float] = None) -> SchemaVersion:
+    catalog = {table: catalog[table] for table in sorted(catalog)}
+    text = format_schema(catalog)
+    return SchemaVersion(
+        catalog=catalog,
+        text=text,
+        fingerprint=schema_fingerprint(text),
+        index=build_schema_index(catalog),
+        validator=SQLValidator(catalog),
+        fixer=SQLFixer(catalog),
+        ddl_times=dict(ddl_times),
+        loaded_at=loaded_at or time.time(),
+    )
+
+
+class SchemaCatalog:
+    """Holds the current SchemaVersion, persists it to ``path`` for warm starts
+    and refreshes only the tables whose LAST_DDL_TIME moved.
+
+    ``refresh`` is blocking (run it via run_in_db_thread); the new version is
+    built on the side and swapped in with a single assignment.
+    """
+
+    def __init__(self, engine, owner: str = "HR", path: Optional[str] = None):
+        self.engine = engine
+        self.owner = owner
+        self.path = path
+        self.current: Optional[SchemaVersion] = None
+        self.refreshes = 0
+        self.tables_reloaded = 0
+        self._refresh_lock = threading.Lock()
+
+    def load_snapshot(self) -> bool:
+        """Adopt the on-disk snapshot, if there is one for this owner."""
+        if not self.path or not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable schema snapshot {self.path}: {e}")
+            return False
+        if data.get("owner") != self.owner:
+            return False
+
+        catalog = {
+            table: {
+                "columns": [tuple(column) for column in entry["columns"]],
+                "comment": entry.get("comment"),
+                "column_comments": entry.get("column_comments", {}),
+            }
+            for table, entry in data["tables"].items()
+        }
+        version = build_version(catalog, data.get("ddl_times", {}), data.get("loaded_at"))
+        if version.fingerprint != data.get("fingerprint"):
+            print("Schema snapshot fingerprint mismatch, ignoring it")
+            return False
+        self.current = version
+        print(f"Schema snapshot loaded: {len(catalog)} tables from {self.path}")
+        return True
+
+    def save_snapshot(self):
+        version = self.current
+        if not self.path or version is None:
+            return
+        data = {
+            "owner": self.owner,
+            "fingerprint": version.fingerprint,
+            "loaded_at": version.loaded_at,
+            "ddl_times": version.ddl_times,
+            "tables": version.catalog,
+        }
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+    def refresh(self) -> bool:
+        """Re-read changed tables and swap in a new version. Returns True if the schema changed."""
+        with self._refresh_lock:
+            ddl_times = extract_ddl_times(self.engine, self.owner)
+            current = self.current
+            if current is None:
+                changed = sorted(ddl_times)
+                catalog = extract_oracle_catalog(self.engine, self.owner)
+            else:
+                changed = sorted(t for t, ddl_time in ddl_times.items() if current.ddl_times.get(t) != ddl_time)
+                removed = [t for t in current.catalog if t not in ddl_times]
+                if not changed and not removed:
+                    return False
+                catalog = {t: entry for t, entry in current.catalog.items() if t in ddl_times and t not in changed}
+                catalog.update(extract_oracle_catalog(self.engine, self.owner, tables=changed))
+
+            version = build_version(catalog, ddl_times)
+            schema_changed = current is None or version.fingerprint != current.fingerprint
+            self.current = version
+            self.refreshes += 1
+            self.tables_reloaded += len(changed)
+
+        print(f"Schema refreshed: {len(changed)} tables reloaded, fingerprint {version.fingerprint}")
+        try:
+            self.save_snapshot()
+        except OSError as e:
+            print(f"Could not write schema snapshot: {e}")
+        return schema_changed
+
+    def stats(self) -> Dict[str, Any]:
+        version = self.current
+        return {
+            "loaded": version is not None,
+            "tables": len(version.catalog) if version else 0,
+            "fingerprint": version.fingerprint if version else None,
+            "loaded_at": version.loaded_at if version else None,
+            "refreshes": self.refreshes,
+            "tables_reloaded": self.tables_reloaded,
+            "snapshot_path": self.path,
+        }
+
+
+def build_schema_catalog(engine, owner: str = "HR") -> SchemaCatalog:
+    """SCHEMA_SNAPSHOT_PATH enables the on-disk snapshot used for warm starts."""
+    return SchemaCatalog(engine, owner=owner, path=os.getenv("SCHEMA_SNAPSHOT_PATH") or None)
@@ -0,0 +1,173 @@
+import os
+import re
+import json
+import math
+from typing import Dict, Any, List, Optional
+
+from src.cache import normalize_arabic
+from src.database import format_schema, format_table, schema_fingerprint
+
+
+# Question word -> schema tokens it refers to. Keys are normalized with
+# normalize_arabic, values are lowercase tokens of table/column names.
+SYNONYMS: Dict[str, List[str]] = {
+    # Arabic
+    "موظف": ["employee"], "موظفين": ["employee"], "عامل": ["employee"], "عمال": ["employee"],
+    "قسم": ["department"], "اقسام": ["department"], "اداره": ["department"], "ادارات": ["department"],
+    "راتب": ["salary"], "رواتب": ["salary"], "مرتب": ["salary"], "مرتبات": ["salary"],
+    "وظيفه": ["job"], "وظايف": ["job"], "وظائف": ["job"], "مسمي": ["job", "title"],
+    "مدير": ["manager"], "مديرين": ["manager"], "مديرهم": ["manager"],
+    "موقع": ["location"], "مواقع": ["location"], "مدينه": ["city", "location"], "مدن": ["city", "location"],
+    "دوله": ["country"], "دول": ["country"], "بلد": ["country"],
+    "منطقه": ["region"], "مناطق": ["region"],
+    "تعيين": ["hire"], "تعيينهم": ["hire"], "تاريخ": ["date", "history"], "مده": ["history", "date"],
+    "عموله": ["commission"], "ايميل": ["email"], "هاتف": ["phone"],
+    # English
+    "staff": ["employee"], "worker": ["employee"], "people": ["employee"], "hired": ["hire"],
+    "pay": ["salary"], "paid": ["salary"], "wage": ["salary"], "income": ["salary"], "earn": ["salary"],
+    "dept": ["department"], "boss": ["manager"], "position": ["job"], "role": ["job"],
+    "title": ["job", "title"], "nation": ["country"], "continent": ["region"],
+}
+
+_ARABIC_PREFIXES = ("وال", "بال", "كال", "فال", "ال", "لل")
+_ARABIC_SUFFIXES = ("هم", "ين", "ون", "ات", "ه")
+_TOKEN = re.compile(r"[a-z0-9]+|[\u0600-\u06FF]+")
+
+TABLE_WEIGHT = 3.0
+COLUMN_WEIGHT = 1.0
+COMMENT_WEIGHT = 0.5
+# Tables scoring below this fraction of the best match are left out
+MIN_RELATIVE_SCORE = 0.2
+
+
+def _stem(token: str) -> str:
+    if token.endswith("ies") and len(token) > 4:
+        return token[:-3] + "y"
+    if token.endswith("es") and len(token) > 4 and token[-3] in "sxz":
+        return token[:-2]
+    if token.endswith("s") and len(token) > 3 and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def _arabic_forms(token: str) -> List[str]:
+    forms = [token]
+    for prefix in _ARABIC_PREFIXES:
+        if token.startswith(prefix) and len(token) - len(prefix) >= 2:
+            forms.append(token[len(prefix):])
+            break
+    for form in list(forms):
+        for suffix in _ARABIC_SUFFIXES:
+            if form.endswith(suffix) and len(form) - len(suffix) >= 2:
+                forms.append(form[:-len(suffix)])
+    return forms
+
+
+def _identifier_tokens(name: str) -> List[str]:
+    return [_stem(part) for part in name.lower().split("_") if part]
+
+
+def _text_tokens(text: str) -> List[str]:
+    return [_stem(token) for token in _TOKEN.findall(text.lower())]
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap prompt-token estimate (~4 characters per token)."""
+    return len(text) // 4 + 1
+
+
+class SchemaIndex:
+    """Inverted index over table names, column names and comments.
+
+    Built once per schema; ``prompt_schema`` then selects the top-k tables
+    for a question within a token budget using only dict lookups.
+    """
+
+    def __init__(self, catalog: Dict[str, Dict[str, Any]], synonyms: Optional[Dict[str, List[str]]] = None,
+                 top_k: int = 6, token_budget: int = 1500):
+        self.top_k = top_k
+        self.token_budget = token_budget
+        self.synonyms = {normalize_arabic(k): v for k, v in (synonyms or SYNONYMS).items()}
+        self.full_text = format_schema(catalog)
+        self.fingerprint = schema_fingerprint(self.full_text)
+        self.lines: Dict[str, str] = {}
+        self.line_tokens: Dict[str, int] = {}
+        self._postings: Dict[str, Dict[str, float]] = {}
+
+        for table, entry in catalog.items():
+            line = format_table(table, entry)
+            self.lines[table] = line
+            self.line_tokens[table] = estimate_tokens(line)
+            weighted = [(token, TABLE_WEIGHT) for token in _identifier_tokens(table)]
+            for column, _dtype in entry["columns"]:
+                weighted += [(token, COLUMN_WEIGHT) for token in _identifier_tokens(column)]
+            if entry.get("comment"):
+                weighted += [(token, COMMENT_WEIGHT) for token in _text_tokens(entry["comment"])]
+            for comment in entry.get("column_comments", {}).values():
+                weighted += [(token, COMMENT_WEIGHT) for token in _text_tokens(comment)]
+            for token, weight in weighted:
+                postings = self._postings.setdefault(token, {})
+                postings[table] = max(postings.get(table, 0.0), weight)
+
+        # Rare tokens (e.g. a specific table name) matter more than ones like "id"
+        n_tables = max(len(self.lines), 1)
+        for token, postings in self._postings.items():
+            idf = math.log(1 + n_tables / len(postings))
+            for table in postings:
+                postings[table] *= idf
+
+    def _question_tokens(self, question: str) -> List[str]:
+        tokens = []
+        for raw in _TOKEN.findall(normalize_arabic(question)):
+            if raw.isascii():
+                stemmed = _stem(raw)
+                tokens.append(stemmed)
+                tokens += self.synonyms.get(raw, []) + self.synonyms.get(stemmed, [])
+            else:
+                for form in _arabic_forms(raw):
+                    tokens += self.synonyms.get(form, [])
+        return tokens
+
+    def rank(self, question: str) -> List[tuple]:
+        scores: Dict[str, float] = {}
+        for token in set(self._question_tokens(question)):
+            for table, weight in self._postings.get(token, {}).items():
+                scores[table] = scores.get(table, 0.0) + weight
+        return sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+
+    def select_tables(self, question: str) -> List[str]:
+        ranked = self.rank(question)[:self.top_k]
+        selected, used = [], 0
+        for table, score in ranked:
+            if score < ranked[0][1] * MIN_RELATIVE_SCORE:
+                break
+            cost = self.line_tokens[table]
+            if selected and used + cost > self.token_budget:
+                continue
+            selected.append(table)
+            used += cost
+        return selected
+
+    def prompt_schema(self, question: str) -> str:
+        """Schema text for the prompt: relevant tables only, or everything if nothing matched."""
+        tables = self.select_tables(question)
+        if not tables:
+            return self.full_text
+        return "\n".join(self.lines[table] for table in tables)
+
+
+def build_schema_index(catalog: Dict[str, Dict[str, Any]]) -> Optional[SchemaIndex]:
+    """SCHEMA_PRUNING=0 disables pruning; SCHEMA_SYNONYMS_PATH adds synonyms from a JSON file."""
+    if os.getenv("SCHEMA_PRUNING", "1").lower() in ("0", "false", "no"):
+        return None
+    synonyms = dict(SYNONYMS)
+    synonyms_path = os.getenv("SCHEMA_SYNONYMS_PATH")
+    if synonyms_path:
+        with open(synonyms_path, encoding="utf-8") as f:
+            synonyms.update(json.load(f))
+    return SchemaIndex(
+        catalog,
+        synonyms=synonyms,
+        top_k=int(os.getenv("SCHEMA_TOP_K", "6")),
+        token_budget=int(os.getenv("SCHEMA_TOKEN_BUDGET", "1500")),
+    )
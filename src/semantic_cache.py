@@ -0,0 +1,316 @@
+import os
+import re
+import time
+import zlib
+import sqlite3
+import threading
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple, Union
+import numpy as np
+from src.cache import normalize_arabic
+from src.metrics import SEMANTIC_SIMILARITY
+
+
+# Clitics stripped from the front of Arabic words ("والرواتب" -> "رواتب"), longest first
+_PREFIXES = ("وال", "بال", "فال", "كال", "لل", "ال")
+# Words that change how a question is phrased, not what it asks
+_STOPWORDS = {
+    "show", "list", "display", "give", "get", "me", "the", "a", "an", "of", "for", "in", "what", "is",
+    "are", "all", "please", "اعرض", "اظهر", "هات", "عايز", "اريد", "ما", "هو", "هي", "في", "من", "لي",
+    "عن", "على", "اللي", "الذي", "الذين", "التي",
+}
+# Words asking for the same thing, folded onto one form (keys and values are normalized text)
+_SYNONYMS = {
+    "مرتبات": "راتب", "مرتب": "راتب", "رواتب": "راتب", "معاش": "راتب", "salary": "راتب", "salaries": "راتب",
+    "اقسام": "قسم", "ادارات": "قسم", "ادارة": "قسم", "department": "قسم", "departments": "قسم",
+    "موظفين": "موظف", "موظفي": "موظف", "employee": "موظف", "employees": "موظف", "عاملين": "موظف",
+    "average": "متوسط", "avg": "متوسط", "mean": "متوسط",
+    "count": "عدد", "number": "عدد", "كام": "عدد",
+    "each": "كل", "every": "كل", "per": "كل", "لكل": "كل", "بكل": "كل",
+    "highest": "اعلي", "largest": "اعلي", "اكبر": "اعلي", "lowest": "اقل", "smallest": "اقل", "اصغر": "اقل",
+}
+_NGRAM = 3
+# Repeats of whole-term and neighbouring-pair features relative to the trigrams
+_TERM_WEIGHT = 2
+_PAIR_WEIGHT = 4
+_NUMBER = re.compile(r"\d+(?:\.\d+)?")
+# Quoted text; a single quote only counts at word edges, so "employee's" isn't a quote
+_QUOTED = re.compile(r'"([^"]+)"|«([^»]+)»|“([^”]+)”|(?<!\w)\'([^\']+)\'(?!\w)')
+_PUNCTUATION = "?,;:!.()\"'"
+
+
+def _term(word: str) -> str:
+    word = word.strip(_PUNCTUATION)
+    if word in _SYNONYMS or word in _STOPWORDS:
+        return _SYNONYMS.get(word, "")
+    for prefix in _PREFIXES:
+        if word.startswith(prefix) and len(word) - len(prefix) >= 2:
+            word = word[len(prefix):]
+            break
+    word = _SYNONYMS.get(word, word)
+    return "" if word in _STOPWORDS or _NUMBER.fullmatch(word) else word
+
+
+def question_terms(question: str) -> List[str]:
+    """Content words of a question, with clitics, stopwords and numbers taken out and synonyms folded."""
+    terms = (_term(word) for word in normalize_arabic(question).split())
+    return [term for term in terms if term]
+
+
+def question_literals(question: str) -> Tuple[Union[float, str], ...]:
+    """Numbers, quoted text and single letters ("starts with A") in the question. Questions
+    that differ only in one of these embed alike, so these must match exactly."""
+    text = normalize_arabic(question)
+    quoted = ["".join(groups).strip() for groups in _QUOTED.findall(text)]
+    text = _QUOTED.sub(" ", text)
+    letters = [
+        word for word in (w.strip(_PUNCTUATION) for w in text.split())
+        # "و" (and) is a word of its own in some spellings, not a literal
+        if len(word) == 1 and word.isalpha() and word != "و"
+    ]
+    return tuple([float(n) for n in _NUMBER.findall(text)] + quoted + letters)
+
+
+def _numbers(literals: Tuple[Union[float, str], ...]) -> Tuple[float, ...]:
+    return tuple(literal for literal in literals if isinstance(literal, float))
+
+
+def embed(question: str, dim: int) -> np.ndarray:
+    """Unit vector of hashed features: each term, its character trigrams and each pair of
+    neighbouring terms. Pairs weigh the most, so word order ("highest to lowest" vs
+    "lowest to highest") keeps two questions apart even when their words are the same."""
+    terms = question_terms(question)
+    features = terms * _TERM_WEIGHT
+    for term in terms:
+        padded = f"<{term}>"
+        features.extend(padded[i:i + _NGRAM] for i in range(len(padded) - _NGRAM + 1))
+    features.extend([f"{a} {b}" for a, b in zip(terms, terms[1:])] * _PAIR_WEIGHT)
+    indexes = np.fromiter((zlib.crc32(f.encode("utf-8")) % dim for f in features), dtype=np.int64, count=len(features))
+    vector = np.bincount(indexes, minlength=dim).astype(np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+@dataclass
+class SemanticHit:
+    question: str   # the cached question this one was matched to
+    sql: str
+    similarity: float
+
+
+@dataclass
+class _Entry:
+    question: str
+    sql: str
+    model: str
+    literals: Tuple[Union[float, str], ...]
+
+
+class SemanticCache:
+    """Serves SQL cached for a paraphrase of the question (cosine similarity over hashed n-grams).
+
+    Vectors live in one preallocated NumPy matrix, so a lookup is a single
+    matrix-vector product. When full, the least recently used row is reused.
+    Like SQLCache, everything is dropped when the schema fingerprint changes.
+    ``path`` keeps the questions and SQL in SQLite; vectors are rebuilt on load.
+    """
+
+    def __init__(self, capacity: int = 2000, threshold: float = 0.92, dim: int = 1024,
+                 path: Optional[str] = None, near_misses: int = 200):
+        self.capacity = capacity
+        self.threshold = threshold
+        self.dim = dim
+        self.path = path
+        self.fingerprint: Optional[str] = None
+        self.hits = 0
+        self.misses = 0
+        self.literal_mismatches = 0
+        self.text_literal_mismatches = 0
+        self.model_mismatches = 0
+        self.evictions = 0
+        self._vectors = np.zeros((capacity, dim), dtype=np.float32)
+        # Last use of each row; 0 marks a free row, so argmin finds those first
+        self._used = np.zeros(capacity)
+        self._entries: List[Optional[_Entry]] = [None] * capacity
+        self._rows: Dict[str, int] = {}
+        self._high_water = 0
+        # Recent misses with their closest cached question, for tuning the threshold
+        self._near_misses: "deque[Dict[str, Any]]" = deque(maxlen=near_misses)
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS semantic_sql "
+                "(key TEXT PRIMARY KEY, question TEXT, sql TEXT, fingerprint TEXT, model TEXT, used REAL)"
+            )
+            self._db.commit()
+            self._load()
+
+    def _load(self):
+        rows = self._db.execute(
+            "SELECT key, question, sql, fingerprint, model, used FROM semantic_sql ORDER BY used DESC LIMIT ?",
+            (self.capacity,),
+        ).fetchall()
+        if not rows:
+            return
+        # Only the newest schema's entries are any use
+        self.fingerprint = rows[0][3]
+        for key, question, sql, fingerprint, model, used in reversed(rows):
+            if fingerprint == self.fingerprint:
+                self._put(key, question, sql, model, used)
+        print(f"Semantic cache loaded: {len(self._rows)} questions")
+
+    def _sync(self, fingerprint: str):
+        if fingerprint == self.fingerprint:
+            return
+        if self._rows:
+            print("Schema fingerprint changed, clearing semantic cache")
+        self._clear()
+        self.fingerprint = fingerprint
+
+    def _clear(self):
+        self._vectors[:] = 0
+        self._used[:] = 0
+        self._entries = [None] * self.capacity
+        self._rows.clear()
+        self._high_water = 0
+        if self._db is not None:
+            self._db.execute("DELETE FROM semantic_sql")
+            self._db.commit()
+
+    def _free_row(self) -> int:
+        if self._high_water < self.capacity:
+            self._high_water += 1
+            return self._high_water - 1
+        row = int(np.argmin(self._used))
+        evicted = self._entries[row]
+        if evicted is not None:
+            self.evictions += 1
+            key = normalize_arabic(evicted.question)
+            del self._rows[key]
+            if self._db is not None:
+                self._db.execute("DELETE FROM semantic_sql WHERE key = ?", (key,))
+        return row
+
+    def _put(self, key: str, question: str, sql: str, model: str, used: float):
+        row = self._rows.get(key)
+        if row is None:
+            row = self._free_row()
+        self._vectors[row] = embed(question, self.dim)
+        self._used[row] = used
+        self._entries[row] = _Entry(question, sql, model, question_literals(question))
+        self._rows[key] = row
+
+    def _remove(self, key: str):
+        row = self._rows.pop(key, None)
+        if row is not None:
+            self._vectors[row] = 0
+            self._used[row] = 0
+            self._entries[row] = None
+        if self._db is not None:
+            self._db.execute("DELETE FROM semantic_sql WHERE key = ?", (key,))
+            self._db.commit()
+
+    def get(self, question: str, fingerprint: str, model: str) -> Optional[SemanticHit]:
+        vector = embed(question, self.dim)
+        with self._lock:
+            self._sync(fingerprint)
+            if not self._rows or not vector.any():
+                self.misses += 1
+                return None
+            scores = self._vectors[:self._high_water] @ vector
+            row = int(np.argmax(scores))
+            similarity = round(float(scores[row]), 4)
+            entry = self._entries[row]
+            if entry is None:
+                # Nothing shares a single feature with the question; the best row was a free one
+                self.misses += 1
+                return None
+            reason = None
+            if similarity < self.threshold:
+                reason = "below_threshold"
+            elif entry.model != model:
+                reason = "model_differs"
+                self.model_mismatches += 1
+            else:
+                literals = question_literals(question)
+                if _numbers(entry.literals) != _numbers(literals):
+                    reason = "numbers_differ"
+                    self.literal_mismatches += 1
+                elif entry.literals != literals:
+                    reason = "literals_differ"
+                    self.text_literal_mismatches += 1
+            SEMANTIC_SIMILARITY.observe(similarity, result="miss" if reason else "hit")
+            if reason is not None:
+                self.misses += 1
+                self._near_misses.append(
+                    {"question": question, "closest": entry.question, "similarity": similarity, "reason": reason}
+                )
+                return None
+            self.hits += 1
+            self._used[row] = time.time()
+            return SemanticHit(entry.question, entry.sql, similarity)
+
+    def set(self, question: str, fingerprint: str, model: str, sql: str):
+        key = normalize_arabic(question)
+        used = time.time()
+        with self._lock:
+            self._sync(fingerprint)
+            self._put(key, question, sql, model, used)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO semantic_sql (key, question, sql, fingerprint, model, used) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, question, sql, fingerprint, model, used),
+                )
+                self._db.commit()
+
+    def delete(self, question: str):
+        with self._lock:
+            self._remove(normalize_arabic(question))
+
+    def __len__(self):
+        return len(self._rows)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._rows),
+            "capacity": self.capacity,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "numbers_differ": self.literal_mismatches,
+            "literals_differ": self.text_literal_mismatches,
+            "model_differs": self.model_mismatches,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "persistent": self._db is not None,
+        }
+
+    def report(self, limit: int = 20) -> dict:
+        """Stats plus the closest recent misses: the similarities just under the threshold
+        show what raising or lowering it would let through."""
+        with self._lock:
+            closest: Dict[str, Dict[str, Any]] = {}
+            for miss in self._near_misses:
+                if miss["similarity"] >= closest.get(miss["question"], {"similarity": -1.0})["similarity"]:
+                    closest[miss["question"]] = miss
+        near = sorted(closest.values(), key=lambda miss: miss["similarity"], reverse=True)
+        return {**self.stats(), "near_misses": near[:limit]}
+
+
+def build_semantic_cache() -> Optional[SemanticCache]:
+    """Opt-in (SEMANTIC_CACHE_ENABLED=1): a paraphrase hit skips translation and SQL generation,
+    so tune SEMANTIC_CACHE_THRESHOLD against /admin/semantic-cache before relying on it."""
+    if os.getenv("SEMANTIC_CACHE_ENABLED", "0").lower() not in ("1", "true", "yes"):
+        return None
+    return SemanticCache(
+        capacity=int(os.getenv("SEMANTIC_CACHE_SIZE", "2000")),
+        threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92")),
+        dim=int(os.getenv("SEMANTIC_CACHE_DIM", "1024")),
+        path=os.getenv("SEMANTIC_CACHE_PATH") or None,
+    )
@@ -0,0 +1,87 @@
+import datetime
+from decimal import Decimal
+from typing import List, Any, Dict, Optional, Sequence
+
+
+JSON_FORMAT = "json"
+COMPACT_FORMAT = "compact"
+ARROW_FORMAT = "arrow"
+
+COMPACT_MEDIA_TYPE = "application/vnd.text-to-sql.compact+json"
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+
+def json_default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    if isinstance(value, bytes):
+        return value.hex()
+    return str(value)
+
+
+def _type_name(value) -> str:
+    if isinstance(value, bool):
+        return "boolean"
+    if isinstance(value, (int, float, Decimal)):
+        return "number"
+    if isinstance(value, datetime.datetime):
+        return "datetime"
+    if isinstance(value, datetime.date):
+        return "date"
+    if isinstance(value, bytes):
+        return "binary"
+    return "string"
+
+
+def convert_columns(columns: Sequence[str], rows: List[tuple]) -> tuple[List[str], List[tuple]]:
+    """Infer a type per column and convert Decimal columns to float, one column at a time.
+
+    The type comes from the first non-null value, so only columns that
+    actually hold Decimals are touched instead of checking every cell.
+    """
+    if not rows:
+        return ["null"] * len(columns), []
+
+    data = list(zip(*rows))
+    types, converted = [], False
+    for i, values in enumerate(data):
+        sample = next((v for v in values if v is not None), None)
+        types.append("null" if sample is None else _type_name(sample))
+        if isinstance(sample, Decimal):
+            data[i] = [float(v) if v is not None else None for v in values]
+            converted = True
+
+    if converted:
+        rows = list(zip(*data))
+    return types, rows
+
+
+def to_records(columns: Sequence[str], rows: List[tuple]) -> List[Dict[str, Any]]:
+    return [dict(zip(columns, row)) for row in rows]
+
+
+def to_arrow_ipc(columns: Sequence[str], rows: List[tuple], metadata: Dict[str, str]) -> bytes:
+    """Arrow IPC stream of the rows; ``metadata`` goes into the schema (answer, SQL, paging)."""
+    import pyarrow as pa
+
+    data = list(zip(*rows)) if rows else [[] for _ in columns]
+    table = pa.Table.from_arrays([pa.array(list(values)) for values in data], names=list(columns))
+    table = table.replace_schema_metadata({k: v for k, v in metadata.items() if v is not None})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def negotiate_format(accept: Optional[str], requested: Optional[str]) -> str:
+    """Pick the response format from an explicit ``format`` param or the Accept header."""
+    if requested in (JSON_FORMAT, COMPACT_FORMAT, ARROW_FORMAT):
+        return requested
+    accept = accept or ""
+    if ARROW_MEDIA_TYPE in accept:
+        return ARROW_FORMAT
+    if COMPACT_MEDIA_TYPE in accept:
+        return COMPACT_FORMAT
+    return JSON_FORMAT
@@ -0,0 +1,40 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+from src.metrics import COALESCED_REQUESTS
+
+
+class SingleFlight:
+    """Concurrent calls with the same key share one in-progress computation.
+
+    The first caller (the leader) starts the work; callers arriving while it
+    runs await the same task and get the same result or exception. The task
+    is shielded, so one caller disconnecting doesn't cancel it for the rest.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    async def run(self, key: str, factory: Callable[[], Awaitable[Any]]):
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            COALESCED_REQUESTS.inc(flight=self.name)
+            return await asyncio.shield(task)
+
+        self.leaders += 1
+        task = asyncio.ensure_future(factory())
+        self._inflight[key] = task
+        task.add_done_callback(lambda done: self._finished(key, done))
+        return await asyncio.shield(task)
+
+    def _finished(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # retrieved here so an abandoned failure isn't logged as unhandled
+
+    def stats(self) -> Dict[str, int]:
+        return {"in_flight": len(self._inflight), "leaders": self.leaders, "coalesced": self.coalesced}
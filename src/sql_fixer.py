@@ -0,0 +1,415 @@
+"""Rule-based rewrites for the mechanical mistakes the model makes in SQL.
+
+``normalize`` runs on every generated statement before it is checked or
+executed; ``fix_error`` turns a validator finding or an Oracle error into a
+local rewrite, so only what the rules can't fix goes back to the model.
+Both return the rules that changed the text, for the per-rule counters.
+"""
+import os
+import re
+import difflib
+from typing import List, Dict, Any, Optional, Set, Tuple
+from src.sql_validator import (
+    Token, SQLValidationError, token_spans, starts_clause,
+    FORBIDDEN, KEYWORDS, PSEUDO_COLUMNS, JOIN_WORDS, SET_OPERATORS,
+)
+
+
+# How close a misspelt table/column name must be to a real one to be replaced (difflib ratio)
+SQL_FIX_NAME_CUTOFF = float(os.getenv("SQL_FIX_NAME_CUTOFF", "0.8"))
+
+# String literals, quoted names and comments - text rules never look inside them
+_SKIP_RE = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|--[^\n]*|/\*.*?\*/", re.DOTALL)
+_END_RE = re.compile(_SKIP_RE.pattern + "|;", re.DOTALL)
+
+_FENCE = "```"
+_LANGUAGE_TAG_RE = re.compile(r"\A\s*(?:sql|oracle|plsql)\b[ \t]*\n", re.IGNORECASE)
+_LINE_START_RE = re.compile(r"^[ \t]*(?:SELECT|WITH)\b", re.IGNORECASE | re.MULTILINE)
+# Upper case only: a lower-case "select" in a sentence is prose
+_FIRST_SELECT_RE = re.compile(r"\b(?:SELECT|WITH)\b")
+_STARTS_LIKE_SQL_RE = re.compile(r"\s*(?:SELECT\b|WITH\b|\()", re.IGNORECASE)
+_LEADING_WORD_RE = re.compile(r"\s*([A-Za-z_]+)")
+_STATEMENT_WORDS = FORBIDDEN | {"SELECT", "WITH"}
+
+_LIMIT_RULES = [
+    (re.compile(r"\bLIMIT\s+(\d+)\s*,\s*(\d+)", re.IGNORECASE), r"OFFSET \1 ROWS FETCH NEXT \2 ROWS ONLY"),
+    (re.compile(r"\bLIMIT\s+(\d+)\s+OFFSET\s+(\d+)", re.IGNORECASE), r"OFFSET \2 ROWS FETCH NEXT \1 ROWS ONLY"),
+    (re.compile(r"\bLIMIT\s+(\d+)", re.IGNORECASE), r"FETCH FIRST \1 ROWS ONLY"),
+]
+_TOP_RE = re.compile(r"\b(SELECT(?:\s+DISTINCT)?)\s+TOP\s+(\d+)\b", re.IGNORECASE)
+_BACKTICK_RE = re.compile(r"`([A-Za-z_][\w$#]*)`")
+_TRAILING_COMMA_RE = re.compile(r",(\s*)(FROM)\b", re.IGNORECASE)
+_SIMPLE_NAME_RE = re.compile(r"[A-Za-z_][\w$#]*")
+
+_ORA_RE = re.compile(r"\b(ORA-\d{5})\b")
+_INVALID_IDENTIFIER_RE = re.compile(r'ORA-00904: (?:"[^"]*"\.)?"([^"]+)": invalid identifier')
+_MISSING_IN_TABLE_RE = re.compile(r"^Column (\S+) does not exist in (\S+)\. ", re.MULTILINE)
+_MISSING_IN_ANY_RE = re.compile(r"^Column (\S+) does not exist in any of: (.+)$", re.MULTILINE)
+_MISSING_TABLE_RE = re.compile(r"^Table (\S+) does not exist\.", re.MULTILINE)
+# Statement-shape errors the normalize rules address
+_SHAPE_ERRORS = {"ORA-00933", "ORA-00923", "ORA-00936", "ORA-00911"}
+
+
+def oracle_error_code(message: str) -> Optional[str]:
+    match = _ORA_RE.search(message)
+    return match.group(1) if match else None
+
+
+def _sub_code(pattern: re.Pattern, repl, sql: str) -> str:
+    """``pattern.sub`` on the parts of ``sql`` outside strings, quoted names and comments."""
+    parts, pos = [], 0
+    for match in _SKIP_RE.finditer(sql):
+        parts.append(pattern.sub(repl, sql[pos:match.start()]))
+        parts.append(match.group())
+        pos = match.end()
+    parts.append(pattern.sub(repl, sql[pos:]))
+    return "".join(parts)
+
+
+def _apply(sql: str, edits: List[Tuple[int, int, str]]) -> str:
+    for start, end, replacement in sorted(edits, reverse=True):
+        sql = sql[:start] + replacement + sql[end:]
+    return sql
+
+
+def _is_word(token: Optional[Token], *values) -> bool:
+    return token is not None and token.kind == "word" and (not values or token.value in values)
+
+
+def _is_op(token: Optional[Token], value: str) -> bool:
+    return token is not None and token.kind == "op" and token.value == value
+
+
+def _is_name(token: Optional[Token]) -> bool:
+    return token is not None and (token.kind == "quoted" or (token.kind == "word" and token.value not in KEYWORDS))
+
+
+# ---- text rules: each takes and returns the SQL text ----
+def strip_fences(sql: str) -> str:
+    """```sql ... ``` blocks, and the bare "sql" tag left once the backticks are stripped."""
+    if _FENCE in sql:
+        parts = sql.split(_FENCE)
+        sql = next((part for part in parts if _LINE_START_RE.search(_LANGUAGE_TAG_RE.sub("", part))), parts[0])
+    return _LANGUAGE_TAG_RE.sub("", sql)
+
+
+def strip_preamble(sql: str) -> str:
+    """Drop a sentence such as "Here is the query:" before the statement."""
+    if _STARTS_LIKE_SQL_RE.match(sql):
+        return sql
+    match = _LINE_START_RE.search(sql) or _FIRST_SELECT_RE.search(sql)
+    return sql[match.start():].lstrip() if match else sql
+
+
+def strip_trailing_text(sql: str) -> str:
+    """Drop an explanation after the closing semicolon. A second statement is
+    left in place, so the read-only check still rejects the whole thing."""
+    for match in _END_RE.finditer(sql):
+        if match.group() != ";":
+            continue
+        rest = sql[match.end():]
+        word = _LEADING_WORD_RE.match(rest)
+        if rest.strip() and not (word and word.group(1).upper() in _STATEMENT_WORDS):
+            return sql[:match.start()]
+        return sql
+    return sql
+
+
+def strip_semicolons(sql: str) -> str:
+    sql = sql.strip()
+    while sql.endswith(";"):
+        sql = sql[:-1].rstrip()
+    return sql
+
+
+def unquote_backticks(sql: str) -> str:
+    return _sub_code(_BACKTICK_RE, r"\1", sql)
+
+
+def limit_to_fetch(sql: str) -> str:
+    for pattern, repl in _LIMIT_RULES:
+        sql = _sub_code(pattern, repl, sql)
+    return sql
+
+
+def top_to_fetch(sql: str) -> str:
+    """SELECT TOP n ... -> ... FETCH FIRST n ROWS ONLY, for a single plain SELECT only."""
+    code = _SKIP_RE.sub(" ", sql)
+    match = _TOP_RE.search(code)
+    if match is None or len(re.findall(r"\bSELECT\b", code, re.IGNORECASE)) != 1 or re.search(r"\bFETCH\b", code, re.IGNORECASE):
+        return sql
+    return f"{sql[:match.start()]}{match.group(1)}{sql[match.end():]} FETCH FIRST {match.group(2)} ROWS ONLY"
+
+
+def drop_trailing_comma(sql: str) -> str:
+    """SELECT a, b, FROM t -> SELECT a, b FROM t"""
+    return _sub_code(_TRAILING_COMMA_RE, r"\1\2", sql)
+
+
+_TEXT_RULES = [
+    ("fence", strip_fences),
+    ("preamble", strip_preamble),
+    ("trailing_text", strip_trailing_text),
+    ("semicolon", strip_semicolons),
+    ("backticks", unquote_backticks),
+    ("limit", limit_to_fetch),
+    ("top", top_to_fetch),
+    ("trailing_comma", drop_trailing_comma),
+]
+
+
+class SQLFixer:
+    """Deterministic fixes for generated SQL. With a catalog it also knows the
+    real table and column names (quoted lower-case names, misspellings,
+    join-equated ambiguous columns); without one only the text rules apply."""
+
+    def __init__(self, catalog: Optional[Dict[str, Dict[str, Any]]] = None):
+        self.tables: Dict[str, Set[str]] = {
+            table.upper(): {column.upper() for column, _dtype in entry["columns"]}
+            for table, entry in (catalog or {}).items()
+        }
+        self.columns: Set[str] = set().union(*self.tables.values()) if self.tables else set()
+
+    def normalize(self, sql: str) -> Tuple[str, List[str]]:
+        """Apply every rule; return the new text and the rules that changed it."""
+        applied = []
+        sql = sql.strip()
+        for rule, rewrite in _TEXT_RULES:
+            fixed = rewrite(sql).strip()
+            if fixed != sql:
+                applied.append(rule)
+                sql = fixed
+        try:
+            spans = token_spans(sql)
+        except SQLValidationError:
+            return sql, applied   # not tokenizable - leave the rest to the validator and Oracle
+        for rule, rewrite in (
+            ("string_alias", self._string_aliases),
+            ("quoted_identifier", self._quoted_identifiers),
+        ):
+            fixed = rewrite(sql, spans)
+            if fixed != sql:
+                applied.append(rule)
+                sql = fixed
+                spans = token_spans(sql)
+        return sql, applied
+
+    def fix_error(self, sql: str, error: str) -> Optional[Tuple[str, List[str]]]:
+        """A local rewrite for a validator finding or an Oracle error, or None when no rule applies."""
+        code = oracle_error_code(error)
+        try:
+            if code in _SHAPE_ERRORS:
+                fixed, applied = self.normalize(sql)
+            elif code == "ORA-00918":
+                fixed, applied = self._qualify_ambiguous(sql, token_spans(sql)), ["ambiguous_column"]
+            elif code == "ORA-00904":
+                fixed, applied = self._rename(sql, self._invalid_identifier(error)), ["identifier"]
+            elif code is None:
+                fixed, applied = self._rename(sql, self._validator_renames(error)), ["identifier"]
+            else:
+                return None
+        except SQLValidationError:
+            return None
+        if fixed == sql or not applied:
+            return None
+        return fixed, applied
+
+    # ---- token rules: each takes the SQL and its token_spans ----
+    @staticmethod
+    def _string_aliases(sql: str, spans: list) -> str:
+        """SUM(x) AS 'Total' -> SUM(x) AS "Total" (a string is never an alias in Oracle)."""
+        edits = []
+        for i, (token, start, end) in enumerate(spans):
+            if token.kind == "string" and i > 0 and _is_word(spans[i - 1][0], "AS") and sql[start] == "'":
+                alias = sql[start + 1:end - 1].replace("''", "'")
+                if '"' not in alias:
+                    edits.append((start, end, f'"{alias}"'))
+        return _apply(sql, edits)
+
+    def _quoted_identifiers(self, sql: str, spans: list) -> str:
+        """"first_name" -> FIRST_NAME: quoted lower case never matches Oracle's upper-case names."""
+        if not self.tables:
+            return sql
+        edits = []
+        for token, start, end in spans:
+            name = token.value
+            if (token.kind == "quoted" and name != name.upper() and _SIMPLE_NAME_RE.fullmatch(name)
+                    and (name.upper() in self.tables or name.upper() in self.columns)):
+                edits.append((start, end, name.upper()))
+        return _apply(sql, edits)
+
+    def _qualify_ambiguous(self, sql: str, spans: list) -> str:
+        """After ORA-00918: prefix a bare column with the alias of the first table
+        holding it, but only when the join conditions equate it across every
+        table that has it (``e.department_id = d.department_id``), so either
+        side gives the same value. Anything else is left to the model repair.
+
+        Only for one plain SELECT over catalog tables - with CTEs, set
+        operators, inline views, USING/NATURAL or RIGHT/FULL joins it leaves
+        the text alone.
+        """
+        if not self.tables:
+            return sql
+        tokens = [token for token, _start, _end in spans]
+        if not tokens or _is_word(tokens[0], "WITH") or any(
+            _is_word(t, "USING", "NATURAL", "RIGHT", "FULL", *SET_OPERATORS) for t in tokens
+        ):
+            return sql
+
+        # Clause and subquery membership of every token
+        clauses, in_subquery = [], []
+        stack: List[bool] = []
+        clause = None
+        for i, token in enumerate(tokens):
+            if _is_op(token, "("):
+                in_subquery.append(any(stack))
+                stack.append(_is_word(tokens[i + 1] if i + 1 < len(tokens) else None, "SELECT", "WITH"))
+            elif _is_op(token, ")"):
+                if stack:
+                    stack.pop()
+                in_subquery.append(any(stack))
+            else:
+                if not stack and starts_clause(tokens, i):
+                    clause = token.value
+                in_subquery.append(any(stack))
+            clauses.append(clause)
+
+        from_positions = [i for i, c in enumerate(clauses) if c == "FROM" and not in_subquery[i]]
+        if not from_positions or any(_is_op(tokens[i], "(") for i in from_positions[1:]):
+            return sql
+
+        sources: List[List[str]] = []   # [table, qualifier as written, qualifier as tokenized]
+        on_positions: Set[int] = set()
+        expect_table, in_on = True, False
+        i, stop = from_positions[0] + 1, from_positions[-1] + 1
+        while i < stop:
+            token = tokens[i]
+            if _is_op(token, ",") or _is_word(token, *JOIN_WORDS):
+                expect_table, in_on = True, False
+            elif _is_word(token, "ON"):
+                in_on = True
+            elif in_on:
+                on_positions.add(i)
+            elif expect_table and _is_name(token):
+                name = token.value
+                if i + 2 < stop and _is_op(tokens[i + 1], "."):   # OWNER.TABLE
+                    name = tokens[i + 2].value
+                    i += 2
+                sources.append([name, self._text(sql, spans[i]), tokens[i].value])
+                expect_table = False
+            elif not expect_table and _is_name(token) and sources:
+                sources[-1][1:] = [self._text(sql, spans[i]), token.value]
+            i += 1
+
+        known = [(qualifier, self.tables[table]) for table, qualifier, _key in sources if table in self.tables]
+        if len(known) < 2 or len(known) != len(sources):
+            return sql
+        where = [i for i, c in enumerate(clauses) if c == "WHERE" and not in_subquery[i]]
+        equated = self._equated_columns(tokens, sorted(on_positions) + where, [key for _t, _q, key in sources])
+
+        edits = []
+        for i, (token, start, end) in enumerate(spans):
+            if in_subquery[i] or not (clauses[i] in ("SELECT", "WHERE", "GROUP", "HAVING") or i in on_positions):
+                continue
+            if not _is_name(token) or token.kind != "word" or token.value in PSEUDO_COLUMNS:
+                continue
+            previous = tokens[i - 1] if i > 0 else None
+            following = tokens[i + 1] if i + 1 < len(tokens) else None
+            if _is_op(previous, ".") or _is_op(following, ".") or _is_op(following, "("):
+                continue
+            # An alias, explicit (AS x) or implicit (expr x)
+            if _is_word(previous, "AS", "END") or _is_name(previous) or _is_op(previous, ")") or (
+                previous is not None and previous.kind in ("number", "string", "bind")
+            ):
+                continue
+            holders = [n for n, (_qualifier, columns) in enumerate(known) if token.value in columns]
+            if len(holders) > 1 and _connected(holders, equated.get(token.value, [])):
+                edits.append((start, end, f"{known[holders[0]][0]}.{sql[start:end]}"))
+        return _apply(sql, edits)
+
+    @staticmethod
+    def _equated_columns(tokens: List[Token], positions: List[int], keys: List[str]) -> Dict[str, List[Tuple[int, int]]]:
+        """``a.COL = b.COL`` conditions in the ON/WHERE tokens at ``positions``: column -> pairs of
+        source indexes. A condition under OR doesn't hold for every row, so OR means none."""
+        if any(_is_word(tokens[i], "OR") for i in positions):
+            return {}
+        index = {key: n for n, key in enumerate(keys)}
+        equated: Dict[str, List[Tuple[int, int]]] = {}
+        for i in positions:
+            if not _is_op(tokens[i], "=") or i < 3 or i + 3 >= len(tokens):
+                continue
+            left, right = tokens[i - 3:i], tokens[i + 1:i + 4]
+            if not all(_is_op(side[1], ".") and _is_name(side[0]) and _is_name(side[2]) for side in (left, right)):
+                continue
+            if left[2].value == right[2].value and left[0].value in index and right[0].value in index:
+                equated.setdefault(left[2].value, []).append((index[left[0].value], index[right[0].value]))
+        return equated
+
+    @staticmethod
+    def _text(sql: str, span: Tuple[Token, int, int]) -> str:
+        return sql[span[1]:span[2]]
+
+    # ---- misspelt names ----
+    def _closest(self, name: str, candidates: Set[str]) -> Optional[str]:
+        matches = difflib.get_close_matches(name.upper(), sorted(candidates), n=1, cutoff=SQL_FIX_NAME_CUTOFF)
+        return matches[0] if matches else None
+
+    def _invalid_identifier(self, error: str) -> Dict[str, str]:
+        match = _INVALID_IDENTIFIER_RE.search(error)
+        if match is None or not self.tables:
+            return {}
+        name = match.group(1)
+        if name != name.upper() and name.upper() in self.columns:
+            return {name: name.upper()}
+        replacement = self._closest(name, self.columns)
+        return {name: replacement} if replacement else {}
+
+    def _validator_renames(self, error: str) -> Dict[str, str]:
+        renames = {}
+        for name, table in _MISSING_IN_TABLE_RE.findall(error):
+            replacement = self._closest(name, self.tables.get(table, set()))
+            if replacement:
+                renames[name] = replacement
+        for name, tables in _MISSING_IN_ANY_RE.findall(error):
+            candidates = set().union(*(self.tables.get(t.strip(), set()) for t in tables.split(",")))
+            replacement = self._closest(name, candidates)
+            if replacement:
+                renames[name] = replacement
+        for name in _MISSING_TABLE_RE.findall(error):
+            replacement = self._closest(name, set(self.tables))
+            if replacement:
+                renames[name] = replacement
+        return renames
+
+    @staticmethod
+    def _rename(sql: str, renames: Dict[str, str]) -> str:
+        """Replace every occurrence of each bad name: bare (any case) or quoted exactly as reported."""
+        if not renames:
+            return sql
+        edits = []
+        for token, start, end in token_spans(sql):
+            if token.kind == "quoted" and token.value in renames:
+                edits.append((start, end, renames[token.value]))
+            elif token.kind == "word":
+                for bad, good in renames.items():
+                    if bad == bad.upper() and token.value == bad:
+                        edits.append((start, end, good))
+                        break
+        return _apply(sql, edits)
+
+
+def _connected(nodes: List[int], pairs: List[Tuple[int, int]]) -> bool:
+    """Whether ``pairs`` link all of ``nodes`` into one group."""
+    group = {nodes[0]}
+    grew = True
+    while grew:
+        grew = False
+        for a, b in pairs:
+            if (a in group) != (b in group):
+                group |= {a, b}
+                grew = True
+    return group.issuperset(nodes)
+
+
+def build_sql_fixer(catalog: Optional[Dict[str, Dict[str, Any]]] = None) -> SQLFixer:
+    return SQLFixer(catalog)
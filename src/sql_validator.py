@@ -0,0 +1,487 @@
+"""In-process SQL checks run before anything is sent to Oracle.
+
+The tokenizer and scope walk below cover the Oracle SELECT dialect the model
+writes (CTEs, joins, subqueries, set operators, analytic functions). When a
+construct is too dynamic to check (PIVOT, ``*`` over an unknown source), the
+check is skipped rather than guessed, so a finding is always worth a repair.
+"""
+import re
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, Optional, Set, Tuple, Union
+
+
+class SQLValidationError(ValueError):
+    """``kind`` is "unsafe" (never run it), "syntax" or "schema" (worth a repair)."""
+
+    def __init__(self, message: str, kind: str = "schema"):
+        super().__init__(message)
+        self.kind = kind
+
+
+@dataclass
+class Token:
+    kind: str   # word, quoted, string, number, bind, op
+    value: str  # words upper-cased, quoted identifiers kept as written
+
+
+@dataclass
+class Group:
+    """A parenthesized run of tokens."""
+    items: List[Union[Token, "Group"]] = field(default_factory=list)
+
+
+_TOKEN_RE = re.compile(r"""
+    (?P<space>\s+)
+  | (?P<comment>--[^\n]*|/\*.*?\*/)
+  | (?P<string>[nN]?'(?:[^']|'')*')
+  | (?P<quoted>"(?:[^"]|"")+")
+  | (?P<number>(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)
+  | (?P<bind>:\w+)
+  | (?P<word>[A-Za-z_][\w$#]*)
+  | (?P<op><>|!=|\^=|<=|>=|\|\||=>|[(),.;*+\-/<>=%])
+""", re.VERBOSE | re.DOTALL)
+
+# Statements and calls that change data, take locks or reach outside the schema
+FORBIDDEN = {
+    "INSERT", "UPDATE", "DELETE", "MERGE", "UPSERT", "DROP", "ALTER", "CREATE", "TRUNCATE",
+    "RENAME", "GRANT", "REVOKE", "COMMIT", "ROLLBACK", "SAVEPOINT", "LOCK", "EXECUTE",
+    "EXEC", "CALL", "DECLARE", "BEGIN", "ATTACH", "DETACH", "PRAGMA", "REINDEX", "ANALYZE",
+}
+FORBIDDEN_PREFIXES = ("DBMS_", "UTL_")
+
+KEYWORDS = {
+    "SELECT", "FROM", "WHERE", "GROUP", "BY", "HAVING", "ORDER", "ASC", "DESC", "NULLS", "FIRST",
+    "LAST", "AND", "OR", "NOT", "IN", "IS", "NULL", "LIKE", "ESCAPE", "BETWEEN", "EXISTS", "CASE",
+    "WHEN", "THEN", "ELSE", "END", "AS", "DISTINCT", "ALL", "ANY", "SOME", "UNIQUE", "ON", "USING",
+    "JOIN", "INNER", "LEFT", "RIGHT", "FULL", "OUTER", "CROSS", "NATURAL", "UNION", "INTERSECT",
+    "MINUS", "EXCEPT", "WITH", "OVER", "PARTITION", "ROWS", "ROW", "RANGE", "UNBOUNDED",
+    "PRECEDING", "FOLLOWING", "CURRENT", "FETCH", "NEXT", "ONLY", "OFFSET", "TIES", "PERCENT",
+    "CONNECT", "START", "PRIOR", "NOCYCLE", "SIBLINGS", "INTERVAL", "YEAR", "MONTH", "DAY", "HOUR",
+    "MINUTE", "SECOND", "TO", "DATE", "TIMESTAMP", "TIME", "ZONE", "AT", "LOCAL", "WITHIN", "KEEP",
+    "DENSE_RANK", "LEADING", "TRAILING", "BOTH", "LATERAL", "NUMBER", "VARCHAR2", "VARCHAR",
+    "NVARCHAR2", "CHAR", "INTEGER", "INT", "FLOAT", "DECIMAL", "CLOB", "IGNORE", "RESPECT",
+}
+PSEUDO_COLUMNS = {
+    "SYSDATE", "SYSTIMESTAMP", "CURRENT_DATE", "CURRENT_TIMESTAMP", "LOCALTIMESTAMP", "USER",
+    "UID", "ROWNUM", "ROWID", "LEVEL", "TRUE", "FALSE", "DBTIMEZONE", "SESSIONTIMEZONE",
+    "ORA_ROWSCN", "CONNECT_BY_ISLEAF", "CONNECT_BY_ISCYCLE",
+}
+# Constructs whose output columns can't be worked out from the text
+OPAQUE = {"PIVOT", "UNPIVOT", "MODEL", "MATCH_RECOGNIZE", "XMLTABLE", "JSON_TABLE"}
+
+CLAUSES = {"SELECT", "FROM", "WHERE", "GROUP", "HAVING", "ORDER", "CONNECT", "START", "FETCH", "OFFSET"}
+SET_OPERATORS = {"UNION", "INTERSECT", "MINUS", "EXCEPT"}
+JOIN_WORDS = {"JOIN", "INNER", "LEFT", "RIGHT", "FULL", "OUTER", "CROSS", "NATURAL"}
+
+MAX_LISTED_COLUMNS = 40
+
+
+def token_spans(sql: str) -> List[Tuple[Token, int, int]]:
+    """Tokens with their ``(start, end)`` offsets in ``sql``, for rewriting the text in place."""
+    spans, pos = [], 0
+    while pos < len(sql):
+        match = _TOKEN_RE.match(sql, pos)
+        if match is None:
+            if sql[pos] in "'\"":
+                raise SQLValidationError("Unterminated quoted string or identifier", "syntax")
+            raise SQLValidationError(f"Unexpected character {sql[pos]!r} at position {pos}", "syntax")
+        kind, text = match.lastgroup, match.group()
+        start, pos = pos, match.end()
+        if kind in ("space", "comment"):
+            continue
+        if kind == "word":
+            text = text.upper()
+        elif kind == "quoted":
+            text = text[1:-1].replace('""', '"')
+        spans.append((Token(kind, text), start, pos))
+    return spans
+
+
+def tokenize(sql: str) -> List[Token]:
+    return [token for token, _start, _end in token_spans(sql)]
+
+
+def _statement_tokens(sql: str) -> List[Token]:
+    """Tokens of the single read-only statement in ``sql``, or SQLValidationError("unsafe")."""
+    tokens = tokenize(sql)
+    while tokens and tokens[-1].value == ";":
+        tokens.pop()
+    if not tokens:
+        raise SQLValidationError("Empty statement", "unsafe")
+    if any(t.kind == "op" and t.value == ";" for t in tokens):
+        raise SQLValidationError("Only a single statement is allowed", "unsafe")
+
+    first = next((t for t in tokens if t.value != "("), tokens[0])
+    if first.kind != "word" or first.value not in ("SELECT", "WITH"):
+        raise SQLValidationError("Only SELECT statements are allowed", "unsafe")
+    for t in tokens:
+        if t.kind == "word" and (t.value in FORBIDDEN or t.value.startswith(FORBIDDEN_PREFIXES)):
+            raise SQLValidationError(f"{t.value} is not allowed in a read-only query", "unsafe")
+    return tokens
+
+
+def check_read_only(sql: str):
+    """Raise SQLValidationError unless ``sql`` is one SELECT (or WITH ... SELECT) statement."""
+    _statement_tokens(sql)
+
+
+def _group(tokens: List[Token]) -> Group:
+    stack = [Group()]
+    for t in tokens:
+        if t.kind == "op" and t.value == "(":
+            stack.append(Group())
+        elif t.kind == "op" and t.value == ")":
+            if len(stack) == 1:
+                raise SQLValidationError("Unbalanced parentheses: unexpected ')'", "syntax")
+            inner = stack.pop()
+            stack[-1].items.append(inner)
+        else:
+            stack[-1].items.append(t)
+    if len(stack) != 1:
+        raise SQLValidationError("Unbalanced parentheses: missing ')'", "syntax")
+    return stack[0]
+
+
+def _is_word(item, *values) -> bool:
+    return isinstance(item, Token) and item.kind == "word" and (not values or item.value in values)
+
+
+def _is_op(item, value: str) -> bool:
+    return isinstance(item, Token) and item.kind == "op" and item.value == value
+
+
+def _is_name(item) -> bool:
+    return isinstance(item, Token) and (
+        item.kind == "quoted" or (item.kind == "word" and item.value not in KEYWORDS)
+    )
+
+
+def _is_query(group: Group) -> bool:
+    items = group.items
+    while len(items) == 1 and isinstance(items[0], Group):
+        items = items[0].items
+    return bool(items) and _is_word(items[0], "SELECT", "WITH")
+
+
+def starts_clause(items: list, i: int) -> bool:
+    """GROUP/ORDER also appear in WITHIN GROUP (...) and friends, so look at the next word."""
+    item = items[i]
+    if not _is_word(item, *CLAUSES):
+        return False
+    following = items[i + 1] if i + 1 < len(items) else None
+    if item.value in ("GROUP", "ORDER", "CONNECT"):
+        return _is_word(following, "BY", "SIBLINGS")
+    if item.value == "START":
+        return _is_word(following, "WITH")
+    if item.value == "FETCH":
+        return _is_word(following, "FIRST", "NEXT")
+    return True
+
+
+def _split(items: list, separator) -> List[list]:
+    parts, current = [], []
+    for item in items:
+        if separator(item):
+            parts.append(current)
+            current = []
+        else:
+            current.append(item)
+    parts.append(current)
+    return parts
+
+
+@dataclass
+class Source:
+    name: str
+    columns: Optional[Set[str]]  # None: unknown, accept anything
+
+
+class _Scope:
+    def __init__(self, parent: Optional["_Scope"] = None):
+        self.parent = parent
+        self.sources: Dict[str, Source] = {}   # qualifier -> source
+        self.anonymous: List[Source] = []      # inline views without an alias
+
+    def all_sources(self) -> List[Source]:
+        return list(self.sources.values()) + self.anonymous
+
+    def find(self, qualifier: str) -> Optional[Source]:
+        scope = self
+        while scope is not None:
+            if qualifier in scope.sources:
+                return scope.sources[qualifier]
+            scope = scope.parent
+        return None
+
+    def chain(self) -> List[Source]:
+        sources, scope = [], self
+        while scope is not None:
+            sources.extend(scope.all_sources())
+            scope = scope.parent
+        return sources
+
+
+class SQLValidator:
+    """Checks generated SQL against one catalog: a single read-only statement
+    whose every table and column exists."""
+
+    def __init__(self, catalog: Dict[str, Dict[str, Any]]):
+        self.tables: Dict[str, Set[str]] = {
+            table.upper(): {column.upper() for column, _dtype in entry["columns"]}
+            for table, entry in catalog.items()
+        }
+        self.tables.setdefault("DUAL", {"DUMMY"})
+
+    def validate(self, sql: str):
+        """Raise SQLValidationError describing every problem found, or return None."""
+        tokens = _statement_tokens(sql)
+        errors: List[str] = []
+        self._query(_group(tokens).items, None, {}, errors)
+        if errors:
+            # Same problem reported from several places reads as noise in the repair prompt
+            raise SQLValidationError("\n".join(dict.fromkeys(errors)), "schema")
+
+    # ---- queries ----
+    def _query(self, items: list, parent: Optional[_Scope], ctes: Dict[str, Optional[Set[str]]],
+               errors: List[str]) -> Optional[Set[str]]:
+        """Check a (possibly WITH-prefixed, possibly set-operated) query; return its output columns."""
+        while len(items) == 1 and isinstance(items[0], Group):
+            items = items[0].items
+        if items and _is_word(items[0], "WITH"):
+            ctes = dict(ctes)
+            i = 1
+            while i < len(items) and _is_name(items[i]):
+                name = items[i].value
+                i += 1
+                column_list = None
+                if i < len(items) and isinstance(items[i], Group):
+                    column_list = {t.value for t in items[i].items if _is_name(t)}
+                    i += 1
+                if i < len(items) and _is_word(items[i], "AS"):
+                    i += 1
+                if i < len(items) and isinstance(items[i], Group):
+                    ctes[name] = column_list  # visible to itself for recursive CTEs
+                    output = self._query(items[i].items, parent, ctes, errors)
+                    ctes[name] = column_list or output
+                    i += 1
+                if i < len(items) and _is_op(items[i], ","):
+                    i += 1
+                else:
+                    break
+            items = items[i:]
+
+        branches = _split(items, lambda item: _is_word(item, *SET_OPERATORS))
+        outputs = [self._select(branch, parent, ctes, errors) for branch in branches if branch]
+        return outputs[0] if outputs else None
+
+    def _select(self, items: list, parent: Optional[_Scope], ctes: Dict[str, Optional[Set[str]]],
+                errors: List[str]) -> Optional[Set[str]]:
+        if items and _is_word(items[0], "ALL"):   # UNION ALL
+            items = items[1:]
+        if len(items) == 1 and isinstance(items[0], Group):
+            return self._query(items[0].items, parent, ctes, errors)
+        if not items or not _is_word(items[0], "SELECT"):
+            return None
+        if any(_is_word(item, *OPAQUE) for item in items):
+            return None
+
+        clauses: Dict[str, list] = {}
+        current = None
+        for i, item in enumerate(items):
+            if starts_clause(items, i):
+                current = item.value
+                clauses.setdefault(current, [])
+            elif current is not None:
+                clauses[current].append(item)
+
+        scope = _Scope(parent)
+        conditions = self._from(clauses.get("FROM", []), scope, ctes, errors)
+
+        select_list = [part for part in _split(clauses["SELECT"], lambda item: _is_op(item, ",")) if part]
+        aliases: Set[str] = set()
+        output: Optional[Set[str]] = set()
+        for part in select_list:
+            alias = self._alias(part)
+            if alias is not None:
+                aliases.add(alias)
+                part = part[:-2] if len(part) > 2 and _is_word(part[-2], "AS") else part[:-1]
+                output.add(alias)
+            elif _is_op(part[-1], "*"):
+                output = self._star(part, scope, output)
+            elif _is_name(part[-1]):
+                output.add(part[-1].value)
+            self._refs(part, scope, ctes, errors)
+
+        for expr in conditions:
+            self._refs(expr, scope, ctes, errors)
+        for clause in ("WHERE", "GROUP", "HAVING", "CONNECT", "START"):
+            self._refs(clauses.get(clause, []), scope, ctes, errors)
+        # ORDER BY may also use select-list aliases
+        self._refs(clauses.get("ORDER", []), scope, ctes, errors, extra=aliases)
+        return output
+
+    def _star(self, part: list, scope: _Scope, output: Optional[Set[str]]) -> Optional[Set[str]]:
+        if output is None:
+            return None
+        if len(part) >= 3 and _is_op(part[-2], "."):
+            source = scope.find(part[-3].value)
+            sources = [source] if source is not None else []
+        else:
+            sources = scope.all_sources()
+        if not sources or any(s.columns is None for s in sources):
+            return None
+        for source in sources:
+            output |= source.columns
+        return output
+
+    @staticmethod
+    def _alias(part: list) -> Optional[str]:
+        """The column alias of a select-list item, explicit (AS x) or implicit (expr x)."""
+        if len(part) < 2 or not _is_name(part[-1]):
+            return None
+        previous = part[-2]
+        if _is_word(previous, "AS"):
+            return part[-1].value
+        if _is_op(previous, "."):
+            return None
+        if isinstance(previous, Group) or _is_name(previous) or _is_word(previous, "END", "NULL"):
+            return part[-1].value
+        if isinstance(previous, Token) and previous.kind in ("number", "string", "bind"):
+            return part[-1].value
+        return None
+
+    # ---- FROM clause ----
+    def _from(self, items: list, scope: _Scope, ctes: Dict[str, Optional[Set[str]]],
+              errors: List[str]) -> List[list]:
+        """Register every table / inline view in ``scope``; return the ON conditions."""
+        conditions: List[list] = []
+        refs: List[list] = []
+        current: list = []
+        i = 0
+        while i < len(items):
+            item = items[i]
+            if _is_op(item, ",") or _is_word(item, *JOIN_WORDS):
+                if current:
+                    refs.append(current)
+                current = []
+            elif _is_word(item, "ON"):
+                refs.append(current)
+                current = []
+                condition = []
+                i += 1
+                while i < len(items) and not (_is_op(items[i], ",") or _is_word(items[i], *JOIN_WORDS)):
+                    condition.append(items[i])
+                    i += 1
+                conditions.append(condition)
+                continue
+            elif _is_word(item, "USING"):
+                refs.append(current)
+                current = []
+                i += 2   # skip the (col, ...) list; those columns exist on both sides by definition
+                continue
+            else:
+                current.append(item)
+            i += 1
+        if current:
+            refs.append(current)
+
+        for ref in refs:
+            if ref:
+                self._table_ref(ref, scope, ctes, errors)
+        return conditions
+
+    def _table_ref(self, ref: list, scope: _Scope, ctes: Dict[str, Optional[Set[str]]], errors: List[str]):
+        if _is_word(ref[0], "LATERAL"):
+            ref = ref[1:]
+        alias = ref[-1].value if len(ref) > 1 and _is_name(ref[-1]) else None
+
+        if isinstance(ref[0], Group):
+            columns = self._query(ref[0].items, scope.parent, ctes, errors) if _is_query(ref[0]) else None
+            source = Source(alias or "inline view", columns)
+            if alias:
+                scope.sources[alias] = source
+            else:
+                scope.anonymous.append(source)
+            return
+
+        if not _is_name(ref[0]):
+            return
+        name = ref[0].value
+        if len(ref) >= 3 and _is_op(ref[1], ".") and _is_name(ref[2]):
+            name = ref[2].value   # OWNER.TABLE
+            if len(ref) == 3:
+                alias = None
+        if len(ref) > 1 and isinstance(ref[1], Group):
+            # Table function such as TABLE(...) - columns unknown
+            scope.sources[alias or name] = Source(name, None)
+            return
+
+        if name in ctes:
+            columns = ctes[name]
+        elif name in self.tables:
+            columns = self.tables[name]
+        else:
+            errors.append(f"Table {name} does not exist. Known tables: {', '.join(sorted(self.tables))}")
+            columns = None
+        scope.sources[alias or name] = Source(name, columns)
+
+    # ---- column references ----
+    def _refs(self, items: list, scope: _Scope, ctes: Dict[str, Optional[Set[str]]], errors: List[str],
+              extra: Set[str] = frozenset()):
+        i = 0
+        while i < len(items):
+            item = items[i]
+            following = items[i + 1] if i + 1 < len(items) else None
+
+            if isinstance(item, Group):
+                if _is_query(item):
+                    self._query(item.items, scope, ctes, errors)
+                else:
+                    self._refs(item.items, scope, ctes, errors, extra)
+                i += 1
+                continue
+
+            if not _is_name(item) or (isinstance(following, Group)) or (i > 0 and _is_word(items[i - 1], "AS")):
+                i += 1
+                continue
+
+            if _is_op(following, ".") and i + 2 < len(items):
+                column = items[i + 2]
+                after = items[i + 3] if i + 3 < len(items) else None
+                if isinstance(after, Group) or _is_op(after, "."):
+                    i += 3   # package.function(...) or a three-part name
+                    continue
+                if _is_name(column) or _is_op(column, "*"):
+                    self._check_qualified(item.value, column.value, scope, errors)
+                i += 3
+                continue
+
+            name = item.value
+            if item.kind == "quoted" or name not in PSEUDO_COLUMNS:
+                self._check_column(name, scope, errors, extra)
+            i += 1
+
+    def _check_qualified(self, qualifier: str, column: str, scope: _Scope, errors: List[str]):
+        source = scope.find(qualifier)
+        if source is None:
+            errors.append(f"{qualifier}.{column}: no table or alias named {qualifier} in this query")
+        elif column != "*" and source.columns is not None and column not in source.columns:
+            errors.append(self._missing(column, source))
+
+    def _check_column(self, name: str, scope: _Scope, errors: List[str], extra: Set[str]):
+        if name in extra:
+            return
+        sources = scope.chain()
+        if not sources or any(s.columns is None or name in s.columns for s in sources):
+            return
+        if len(scope.all_sources()) == 1:
+            errors.append(self._missing(name, scope.all_sources()[0]))
+        else:
+            names = ", ".join(sorted({s.name for s in sources}))
+            errors.append(f"Column {name} does not exist in any of: {names}")
+
+    @staticmethod
+    def _missing(column: str, source: Source) -> str:
+        known = sorted(source.columns)
+        listed = ", ".join(known[:MAX_LISTED_COLUMNS]) + (", ..." if len(known) > MAX_LISTED_COLUMNS else "")
+        return f"Column {column} does not exist in {source.name}. {source.name} has: {listed}"
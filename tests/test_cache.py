@@ -0,0 +1,76 @@
+import sqlite3
+import time
+from src import cache as cache_module
+from src.cache import TTLCache, SQLCache, ResultCache, normalize_arabic
+
+
+def disk_keys(path, name="cache"):
+    with sqlite3.connect(path) as db:
+        return {row[0] for row in db.execute(f'SELECT key FROM "{name}"')}
+
+
+def test_normalize_arabic_folds_spelling_variants():
+    assert normalize_arabic("أعلى  الرواتبُ؟") == normalize_arabic("اعلى الرواتب")
+
+
+def test_hits_survive_a_restart(tmp_path):
+    path = str(tmp_path / "c.sqlite")
+    TTLCache(maxsize=4, path=path).set("a", {"x": 1})
+    assert TTLCache(maxsize=4, path=path).get("a") == {"x": 1}
+
+
+def test_eviction_removes_the_disk_row(tmp_path):
+    path = str(tmp_path / "c.sqlite")
+    c = TTLCache(maxsize=2, path=path)
+    for key in ("a", "b", "c"):
+        c.set(key, key)
+    assert c.evictions == 1
+    assert disk_keys(path) == {"b", "c"}
+
+
+def test_expired_entry_removes_the_disk_row(tmp_path):
+    path = str(tmp_path / "c.sqlite")
+    c = TTLCache(maxsize=4, ttl=60, path=path)
+    c.set("a", 1)
+    c._data["a"] = (time.time() - 120, 1)
+    assert c.get("a") is None
+    assert disk_keys(path) == set()
+
+
+def test_periodic_prune_drops_expired_and_surplus_rows(tmp_path, monkeypatch):
+    path = str(tmp_path / "c.sqlite")
+    with sqlite3.connect(path) as db:
+        db.execute('CREATE TABLE "cache" (key TEXT PRIMARY KEY, value TEXT, created REAL)')
+        now = time.time()
+        db.executemany('INSERT INTO "cache" VALUES (?, ?, ?)',
+                       [("old", "1", now - 7200)] + [(f"k{i}", "1", now - i) for i in range(5)])
+    # Opening prunes: "old" is past the TTL and only the newest maxsize rows stay
+    c = TTLCache(maxsize=3, ttl=3600, path=path)
+    assert disk_keys(path) == {"k0", "k1", "k2"}
+
+    monkeypatch.setattr(cache_module, "CACHE_PRUNE_EVERY", 2)
+    with sqlite3.connect(path) as db:
+        db.execute('UPDATE "cache" SET created = ? WHERE key = ?', (time.time() - 7200, "k2"))
+    c.set("n1", 1)
+    c.set("n2", 1)
+    assert "k2" not in disk_keys(path)
+    assert len(disk_keys(path)) <= 3
+
+
+def test_sql_cache_drops_entries_when_the_fingerprint_changes():
+    sql_cache = SQLCache(TTLCache(maxsize=8))
+    sql_cache.set("كام موظف؟", "v1", "m", "SELECT COUNT(*) FROM EMPLOYEES")
+    assert sql_cache.get("كام موظف", "v1", "m") == "SELECT COUNT(*) FROM EMPLOYEES"
+    assert sql_cache.get("كام موظف", "v2", "m") is None
+    assert sql_cache.get("كام موظف", "v1", "m") is None
+
+
+def test_result_cache_invalidates_on_the_statement_tables_only():
+    results = ResultCache()
+    sql = "SELECT e.salary FROM employees e WHERE e.department_id = :dept"
+    key = sql + '\n-- offset=0 limit=100 binds={"dept": "x JOIN departments"}'
+    results.set(key, [(1,)], source_sql=sql)
+    assert results.invalidate_tables(["DEPARTMENTS"]) == 0
+    assert results.get(key) is not None
+    assert results.invalidate_tables(["EMPLOYEES"]) == 1
+    assert results.get(key) is None
@@ -0,0 +1,72 @@
+import pytest
+from sqlalchemy import create_engine, text
+from src.pagination import (
+    paginate_sql, alias_duplicate_columns, encode_page_token, decode_page_token, clamp_page_size,
+    InvalidPageToken, MAX_ROWS, PAGE_SIZE
+)
+
+
+def test_page_clause_is_appended_not_wrapped():
+    sql = "SELECT e.*, d.* FROM employees e JOIN departments d ON e.department_id = d.department_id"
+    paged = paginate_sql(sql, "oracle")
+    assert paged.startswith(sql)
+    assert paged.endswith("OFFSET :offset ROWS FETCH NEXT :limit ROWS ONLY")
+
+
+def test_order_by_added_only_when_missing():
+    assert "ORDER BY 1" in paginate_sql("SELECT salary FROM employees", "oracle")
+    assert "ORDER BY 1" not in paginate_sql("SELECT salary FROM employees ORDER BY salary DESC", "oracle")
+
+
+def test_order_by_inside_over_does_not_count():
+    paged = paginate_sql("SELECT x, ROW_NUMBER() OVER (ORDER BY y) r FROM t", "oracle")
+    assert "\nORDER BY 1" in paged
+
+
+def test_trailing_comment_does_not_swallow_page_clause():
+    paged = paginate_sql("SELECT salary FROM employees ORDER BY salary -- top", "sqlite")
+    assert paged.splitlines()[-1] == "LIMIT :limit OFFSET :offset"
+
+
+def test_own_row_limit_is_wrapped_with_aliases():
+    sql = "SELECT e.department_id, d.department_id FROM e, d ORDER BY 1 FETCH FIRST :count ROWS ONLY"
+    paged = paginate_sql(sql, "oracle")
+    assert paged.startswith("SELECT * FROM (")
+    assert "d.department_id AS DEPARTMENT_ID_2" in paged
+
+
+def test_alias_keeps_explicit_and_unique_names():
+    sql = "SELECT DISTINCT a.id, b.id AS other, c.id, COUNT(*) FROM a, b, c"
+    assert alias_duplicate_columns(sql) == "SELECT DISTINCT a.id, b.id AS other, c.id AS ID_2, COUNT(*) FROM a, b, c"
+
+
+def test_pages_run_on_sqlite_without_repeats():
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE t (id INTEGER, name TEXT)"))
+        conn.execute(text("INSERT INTO t VALUES (:id, :name)"), [{"id": i, "name": f"n{i}"} for i in (5, 3, 9, 1, 7)])
+        paged = paginate_sql("SELECT a.id, b.id FROM t a JOIN t b ON a.id = b.id", "sqlite")
+        seen = []
+        for offset in (0, 2, 4):
+            seen += [row[0] for row in conn.execute(text(paged), {"offset": offset, "limit": 2})]
+    assert seen == [1, 3, 5, 7, 9]
+
+
+def test_page_token_round_trip_with_binds():
+    token = encode_page_token("SELECT 1 FROM dual WHERE x = :x", 200, 100, {"x": "Sales"})
+    assert decode_page_token(token) == ("SELECT 1 FROM dual WHERE x = :x", 200, 100, {"x": "Sales"})
+
+
+def test_tampered_token_is_rejected():
+    token = encode_page_token("SELECT 1 FROM dual", 0, 10)
+    forged = encode_page_token("SELECT password FROM users", 0, 10).split(".")[0] + "." + token.split(".")[1]
+    with pytest.raises(InvalidPageToken):
+        decode_page_token(forged)
+    with pytest.raises(InvalidPageToken):
+        decode_page_token("not-a-token")
+
+
+def test_page_size_is_clamped():
+    assert clamp_page_size(None) == PAGE_SIZE
+    assert clamp_page_size(0) == PAGE_SIZE
+    assert clamp_page_size(MAX_ROWS + 1) == MAX_ROWS
@@ -0,0 +1,63 @@
+import json
+import pytest
+from src.question_templates import TemplateMatcher, build_template_matcher, compile_pattern, load_templates
+
+matcher = build_template_matcher("config/question_templates.json")
+
+
+def write_templates(tmp_path, templates):
+    path = tmp_path / "templates.json"
+    path.write_text(json.dumps({"templates": templates}), encoding="utf-8")
+    return str(path)
+
+
+def test_shipped_templates_all_load():
+    with open("config/question_templates.json", encoding="utf-8") as f:
+        assert len(matcher) == len(json.load(f)["templates"])
+
+
+def test_arabic_department_maps_to_its_bind_value():
+    match = matcher.match("متوسط الرواتب في قسم المبيعات؟")
+    assert match.template == "department_average_salary"
+    assert match.binds == {"department": "Sales"}
+    assert ":department" in match.sql
+
+
+def test_spelling_variants_and_arabic_digits():
+    assert matcher.match("مُتوسط الرواتب في قسم الإدارة").binds == {"department": "Administration"}
+    assert matcher.match("employees hired in ٢٠٠٥").binds == {"year": 2005}
+
+
+def test_number_slot_reads_thousands_separators():
+    match = matcher.match("Employees with salary above 12,500")
+    assert (match.template, match.binds) == ("salary_above", {"amount": 12500})
+
+
+def test_unlisted_value_and_free_form_questions_miss():
+    assert matcher.match("average salary in Narnia") is None
+    assert matcher.match("اعرض الموظفين اللي تم تعيينهم قبل مديرهم") is None
+
+
+def test_pattern_must_use_declared_slots():
+    with pytest.raises(ValueError):
+        compile_pattern("salary of {who}", {"name": {"type": "name"}})
+
+
+def test_unsafe_or_mismatched_templates_are_skipped(tmp_path):
+    path = write_templates(tmp_path, [
+        {"name": "write", "sql": "DELETE FROM employees WHERE salary > :n", "slots": {"n": "number"},
+         "patterns": ["remove {n}"]},
+        {"name": "extra_bind", "sql": "SELECT 1 FROM dual WHERE :a = :b", "slots": {"a": "number"},
+         "patterns": ["check {a}"]},
+        {"name": "reserved", "sql": "SELECT 1 FROM dual WHERE 1 = :limit", "slots": {"limit": "number"},
+         "patterns": ["limit {limit}"]},
+        {"name": "ok", "sql": "SELECT 1 FROM dual WHERE 1 = :n", "slots": {"n": "number"},
+         "patterns": ["one {n}"]},
+    ])
+    assert [t.name for t in load_templates(path)] == ["ok"]
+
+
+def test_missing_file_disables_matching(tmp_path):
+    empty = build_template_matcher(str(tmp_path / "missing.json"))
+    assert isinstance(empty, TemplateMatcher) and len(empty) == 0
+    assert empty.match("average salary in sales") is None
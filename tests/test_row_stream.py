@@ -0,0 +1,39 @@
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import StaticPool
+from src.database import RowStream
+
+
+def build_engine(rows: int):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE t (id INTEGER)"))
+        conn.execute(text("INSERT INTO t VALUES (:id)"), [{"id": i} for i in range(rows)])
+    return engine
+
+
+def drain(stream: RowStream) -> list:
+    rows = []
+    while True:
+        chunk = stream.fetch_chunk()
+        if not chunk:
+            return rows
+        rows += chunk
+
+
+def test_stream_stops_at_the_row_cap():
+    stream = RowStream(build_engine(25), "SELECT a.id FROM t a CROSS JOIN t b", arraysize=7, max_rows=30)
+    try:
+        assert len(drain(stream)) == 30
+        assert stream.truncated and stream.row_count == 30
+        assert stream.fetch_chunk() == []
+    finally:
+        stream.close()
+
+
+def test_result_that_fits_exactly_is_not_truncated():
+    stream = RowStream(build_engine(30), "SELECT id FROM t", arraysize=7, max_rows=30)
+    try:
+        assert len(drain(stream)) == 30
+        assert not stream.truncated
+    finally:
+        stream.close()
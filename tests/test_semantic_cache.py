@@ -0,0 +1,83 @@
+from src.semantic_cache import SemanticCache, embed, question_literals, question_terms
+
+
+def test_paraphrases_share_terms():
+    assert question_terms("اعرض متوسط المرتبات لكل قسم") == question_terms("متوسط الرواتب لكل Department")
+
+
+def test_word_order_counts():
+    a = embed("متوسط المرتبات لكل قسم ورتبهم من الاعلى للاقل", 1024)
+    b = embed("متوسط المرتبات لكل قسم ورتبهم من الاقل للاعلى", 1024)
+    assert float(a @ b) < 0.92
+
+
+def test_arabic_indic_digits_are_numbers():
+    assert question_literals("اعلى من ٥٠٠٠") == question_literals("اعلى من 5000")
+
+
+def test_paraphrase_hit():
+    cache = SemanticCache(capacity=4)
+    cache.set("اعرض متوسط المرتبات لكل قسم", "fp", "coder", "SELECT 1")
+    hit = cache.get("متوسط الرواتب لكل Department", "fp", "coder")
+    assert hit is not None and hit.sql == "SELECT 1"
+
+
+def test_numbers_differ_is_a_miss():
+    cache = SemanticCache(capacity=4)
+    cache.set("الموظفين الذين رواتبهم اعلى من 5000", "fp", "coder", "SELECT 1")
+    assert cache.get("الموظفين الذين رواتبهم اعلى من 6000", "fp", "coder") is None
+    report = cache.report()
+    assert report["numbers_differ"] == 1
+    assert report["near_misses"][0]["reason"] == "numbers_differ"
+
+
+def test_letters_and_quoted_text_differ_is_a_miss():
+    cache = SemanticCache(capacity=4)
+    cache.set("employees whose first name starts with A", "fp", "coder", "SELECT 1")
+    assert cache.get("employees whose first name starts with S", "fp", "coder") is None
+    cache.set('employees in the "Sales" department', "fp", "coder", "SELECT 2")
+    assert cache.get('employees in the "Marketing" department', "fp", "coder") is None
+    report = cache.report()
+    assert report["literals_differ"] == 1 and report["numbers_differ"] == 0
+    assert {miss["reason"] for miss in report["near_misses"]} <= {"literals_differ", "below_threshold"}
+    hit = cache.get("employees whose first name starts with A", "fp", "coder")
+    assert hit is not None and hit.sql == "SELECT 1"
+
+
+def test_quoted_text_and_letters_are_literals():
+    assert question_literals("name starts with 'S' in «Sales»") == ("s", "sales")
+    assert question_literals("the employee's salary و القسم") == ()
+
+
+def test_model_differs_is_its_own_reason():
+    cache = SemanticCache(capacity=4)
+    cache.set("متوسط الرواتب لكل قسم", "fp", "coder", "SELECT 1")
+    assert cache.get("متوسط الرواتب لكل قسم", "fp", "other") is None
+    report = cache.report()
+    assert report["model_differs"] == 1 and report["numbers_differ"] == 0
+    assert report["near_misses"][0]["reason"] == "model_differs"
+
+
+def test_least_recently_used_row_is_evicted():
+    cache = SemanticCache(capacity=2)
+    cache.set("متوسط الرواتب لكل قسم", "fp", "coder", "SELECT 1")
+    cache.set("عدد الموظفين لكل قسم", "fp", "coder", "SELECT 2")
+    assert cache.get("متوسط الرواتب لكل قسم", "fp", "coder") is not None
+    cache.set("اعلى راتب في الشركة", "fp", "coder", "SELECT 3")
+    assert len(cache) == 2 and cache.evictions == 1
+    assert cache.get("عدد الموظفين لكل قسم", "fp", "coder") is None
+    assert cache.get("متوسط الرواتب لكل قسم", "fp", "coder").sql == "SELECT 1"
+
+
+def test_fingerprint_change_clears():
+    cache = SemanticCache(capacity=4)
+    cache.set("متوسط الرواتب لكل قسم", "fp1", "coder", "SELECT 1")
+    assert cache.get("متوسط الرواتب لكل قسم", "fp2", "coder") is None
+    assert len(cache) == 0
+
+
+def test_persisted_entries_reload(tmp_path):
+    path = str(tmp_path / "semantic.db")
+    SemanticCache(capacity=4, path=path).set("متوسط الرواتب لكل قسم", "fp", "coder", "SELECT 1")
+    reloaded = SemanticCache(capacity=4, path=path)
+    assert reloaded.get("متوسط المرتبات لكل قسم", "fp", "coder").sql == "SELECT 1"
@@ -0,0 +1,38 @@
+import asyncio
+import gc
+from types import SimpleNamespace
+import src.database as db
+
+
+class CandidateClient:
+    """Returns one SQL statement per sampling temperature."""
+    model = "coder"
+
+    def __init__(self, by_temperature):
+        self.by_temperature = by_temperature
+
+    async def ainvoke(self, prompt, options=None, **kwargs):
+        return SimpleNamespace(content=self.by_temperature[(options or {}).get("temperature", 0)])
+
+
+async def execute(sql, canceller=None):
+    await asyncio.sleep(0)
+    if "BAD" in sql:
+        raise RuntimeError("ORA-00942: table or view does not exist")
+    return db.QueryResult(sql, "success", [(1,)], ["X"], ["number"])
+
+
+def test_losers_finished_with_the_winner_are_retrieved(monkeypatch):
+    monkeypatch.setattr(db, "SQL_CANDIDATE_TEMPERATURES", [0.0, 0.3])
+    unretrieved = []
+
+    async def main():
+        asyncio.get_running_loop().set_exception_handler(lambda loop, context: unretrieved.append(context))
+        client = CandidateClient({0.0: "SELECT GOOD FROM T", 0.3: "SELECT BAD FROM T"})
+        result = await db.run_speculative(db.SQLContext("q", "schema", "fp", "coder"), client, execute, candidates=2)
+        gc.collect()
+        return result
+
+    sql, value, failure = asyncio.run(main())
+    assert (sql, failure) == ("SELECT GOOD FROM T", None) and value.rows == [(1,)]
+    assert unretrieved == []
@@ -0,0 +1,77 @@
+from src.sql_fixer import SQLFixer, oracle_error_code
+
+CATALOG = {
+    "EMPLOYEES": {"columns": [("EMPLOYEE_ID", "NUMBER"), ("FIRST_NAME", "VARCHAR2"), ("SALARY", "NUMBER"),
+                              ("DEPARTMENT_ID", "NUMBER"), ("MANAGER_ID", "NUMBER")]},
+    "DEPARTMENTS": {"columns": [("DEPARTMENT_ID", "NUMBER"), ("DEPARTMENT_NAME", "VARCHAR2"),
+                                ("MANAGER_ID", "NUMBER")]},
+}
+AMBIGUOUS = "ORA-00918: column ambiguously defined"
+fixer = SQLFixer(CATALOG)
+
+
+def test_normalize_strips_fence_preamble_and_semicolon():
+    sql, applied = fixer.normalize("Here is the query:\n```sql\nSELECT salary FROM employees;\n```")
+    assert sql == "SELECT salary FROM employees"
+    assert {"fence", "semicolon"} <= set(applied)
+
+
+def test_normalize_rewrites_limit_and_top():
+    assert fixer.normalize("SELECT salary FROM employees LIMIT 5")[0] == \
+        "SELECT salary FROM employees FETCH FIRST 5 ROWS ONLY"
+    assert fixer.normalize("SELECT TOP 3 salary FROM employees")[0] == \
+        "SELECT salary FROM employees FETCH FIRST 3 ROWS ONLY"
+
+
+def test_normalize_leaves_literals_alone():
+    sql = "SELECT first_name FROM employees WHERE first_name = 'LIMIT 5'"
+    assert fixer.normalize(sql) == (sql, [])
+
+
+def test_normalize_quoted_names_and_string_aliases():
+    sql, applied = fixer.normalize("SELECT \"first_name\", SUM(salary) AS 'Total' FROM employees GROUP BY \"first_name\"")
+    assert sql == "SELECT FIRST_NAME, SUM(salary) AS \"Total\" FROM employees GROUP BY FIRST_NAME"
+    assert applied == ["string_alias", "quoted_identifier"]
+
+
+def test_normalize_does_not_qualify_ambiguous_columns():
+    sql = "SELECT department_id FROM employees e JOIN departments d ON e.department_id = d.department_id"
+    assert fixer.normalize(sql) == (sql, [])
+
+
+def test_ambiguous_column_equated_by_join_is_qualified():
+    sql = "SELECT department_id, salary FROM employees e JOIN departments d ON e.department_id = d.department_id"
+    fixed, applied = fixer.fix_error(sql, AMBIGUOUS)
+    assert fixed.startswith("SELECT e.department_id, salary FROM")
+    assert applied == ["ambiguous_column"]
+
+
+def test_ambiguous_column_equated_in_where_is_qualified():
+    sql = "SELECT department_id FROM employees e, departments d WHERE d.department_id = e.department_id"
+    assert fixer.fix_error(sql, AMBIGUOUS)[0].startswith("SELECT e.department_id FROM")
+
+
+def test_ambiguous_column_not_equated_is_left_to_the_model():
+    # MANAGER_ID means different people in the two tables
+    sql = "SELECT manager_id FROM employees e JOIN departments d ON e.department_id = d.department_id"
+    assert fixer.fix_error(sql, AMBIGUOUS) is None
+
+
+def test_ambiguous_column_under_or_or_outer_join_is_left_to_the_model():
+    sql = ("SELECT department_id FROM employees e, departments d "
+           "WHERE e.department_id = d.department_id OR e.salary > 10")
+    assert fixer.fix_error(sql, AMBIGUOUS) is None
+    sql = "SELECT department_id FROM employees e FULL JOIN departments d ON e.department_id = d.department_id"
+    assert fixer.fix_error(sql, AMBIGUOUS) is None
+
+
+def test_invalid_identifier_is_renamed():
+    sql = "SELECT salry FROM employees"
+    fixed, applied = fixer.fix_error(sql, 'ORA-00904: "SALRY": invalid identifier')
+    assert fixed == "SELECT SALARY FROM employees"
+    assert applied == ["identifier"]
+
+
+def test_unknown_error_has_no_local_fix():
+    assert oracle_error_code("ORA-01476: divisor is equal to zero") == "ORA-01476"
+    assert fixer.fix_error("SELECT 1/0 FROM dual", "ORA-01476: divisor is equal to zero") is None
@@ -0,0 +1,59 @@
+import pytest
+from src.sql_validator import SQLValidator, SQLValidationError, check_read_only
+
+CATALOG = {
+    "EMPLOYEES": {"columns": [("EMPLOYEE_ID", "NUMBER"), ("FIRST_NAME", "VARCHAR2"), ("SALARY", "NUMBER"),
+                              ("DEPARTMENT_ID", "NUMBER")]},
+    "DEPARTMENTS": {"columns": [("DEPARTMENT_ID", "NUMBER"), ("DEPARTMENT_NAME", "VARCHAR2")]},
+}
+validator = SQLValidator(CATALOG)
+
+
+def rejection(sql: str) -> SQLValidationError:
+    with pytest.raises(SQLValidationError) as info:
+        validator.validate(sql)
+    return info.value
+
+
+@pytest.mark.parametrize("sql", [
+    "DELETE FROM employees",
+    "SELECT 1 FROM dual; DROP TABLE employees",
+    "SELECT * FROM employees FOR UPDATE",
+    "WITH x AS (SELECT 1 FROM dual) UPDATE employees SET salary = 0",
+    "",
+])
+def test_writes_and_multiple_statements_are_unsafe(sql):
+    assert rejection(sql).kind == "unsafe"
+
+
+def test_keywords_inside_literals_are_not_statements():
+    check_read_only("SELECT first_name FROM employees WHERE first_name = 'DROP TABLE x; DELETE'")
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT first_name FROM employees WHERE (salary > 1",
+    "SELECT first_name FROM employees WHERE first_name = 'open",
+    "SELECT salary) FROM employees",
+])
+def test_broken_text_is_a_syntax_error(sql):
+    assert rejection(sql).kind == "syntax"
+
+
+def test_unknown_table_and_column_are_reported():
+    error = rejection("SELECT salry FROM employee")
+    assert error.kind == "schema"
+    assert "EMPLOYEE" in str(error)
+    error = rejection("SELECT e.salry FROM employees e")
+    assert "SALRY" in str(error) and "EMPLOYEES" in str(error)
+
+
+def test_column_of_the_wrong_table_is_reported():
+    error = rejection("SELECT d.salary FROM employees e JOIN departments d ON e.department_id = d.department_id")
+    assert "SALARY" in str(error)
+
+
+def test_valid_queries_pass():
+    validator.validate("SELECT d.department_name, AVG(e.salary) avg_salary FROM employees e "
+                       "JOIN departments d ON e.department_id = d.department_id GROUP BY d.department_name")
+    validator.validate("WITH top AS (SELECT department_id, MAX(salary) m FROM employees GROUP BY department_id) "
+                       "SELECT t.m FROM top t")